@@ -1,30 +1,98 @@
 import os
+import importlib
+import threading
 from flask import Flask, request, jsonify
 from flask_cors import CORS
 from flask_jwt_extended import JWTManager
 from flask_mail import Mail
 
 from .config import Config
-from .db import init_db, init_schema, close_db
+from .db import init_db, init_schema, close_db, sign_last_write, LAST_WRITE_HEADER
+from .utils.startup_profile import phase, report as report_startup
 
-# Vercel serverless does not support WebSockets; skip SocketIO when VERCEL=1
+# Vercel serverless does not support WebSockets; skip SocketIO when VERCEL=1.
+# ENABLE_SOCKETIO=False also skips importing flask_socketio (and eventlet) elsewhere.
 VERCEL = os.environ.get('VERCEL') == '1'
-if VERCEL:
+ENABLE_SOCKETIO = os.environ.get('ENABLE_SOCKETIO', str(not VERCEL)).lower() == 'true'
+if not ENABLE_SOCKETIO:
     socketio = None
 else:
-    from flask_socketio import SocketIO
-    socketio = SocketIO()
+    with phase('import flask_socketio'):
+        from flask_socketio import SocketIO
+    # SOCKETIO_ASYNC_MODE=threading avoids importing eventlet when it is installed but unused
+    socketio = SocketIO(async_mode=os.environ.get('SOCKETIO_ASYNC_MODE') or None)
 
 # Initialize extensions
 jwt = JWTManager()
 mail = Mail()
 
-def create_app(config_class=Config):
-    app = Flask(__name__)
-    
+@jwt.token_in_blocklist_loader
+def check_if_token_revoked(jwt_header, jwt_payload):
+    """Logout/deactivation revocations, checked from memory (see revocation_service)"""
+    from .services.revocation_service import is_token_revoked
+    return is_token_revoked(jwt_payload)
+
+# (module, blueprint attribute, url prefix)
+BLUEPRINTS = [
+    ('app.api.auth', 'auth_bp', '/api/auth'),
+    ('app.api.admin', 'admin_bp', '/api/admin'),
+    ('app.api.professor', 'professor_bp', '/api/professor'),
+    ('app.api.student', 'student_bp', '/api/student'),
+    ('app.api.timetable', 'timetable_bp', '/api/timetable'),
+    ('app.api.chat', 'chat_bp', '/api/chat'),
+    ('app.api.notifications', 'notifications_bp', '/api/notifications'),
+    ('app.api.exports', 'exports_bp', '/api/exports'),
+    ('app.api.calendar', 'calendar_bp', '/api/calendar'),
+]
+
+def _register_blueprint(app, module_name, attr, url_prefix):
+    with phase(f'import {module_name}'):
+        module = importlib.import_module(module_name)
+    app.register_blueprint(getattr(module, attr), url_prefix=url_prefix)
+
+class LazyBlueprintDispatcher:
+    """
+    WSGI middleware for lazy-init mode: a blueprint module is imported only when
+    the first request for its url prefix arrives. Each blueprint is served by its
+    own small Flask app configured exactly like the main one (Flask does not allow
+    registering blueprints after the first request).
+    """
+
+    def __init__(self, app, config_class, fallback):
+        self.app = app
+        self.config_class = config_class
+        self.fallback = fallback
+        self.apps = {}
+        self.lock = threading.Lock()
+
+    def _app_for(self, path):
+        for module_name, attr, url_prefix in BLUEPRINTS:
+            if path == url_prefix or path.startswith(url_prefix + '/'):
+                break
+        else:
+            return None
+        if url_prefix not in self.apps:
+            with self.lock:
+                if url_prefix not in self.apps:
+                    with phase(f'build {url_prefix}'):
+                        sub_app = Flask(self.app.import_name)
+                        _configure_app(sub_app, self.config_class)
+                        _register_blueprint(sub_app, module_name, attr, url_prefix)
+                    report_startup()
+                    self.apps[url_prefix] = sub_app
+        return self.apps[url_prefix]
+
+    def __call__(self, environ, start_response):
+        sub_app = self._app_for(environ.get('PATH_INFO', ''))
+        if sub_app is None:
+            return self.fallback(environ, start_response)
+        return sub_app.wsgi_app(environ, start_response)
+
+def _configure_app(app, config_class):
+    """Config, extensions, CORS, teardown and JSON error handlers shared by every app instance"""
     # Load config
     app.config.from_object(config_class)
-    
+
     # Initialize extensions – CORS for all /api routes, including preflight OPTIONS
     origins = app.config['CORS_ORIGINS']
     CORS(
@@ -32,22 +100,18 @@ def create_app(config_class=Config):
         origins=origins,
         supports_credentials=True,
         resources={r'/api/*': {'origins': origins}},
-        allow_headers=['Content-Type', 'Authorization'],
+        allow_headers=['Content-Type', 'Authorization', LAST_WRITE_HEADER],
+        expose_headers=[LAST_WRITE_HEADER],
         methods=['GET', 'POST', 'PUT', 'DELETE', 'OPTIONS'],
     )
     jwt.init_app(app)
     mail.init_app(app)
-    if socketio is not None:
-        socketio.init_app(app, cors_allowed_origins=app.config['CORS_ORIGINS'])
-    
-    # Initialize database and create tables if they don't exist
-    with app.app_context():
-        init_db(app)
-        init_schema(app)
-    
+
     # Register teardown
     app.teardown_appcontext(close_db)
-    
+    # Read-your-writes token for the read replica (see app/db.py)
+    app.after_request(sign_last_write)
+
     # Ensure CORS headers on EVERY response so browser never blocks (including JWT/role errors)
     # Normalize for comparison: browser sends origin without trailing slash; env may have with slash
     _origins_normalized = {o.rstrip('/') for o in origins}
@@ -66,32 +130,11 @@ def create_app(config_class=Config):
             origin = origins[0]
         response.headers['Access-Control-Allow-Origin'] = origin
         response.headers['Access-Control-Allow-Credentials'] = 'true'
-        response.headers['Access-Control-Allow-Headers'] = 'Content-Type, Authorization'
+        response.headers['Access-Control-Allow-Headers'] = f'Content-Type, Authorization, {LAST_WRITE_HEADER}'
+        response.headers['Access-Control-Expose-Headers'] = LAST_WRITE_HEADER
         response.headers['Access-Control-Allow-Methods'] = 'GET, POST, PUT, DELETE, OPTIONS'
         return response
-    
-    # Register blueprints
-    from .api.auth import auth_bp
-    from .api.admin import admin_bp
-    from .api.professor import professor_bp
-    from .api.student import student_bp
-    from .api.timetable import timetable_bp
-    from .api.chat import chat_bp
-    from .api.notifications import notifications_bp
-    
-    app.register_blueprint(auth_bp, url_prefix='/api/auth')
-    app.register_blueprint(admin_bp, url_prefix='/api/admin')
-    app.register_blueprint(professor_bp, url_prefix='/api/professor')
-    app.register_blueprint(student_bp, url_prefix='/api/student')
-    app.register_blueprint(timetable_bp, url_prefix='/api/timetable')
-    app.register_blueprint(chat_bp, url_prefix='/api/chat')
-    app.register_blueprint(notifications_bp, url_prefix='/api/notifications')
-    
-    # Health check route
-    @app.route('/api/health')
-    def health_check():
-        return {'status': 'healthy'}
-    
+
     # Ensure CORS on error responses (JWT/role errors etc.) – after_request runs on these too
     @app.errorhandler(401)
     @app.errorhandler(403)
@@ -105,5 +148,41 @@ def create_app(config_class=Config):
         if e.code == 404:
             return jsonify({'error': 'Not found'}), 404
         return jsonify({'error': 'Internal server error'}), 500
-    
+
+def create_app(config_class=Config):
+    app = Flask(__name__)
+
+    with phase('configure app'):
+        _configure_app(app, config_class)
+    lazy = app.config['LAZY_INIT']
+
+    # Initialize database and create tables if they don't exist.
+    # In lazy-init mode the pool is created (and migrations checked) on first DB use.
+    with phase('init database'):
+        with app.app_context():
+            init_db(app, lazy=lazy)
+            if not lazy:
+                init_schema(app)
+
+    # Register blueprints (lazy-init mode imports each one on its first request)
+    if lazy:
+        app.wsgi_app = LazyBlueprintDispatcher(app, config_class, app.wsgi_app)
+    else:
+        for module_name, attr, url_prefix in BLUEPRINTS:
+            _register_blueprint(app, module_name, attr, url_prefix)
+
+    # Installed after the dispatcher so Socket.IO traffic is intercepted first
+    if socketio is not None:
+        socketio.init_app(app, cors_allowed_origins=app.config['CORS_ORIGINS'])
+
+    # Deliver queued mail (email_outbox) from every process serving the app, not just run.py
+    from app.services.email_queue_service import start_email_worker
+    start_email_worker(app)
+
+    # Health check route
+    @app.route('/api/health')
+    def health_check():
+        return {'status': 'healthy'}
+
+    report_startup()
     return app
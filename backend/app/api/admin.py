@@ -1,16 +1,24 @@
-from flask import Blueprint, request, jsonify, send_file
+from flask import Blueprint, request, jsonify
 from flask_jwt_extended import jwt_required, get_jwt_identity
-import bcrypt
 import secrets
-import csv
-import io
+import psycopg2
+from datetime import datetime
 
-from app.db import query_db, insert_db, execute_db
-from app.utils.decorators import role_required
+from app.db import query_db, insert_db, execute_db, stream_db
+from app.utils.decorators import role_required, read_only
 from app.utils.serializers import serialize_rows
-from app.utils.validators import validate_email
+from app.utils.streaming import stream_json_list, stream_csv
+from app.utils.pagination import get_page_args, keyset_condition, count_total, KeysetPage, page_fields
+from app.utils.validators import validate_email, int_args
 from app.services.email_service import send_credentials_email
 from app.services.notification_service import notify_all_users_auditorium_booking
+from app.services.revocation_service import revoke_user_tokens
+from app.services.password_service import hash_password
+from app.services.import_service import ROLE_COLUMNS, open_csv, has_required_columns, import_users
+from app.services.import_job_service import create_import_job, get_job, job_summary
+from app.services.bulk_user_service import bulk_update_users
+from app.services.stats_service import get_snapshot, get_timeseries, DAILY_METRICS
+from app.services.availability_service import invalidate_availability
 from app import mail
 
 admin_bp = Blueprint('admin', __name__)
@@ -44,7 +52,7 @@ def add_student():
     
     # Generate temporary password
     temp_password = secrets.token_urlsafe(12)
-    password_hash = bcrypt.hashpw(temp_password.encode('utf-8'), bcrypt.gensalt()).decode('utf-8')
+    password_hash = hash_password(temp_password, temporary=True)
     
     # Create student
     user_id = insert_db(
@@ -54,7 +62,7 @@ def add_student():
     )
     
     # Send credentials email
-    send_credentials_email(mail, email, temp_password, 'student', data['first_name'])
+    send_credentials_email(mail, email, temp_password, 'student', data['first_name'], user_id)
     
     return jsonify({
         'message': 'Student added successfully. Credentials sent via email.',
@@ -90,7 +98,7 @@ def add_professor():
     
     # Generate temporary password
     temp_password = secrets.token_urlsafe(12)
-    password_hash = bcrypt.hashpw(temp_password.encode('utf-8'), bcrypt.gensalt()).decode('utf-8')
+    password_hash = hash_password(temp_password, temporary=True)
     
     # Create professor
     user_id = insert_db(
@@ -100,7 +108,7 @@ def add_professor():
     )
     
     # Send credentials email
-    send_credentials_email(mail, email, temp_password, 'professor', data['first_name'])
+    send_credentials_email(mail, email, temp_password, 'professor', data['first_name'], user_id)
     
     return jsonify({
         'message': 'Professor added successfully. Credentials sent via email.',
@@ -111,11 +119,19 @@ def add_professor():
 @jwt_required()
 @role_required('admin')
 def list_users():
-    """List all users with filters"""
+    """List users with filters. Optional keyset pagination: ?limit=&cursor=, ?include_total=exact|estimate"""
     role = request.args.get('role')
-    department_id = request.args.get('department_id')
     batch = request.args.get('batch')
+    is_active = request.args.get('is_active')
     search = request.args.get('search', '')
+    include_total = request.args.get('include_total')
+    
+    # Checked before streaming: once the response has started, a bad value can no longer be a 400
+    try:
+        department_id = int_args(request.args, 'department_id')['department_id']
+        limit, cursor = get_page_args((datetime.fromisoformat, int))
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
     
     query = """
         SELECT u.id, u.email, u.role, u.first_name, u.last_name, 
@@ -131,7 +147,7 @@ def list_users():
         query += " AND u.role = %s"
         params.append(role)
     
-    if department_id:
+    if department_id is not None:
         query += " AND u.department_id = %s"
         params.append(department_id)
     
@@ -139,16 +155,33 @@ def list_users():
         query += " AND u.batch = %s"
         params.append(batch)
     
+    if is_active in ('true', 'false'):
+        query += " AND u.is_active = %s"
+        params.append(is_active == 'true')
+    
     if search:
         query += " AND (u.first_name ILIKE %s OR u.last_name ILIKE %s OR u.email ILIKE %s)"
         search_pattern = f'%{search}%'
         params.extend([search_pattern, search_pattern, search_pattern])
     
-    query += " ORDER BY u.created_at DESC"
+    # Counted before the cursor condition so the total covers every page
+    total = count_total(query, tuple(params), include_total)
+    
+    if cursor:
+        query += " AND " + keyset_condition(['u.created_at', 'u.id'], descending=True)
+        params.extend(cursor)
+    
+    query += " ORDER BY u.created_at DESC, u.id DESC"
     
-    users = query_db(query, tuple(params))
+    if not limit:
+        users = stream_db(query, tuple(params))
+        return stream_json_list('users', users, extra={'total': total} if total is not None else None)
     
-    return jsonify({'users': users}), 200
+    query += " LIMIT %s"
+    params.append(limit + 1)
+    page = KeysetPage(stream_db(query, tuple(params)), limit, key=lambda u: [u['created_at'].isoformat(), u['id']])
+    
+    return stream_json_list('users', page, extra=lambda: page_fields(page, total))
 
 @admin_bp.route('/users/<int:user_id>', methods=['DELETE'])
 @jwt_required()
@@ -163,9 +196,30 @@ def deactivate_user(user_id):
         return jsonify({'error': 'Cannot deactivate admin users'}), 400
     
     execute_db("UPDATE users SET is_active = FALSE WHERE id = %s", (user_id,))
+    # Reject tokens already issued to this user (also drops them from the identity cache)
+    revoke_user_tokens([user_id])
     
     return jsonify({'message': 'User deactivated successfully'}), 200
 
+@admin_bp.route('/users/bulk', methods=['POST'])
+@jwt_required()
+@role_required('admin')
+def bulk_update_users_endpoint():
+    """
+    Bulk user action in one statement. Body: {"action": deactivate|reactivate|move|force_password_reset,
+    "user_ids": [...] or "filter": {role, department_id, batch, is_active}, "department_id"/"batch" for move,
+    "dry_run": true to only count}
+    """
+    data = request.get_json(silent=True) or {}
+    try:
+        result = bulk_update_users(data.get('action'), data, dry_run=bool(data.get('dry_run')))
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    except psycopg2.errors.ForeignKeyViolation:
+        return jsonify({'error': 'Department not found'}), 400
+    
+    return jsonify(result), 200
+
 @admin_bp.route('/departments', methods=['GET'])
 @jwt_required()
 @role_required('admin')
@@ -239,6 +293,7 @@ def add_classroom():
         "INSERT INTO classrooms (room_no, capacity, room_type) VALUES (%s, %s, %s)",
         (data['room_no'], data.get('capacity'), room_type)
     )
+    invalidate_availability()
     
     return jsonify({
         'message': 'Classroom added successfully',
@@ -265,6 +320,7 @@ def delete_classroom(classroom_id):
         execute_db("DELETE FROM classrooms WHERE id = %s", (classroom_id,))
     except Exception as e:
         return jsonify({'error': f'Unable to delete classroom: {str(e)}'}), 400
+    invalidate_availability()
 
     return jsonify({'message': 'Classroom deleted successfully'}), 200
 
@@ -320,6 +376,8 @@ def book_auditorium():
         data['booking_date'], data['start_time'], data['end_time']
     ))
 
+    invalidate_availability()
+
     # Notify all active users about this booking (best-effort, ignore failures)
     try:
         notify_all_users_auditorium_booking(classroom, data)
@@ -349,27 +407,37 @@ def list_auditorium_bookings():
 
 @admin_bp.route('/stats', methods=['GET'])
 @jwt_required()
+@read_only
 @role_required('admin')
 def get_stats():
-    """Get dashboard statistics"""
-    students = query_db(
-        "SELECT COUNT(*) as count FROM users WHERE role = 'student' AND is_active = TRUE",
-        one=True
-    )
-    professors = query_db(
-        "SELECT COUNT(*) as count FROM users WHERE role = 'professor' AND is_active = TRUE",
-        one=True
-    )
-    # total_classes = number of available classrooms (rooms), not timetable entries
-    classrooms = query_db("SELECT COUNT(*) as count FROM classrooms", one=True)
-    departments = query_db("SELECT COUNT(*) as count FROM departments", one=True)
+    """Get dashboard statistics (trigger-maintained counters, cached snapshot)"""
+    return jsonify(get_snapshot()), 200
 
-    return jsonify({
-        'total_students': students['count'],
-        'total_professors': professors['count'],
-        'total_classes': classrooms['count'],
-        'total_departments': departments['count']
-    }), 200
+@admin_bp.route('/stats/timeseries', methods=['GET'])
+@jwt_required()
+@read_only
+@role_required('admin')
+def get_stats_timeseries():
+    """Daily values of one metric: ?metric=messages&days=30[&dimension=broadcast]"""
+    metric = request.args.get('metric')
+    if metric not in DAILY_METRICS:
+        return jsonify({'error': f'metric must be one of: {", ".join(DAILY_METRICS)}'}), 400
+    days = request.args.get('days', 30, type=int)
+    if not 1 <= days <= 366:
+        return jsonify({'error': 'days must be between 1 and 366'}), 400
+    
+    series = get_timeseries(metric, days, request.args.get('dimension'))
+    return jsonify({'metric': metric, 'days': days, 'series': series}), 200
+
+@admin_bp.route('/jobs/<int:job_id>', methods=['GET'])
+@jwt_required()
+@role_required('admin')
+def get_import_job(job_id):
+    """Progress of a background CSV import: rows processed, successes, errors, throughput"""
+    job = get_job(job_id, include_errors=True)
+    if not job:
+        return jsonify({'error': 'Job not found'}), 404
+    return jsonify({'job': job_summary(job)}), 200
 
 @admin_bp.route('/students/upload-csv', methods=['POST'])
 @jwt_required()
@@ -387,107 +455,24 @@ def upload_students_csv():
         return jsonify({'error': 'File must be a CSV'}), 400
     
     try:
-        # Read CSV file
-        stream = io.StringIO(file.stream.read().decode("UTF8"), newline=None)
-        csv_reader = csv.DictReader(stream)
+        # ?async=1: return a job id now and import in the background (see import_job_service)
+        if request.args.get('async', type=str) in ('1', 'true', 'yes'):
+            try:
+                job_id = create_import_job(file, 'student', int(get_jwt_identity()))
+            except ValueError as e:
+                return jsonify({'error': str(e)}), 400
+            return jsonify({'message': 'Import started', 'job_id': job_id}), 202
         
-        # Expected columns: email, first_name, last_name, department_code, batch
-        required_columns = ['email', 'first_name', 'last_name', 'department_code', 'batch']
+        # Parsed in chunks as it is read (see import_service)
+        csv_reader = open_csv(file)
         
-        # Validate headers
-        if not all(col in csv_reader.fieldnames for col in required_columns):
+        # Expected columns: email, first_name, last_name, department_code, batch
+        if not has_required_columns(csv_reader, 'student'):
             return jsonify({
-                'error': f'CSV must contain columns: {", ".join(required_columns)}'
+                'error': f'CSV must contain columns: {", ".join(ROLE_COLUMNS["student"])}'
             }), 400
         
-        results = {
-            'success': [],
-            'errors': [],
-            'total': 0
-        }
-        
-        # Get all departments for lookup
-        departments = query_db("SELECT id, code FROM departments")
-        dept_map = {dept['code'].upper(): dept['id'] for dept in departments}
-        
-        for row_num, row in enumerate(csv_reader, start=2):  # Start at 2 (1 is header)
-            results['total'] += 1
-            
-            try:
-                email = row['email'].strip().lower()
-                first_name = row['first_name'].strip()
-                last_name = row['last_name'].strip()
-                department_code = row['department_code'].strip().upper()
-                batch = row['batch'].strip()
-                
-                # Validate required fields
-                if not all([email, first_name, last_name, department_code, batch]):
-                    results['errors'].append({
-                        'row': row_num,
-                        'email': email or 'N/A',
-                        'error': 'Missing required fields'
-                    })
-                    continue
-                
-                # Validate email format
-                if not validate_email(email):
-                    results['errors'].append({
-                        'row': row_num,
-                        'email': email,
-                        'error': 'Invalid email format'
-                    })
-                    continue
-                
-                # Check if email exists
-                existing = query_db("SELECT id FROM users WHERE email = %s", (email,), one=True)
-                if existing:
-                    results['errors'].append({
-                        'row': row_num,
-                        'email': email,
-                        'error': 'Email already registered'
-                    })
-                    continue
-                
-                # Check if department exists
-                department_id = dept_map.get(department_code)
-                if not department_id:
-                    results['errors'].append({
-                        'row': row_num,
-                        'email': email,
-                        'error': f'Department code "{department_code}" not found'
-                    })
-                    continue
-                
-                # Generate temporary password
-                temp_password = secrets.token_urlsafe(12)
-                password_hash = bcrypt.hashpw(temp_password.encode('utf-8'), bcrypt.gensalt()).decode('utf-8')
-                
-                # Create student
-                user_id = insert_db(
-                    """INSERT INTO users (email, password_hash, role, first_name, last_name, department_id, batch, must_change_password)
-                       VALUES (%s, %s, 'student', %s, %s, %s, %s, TRUE)""",
-                    (email, password_hash, first_name, last_name, department_id, batch)
-                )
-                
-                # Send credentials email
-                try:
-                    send_credentials_email(mail, email, temp_password, 'student', first_name)
-                except Exception as e:
-                    # Log email error but don't fail the import
-                    print(f"Failed to send email to {email}: {str(e)}")
-                
-                results['success'].append({
-                    'row': row_num,
-                    'email': email,
-                    'user_id': user_id
-                })
-                
-            except Exception as e:
-                results['errors'].append({
-                    'row': row_num,
-                    'email': row.get('email', 'N/A'),
-                    'error': str(e)
-                })
+        results = import_users(csv_reader, 'student')
         
         return jsonify({
             'message': f'Processed {results["total"]} rows. {len(results["success"])} successful, {len(results["errors"])} errors.',
@@ -513,106 +498,24 @@ def upload_professors_csv():
         return jsonify({'error': 'File must be a CSV'}), 400
     
     try:
-        # Read CSV file
-        stream = io.StringIO(file.stream.read().decode("UTF8"), newline=None)
-        csv_reader = csv.DictReader(stream)
+        # ?async=1: return a job id now and import in the background (see import_job_service)
+        if request.args.get('async', type=str) in ('1', 'true', 'yes'):
+            try:
+                job_id = create_import_job(file, 'professor', int(get_jwt_identity()))
+            except ValueError as e:
+                return jsonify({'error': str(e)}), 400
+            return jsonify({'message': 'Import started', 'job_id': job_id}), 202
         
-        # Expected columns: email, first_name, last_name, department_code
-        required_columns = ['email', 'first_name', 'last_name', 'department_code']
+        # Parsed in chunks as it is read (see import_service)
+        csv_reader = open_csv(file)
         
-        # Validate headers
-        if not all(col in csv_reader.fieldnames for col in required_columns):
+        # Expected columns: email, first_name, last_name, department_code
+        if not has_required_columns(csv_reader, 'professor'):
             return jsonify({
-                'error': f'CSV must contain columns: {", ".join(required_columns)}'
+                'error': f'CSV must contain columns: {", ".join(ROLE_COLUMNS["professor"])}'
             }), 400
         
-        results = {
-            'success': [],
-            'errors': [],
-            'total': 0
-        }
-        
-        # Get all departments for lookup
-        departments = query_db("SELECT id, code FROM departments")
-        dept_map = {dept['code'].upper(): dept['id'] for dept in departments}
-        
-        for row_num, row in enumerate(csv_reader, start=2):  # Start at 2 (1 is header)
-            results['total'] += 1
-            
-            try:
-                email = row['email'].strip().lower()
-                first_name = row['first_name'].strip()
-                last_name = row['last_name'].strip()
-                department_code = row['department_code'].strip().upper()
-                
-                # Validate required fields
-                if not all([email, first_name, last_name, department_code]):
-                    results['errors'].append({
-                        'row': row_num,
-                        'email': email or 'N/A',
-                        'error': 'Missing required fields'
-                    })
-                    continue
-                
-                # Validate email format
-                if not validate_email(email):
-                    results['errors'].append({
-                        'row': row_num,
-                        'email': email,
-                        'error': 'Invalid email format'
-                    })
-                    continue
-                
-                # Check if email exists
-                existing = query_db("SELECT id FROM users WHERE email = %s", (email,), one=True)
-                if existing:
-                    results['errors'].append({
-                        'row': row_num,
-                        'email': email,
-                        'error': 'Email already registered'
-                    })
-                    continue
-                
-                # Check if department exists
-                department_id = dept_map.get(department_code)
-                if not department_id:
-                    results['errors'].append({
-                        'row': row_num,
-                        'email': email,
-                        'error': f'Department code "{department_code}" not found'
-                    })
-                    continue
-                
-                # Generate temporary password
-                temp_password = secrets.token_urlsafe(12)
-                password_hash = bcrypt.hashpw(temp_password.encode('utf-8'), bcrypt.gensalt()).decode('utf-8')
-                
-                # Create professor
-                user_id = insert_db(
-                    """INSERT INTO users (email, password_hash, role, first_name, last_name, department_id, must_change_password)
-                       VALUES (%s, %s, 'professor', %s, %s, %s, TRUE)""",
-                    (email, password_hash, first_name, last_name, department_id)
-                )
-                
-                # Send credentials email
-                try:
-                    send_credentials_email(mail, email, temp_password, 'professor', first_name)
-                except Exception as e:
-                    # Log email error but don't fail the import
-                    print(f"Failed to send email to {email}: {str(e)}")
-                
-                results['success'].append({
-                    'row': row_num,
-                    'email': email,
-                    'user_id': user_id
-                })
-                
-            except Exception as e:
-                results['errors'].append({
-                    'row': row_num,
-                    'email': row.get('email', 'N/A'),
-                    'error': str(e)
-                })
+        results = import_users(csv_reader, 'professor')
         
         return jsonify({
             'message': f'Processed {results["total"]} rows. {len(results["success"])} successful, {len(results["errors"])} errors.',
@@ -627,27 +530,11 @@ def upload_professors_csv():
 @role_required('admin')
 def download_students_template():
     """Download CSV template for students"""
-    # Create CSV in memory
-    output = io.StringIO()
-    writer = csv.writer(output)
-    
-    # Write header
-    writer.writerow(['email', 'first_name', 'last_name', 'department_code', 'batch'])
-    
-    # Write example row
-    writer.writerow(['student@example.com', 'Amit1', 'Diwakar1', 'CSE', '2027'])
-    
-    # Create BytesIO object
-    mem = io.BytesIO()
-    mem.write(output.getvalue().encode('utf-8'))
-    mem.seek(0)
-    output.close()
-    
-    return send_file(
-        mem,
-        mimetype='text/csv',
-        as_attachment=True,
-        download_name='students_template.csv'
+    # Header and one example row
+    return stream_csv(
+        ['email', 'first_name', 'last_name', 'department_code', 'batch'],
+        [['student@example.com', 'Amit1', 'Diwakar1', 'CSE', '2027']],
+        'students_template.csv'
     )
 
 @admin_bp.route('/professors/template', methods=['GET'])
@@ -655,25 +542,9 @@ def download_students_template():
 @role_required('admin')
 def download_professors_template():
     """Download CSV template for professors"""
-    # Create CSV in memory
-    output = io.StringIO()
-    writer = csv.writer(output)
-    
-    # Write header
-    writer.writerow(['email', 'first_name', 'last_name', 'department_code'])
-    
-    # Write example row
-    writer.writerow(['professor@example.com', 'Amit', 'Diwakar', 'CSE'])
-    
-    # Create BytesIO object
-    mem = io.BytesIO()
-    mem.write(output.getvalue().encode('utf-8'))
-    mem.seek(0)
-    output.close()
-    
-    return send_file(
-        mem,
-        mimetype='text/csv',
-        as_attachment=True,
-        download_name='professors_template.csv'
+    # Header and one example row
+    return stream_csv(
+        ['email', 'first_name', 'last_name', 'department_code'],
+        [['professor@example.com', 'Amit', 'Diwakar', 'CSE']],
+        'professors_template.csv'
     )
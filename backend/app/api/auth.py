@@ -1,10 +1,12 @@
 from flask import Blueprint, request, jsonify
-from flask_jwt_extended import create_access_token, jwt_required, get_jwt_identity
-import bcrypt
+from flask_jwt_extended import create_access_token, jwt_required, get_jwt_identity, get_jwt, verify_jwt_in_request
 import secrets
 
 from app.db import query_db, insert_db, execute_db
 from app.utils.validators import validate_email, validate_password
+from app.services.user_cache import invalidate_user
+from app.services.revocation_service import revoke_token
+from app.services.password_service import hash_password, check_password, rehash_in_background
 
 auth_bp = Blueprint('auth', __name__)
 
@@ -38,7 +40,7 @@ def register():
         return jsonify({'error': 'Email already registered'}), 400
     
     # Hash password
-    password_hash = bcrypt.hashpw(password.encode('utf-8'), bcrypt.gensalt()).decode('utf-8')
+    password_hash = hash_password(password)
     
     # Create admin user (only admin can self-register); is_active=TRUE so they can log in
     user_id = insert_db(
@@ -73,13 +75,13 @@ def login():
     if not user:
         return jsonify({'error': 'Invalid email or password'}), 401
     
-    # Verify password (password_hash from DB may be str or bytes)
-    stored_hash = user['password_hash']
-    if isinstance(stored_hash, str):
-        stored_hash = stored_hash.encode('utf-8')
-    if not bcrypt.checkpw(password.encode('utf-8'), stored_hash):
+    # Verify password on the hashing pool (password_hash from DB may be str or bytes)
+    if not check_password(password, user['password_hash']):
         return jsonify({'error': 'Invalid email or password'}), 401
     
+    # Upgrade/downgrade the stored hash to the configured cost without delaying the login
+    rehash_in_background(user, password)
+    
     # Create access token (identity must be a string in Flask-JWT-Extended 4.x)
     access_token = create_access_token(identity=str(user['id']))
     
@@ -129,17 +131,18 @@ def change_password():
         return jsonify({'error': 'User not found'}), 404
     
     # Verify current password
-    if not bcrypt.checkpw(current_password.encode('utf-8'), user['password_hash'].encode('utf-8')):
+    if not check_password(current_password, user['password_hash']):
         return jsonify({'error': 'Current password is incorrect'}), 401
     
     # Hash new password
-    new_password_hash = bcrypt.hashpw(new_password.encode('utf-8'), bcrypt.gensalt()).decode('utf-8')
+    new_password_hash = hash_password(new_password)
     
     # Update password
     execute_db(
         "UPDATE users SET password_hash = %s, must_change_password = FALSE WHERE id = %s",
         (new_password_hash, user_id_int)
     )
+    invalidate_user(user_id_int)
     
     return jsonify({'message': 'Password changed successfully'}), 200
 
@@ -177,6 +180,13 @@ def get_current_user():
 
 @auth_bp.route('/logout', methods=['POST'])
 def logout():
-    """Logout user (client should discard the token)
+    """Logout user: revoke the presented token (client should also discard it)
     No JWT required - logout should work even with expired/invalid tokens"""
+    try:
+        verify_jwt_in_request(optional=True)
+        claims = get_jwt()
+        if claims.get('jti'):
+            revoke_token(claims['jti'], claims.get('sub'), claims.get('exp'))
+    except Exception:
+        pass  # expired/invalid/already revoked token: nothing to revoke
     return jsonify({'message': 'Logged out successfully'}), 200
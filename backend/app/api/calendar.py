@@ -0,0 +1,216 @@
+from datetime import date, timedelta
+from flask import Blueprint, request, jsonify, current_app, send_file, url_for
+from flask_jwt_extended import jwt_required, get_jwt_identity
+
+from app.db import query_db, execute_db
+from app.utils.decorators import role_required, read_only, get_current_user
+from app.utils.serializers import serialize_row
+from app.utils.streaming import stream_json_list
+from app.utils.http_cache import make_etag, not_modified, with_etag
+from app.services.calendar_service import calendar_versions, calendar_weeks, save_exception
+from app.services.availability_service import invalidate_availability
+from app.services.calendar_feed_service import FEED_KINDS, get_feed, create_feed, feed_file
+from app.services.notification_service import notify_students_of_timetable_changes
+from app.services.timetable_version_service import caller_scope
+
+calendar_bp = Blueprint('calendar', __name__)
+
+DEFAULT_RANGE_DAYS = 30
+
+def _date_arg(name):
+    value = request.args.get(name)
+    return date.fromisoformat(value) if value else None
+
+def _flag(name, default=False):
+    value = request.args.get(name, type=str)
+    return default if value is None else value in ('1', 'true', 'yes')
+
+@calendar_bp.route('', methods=['GET'])
+@jwt_required()
+@read_only
+def get_calendar():
+    """Dated classes and auditorium bookings between ?from= and ?to= (inclusive), in date order"""
+    try:
+        start = _date_arg('from') or date.today()
+        end = _date_arg('to') or start + timedelta(days=DEFAULT_RANGE_DAYS - 1)
+    except ValueError:
+        return jsonify({'error': 'from and to must be dates (YYYY-MM-DD)'}), 400
+    if end < start:
+        return jsonify({'error': 'to must not be before from'}), 400
+    max_days = current_app.config.get('CALENDAR_MAX_DAYS', 366)
+    if (end - start).days + 1 > max_days:
+        return jsonify({'error': f'At most {max_days} days per request'}), 400
+
+    # Students see their batch, professors their own classes; admins may filter
+    try:
+        scope = caller_scope(get_current_user(), request.args)
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    bookings = _flag('bookings', default=True)
+    cancelled = _flag('include_cancelled')
+
+    versions = calendar_versions(scope)
+    etag = make_etag('calendar', scope.get('department_id'), scope.get('batch'), scope.get('professor_id'),
+                     start, end, bookings, cancelled, *versions)
+    cached = not_modified(etag)
+    if cached:
+        return cached
+
+    weeks = calendar_weeks(scope, start, end, versions)
+    first, last = start.isoformat(), end.isoformat()
+
+    def occurrences():
+        for week in weeks:
+            for occurrence in week:
+                if not first <= occurrence['date'] <= last:
+                    continue
+                if occurrence['type'] == 'booking' and not bookings:
+                    continue
+                if occurrence['status'] == 'cancelled' and not cancelled:
+                    continue
+                yield occurrence
+
+    return with_etag(stream_json_list('occurrences', occurrences(), extra={'from': first, 'to': last}), etag)
+
+def _entry_for_exception(entry_id):
+    """(timetable entry, None) the caller may change, or (None, error response)"""
+    entry = query_db("SELECT * FROM timetable WHERE id = %s", (entry_id,), one=True)
+    if not entry:
+        return None, (jsonify({'error': 'Timetable entry not found'}), 404)
+    user = get_current_user()
+    if user['role'] == 'professor' and entry['professor_id'] != user['id']:
+        return None, (jsonify({'error': 'You can only change your own classes'}), 403)
+    return entry, None
+
+@calendar_bp.route('/exceptions', methods=['POST'])
+@jwt_required()
+@role_required('admin', 'professor')
+def create_exception():
+    """Cancel or move one dated occurrence of a weekly class"""
+    data = request.get_json() or {}
+    if data.get('timetable_id') is None:
+        return jsonify({'error': 'timetable_id is required'}), 400
+    try:
+        timetable_id = int(data['timetable_id'])
+    except (TypeError, ValueError):
+        return jsonify({'error': 'timetable_id must be a number'}), 400
+
+    entry, error = _entry_for_exception(timetable_id)
+    if error:
+        return error
+
+    try:
+        exception = save_exception(entry, data, get_jwt_identity())
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+
+    notify_students_of_timetable_changes({(entry['department_id'], entry['batch']): 1})
+
+    return jsonify({
+        'message': 'Class cancelled for this date' if exception['status'] == 'cancelled' else 'Class moved for this date',
+        'exception': serialize_row(exception)
+    }), 201
+
+@calendar_bp.route('/exceptions/<int:exception_id>', methods=['DELETE'])
+@jwt_required()
+@role_required('admin', 'professor')
+def delete_exception(exception_id):
+    """Remove an exception: the occurrence takes place as scheduled again"""
+    exception = query_db("SELECT * FROM timetable_exceptions WHERE id = %s", (exception_id,), one=True)
+    if not exception:
+        return jsonify({'error': 'Exception not found'}), 404
+
+    entry, error = _entry_for_exception(exception['timetable_id'])
+    if error:
+        return error
+
+    execute_db("DELETE FROM timetable_exceptions WHERE id = %s", (exception_id,))
+    invalidate_availability()
+    notify_students_of_timetable_changes({(entry['department_id'], entry['batch']): 1})
+
+    return jsonify({'message': 'Class restored for this date'}), 200
+
+def _feed_json(feed):
+    return {
+        'id': feed['id'],
+        'kind': feed['kind'],
+        'department_id': feed['department_id'],
+        'batch': feed['batch'],
+        'professor_id': feed['professor_id'],
+        'url': url_for('calendar.get_calendar_feed', token=feed['token'], _external=True),
+        'created_at': feed['created_at'].isoformat() if feed['created_at'] else None,
+    }
+
+@calendar_bp.route('/feeds', methods=['GET'])
+@jwt_required()
+@read_only
+def list_calendar_feeds():
+    """The caller's calendar feed subscriptions"""
+    feeds = query_db("SELECT * FROM calendar_feeds WHERE user_id = %s ORDER BY id", (get_jwt_identity(),))
+    return jsonify({'feeds': [_feed_json(feed) for feed in feeds]}), 200
+
+@calendar_bp.route('/feeds', methods=['POST'])
+@jwt_required()
+def create_calendar_feed():
+    """Get a secret .ics URL for a batch timetable, a professor's classes or the auditorium"""
+    data = request.get_json() or {}
+    user = get_current_user()
+    kind = data.get('kind')
+    if kind not in FEED_KINDS:
+        return jsonify({'error': f'kind must be one of: {", ".join(FEED_KINDS)}'}), 400
+
+    department_id = batch = professor_id = None
+    if kind == 'batch':
+        if user['role'] == 'student':
+            department_id, batch = user['department_id'], user['batch']
+            if not department_id or not batch:
+                return jsonify({'error': 'Student department or batch not set'}), 400
+        elif user['role'] == 'admin':
+            department_id, batch = data.get('department_id'), data.get('batch')
+            if not department_id or not batch:
+                return jsonify({'error': 'department_id and batch are required'}), 400
+            if not query_db("SELECT id FROM departments WHERE id = %s", (department_id,), one=True):
+                return jsonify({'error': 'Department not found'}), 404
+        else:
+            return jsonify({'error': 'Unauthorized access'}), 403
+    elif kind == 'professor':
+        if user['role'] == 'professor':
+            professor_id = user['id']
+        elif user['role'] == 'admin':
+            professor_id = data.get('professor_id')
+            if not query_db("SELECT id FROM users WHERE id = %s AND role = 'professor'", (professor_id,), one=True):
+                return jsonify({'error': 'Professor not found'}), 404
+        else:
+            return jsonify({'error': 'Unauthorized access'}), 403
+
+    feed, created = create_feed(user['id'], kind, department_id, str(batch) if batch else None, professor_id)
+    return jsonify({'feed': _feed_json(feed)}), 201 if created else 200
+
+@calendar_bp.route('/feeds/<int:feed_id>', methods=['DELETE'])
+@jwt_required()
+def delete_calendar_feed(feed_id):
+    """Revoke a feed URL"""
+    deleted = execute_db("DELETE FROM calendar_feeds WHERE id = %s AND user_id = %s", (feed_id, get_jwt_identity()))
+    if not deleted:
+        return jsonify({'error': 'Feed not found'}), 404
+    return jsonify({'message': 'Feed revoked'}), 200
+
+@calendar_bp.route('/feeds/<token>.ics', methods=['GET'])
+@read_only
+def get_calendar_feed(token):
+    """iCalendar feed for a subscription token (no login: the token is the credential)"""
+    feed = get_feed(token)
+    if not feed:
+        return jsonify({'error': 'Feed not found'}), 404
+    # Pre-rendered per version; send_file answers If-None-Match / If-Modified-Since and uses sendfile where available
+    try:
+        path, etag = feed_file(feed)
+        return _send_feed(path, etag)
+    except FileNotFoundError:
+        # Removed by another worker between the existence check and the open: render it again
+        path, etag = feed_file(feed, force=True)
+        return _send_feed(path, etag)
+
+def _send_feed(path, etag):
+    return send_file(path, mimetype='text/calendar', conditional=True, etag=etag,
+                     download_name='calendar.ics')
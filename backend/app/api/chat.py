@@ -1,7 +1,9 @@
 from flask import Blueprint, request, jsonify
 from flask_jwt_extended import jwt_required, get_jwt_identity, verify_jwt_in_request
 
-from app.db import query_db, insert_db, execute_db
+from app.db import query_db, insert_db, execute_db, stream_db
+from app.utils.decorators import read_only, get_current_user
+from app.utils.streaming import stream_json_list
 from app.services.notification_service import create_notification
 
 chat_bp = Blueprint('chat', __name__)
@@ -23,7 +25,7 @@ def send_message():
         return jsonify({'error': 'Invalid message type'}), 400
     
     # Get sender info
-    sender = query_db("SELECT * FROM users WHERE id = %s", (user_id_int,), one=True)
+    sender = get_current_user()
     
     # Validate based on role and message type
     if message_type == 'broadcast':
@@ -140,6 +142,7 @@ def send_message():
 
 @chat_bp.route('/messages', methods=['GET'])
 @jwt_required()
+@read_only
 def get_messages():
     """Get messages for the current user"""
     user_id = get_jwt_identity()
@@ -148,50 +151,50 @@ def get_messages():
     message_type = request.args.get('type')
     
     # Get user info
-    user = query_db("SELECT * FROM users WHERE id = %s", (user_id_int,), one=True)
+    user = get_current_user()
     
-    # Get direct messages sent to this user
-    direct_messages = query_db("""
-        SELECT m.*, u.first_name as sender_first_name, u.last_name as sender_last_name,
-               u.role as sender_role, mr.is_read
-        FROM messages m
-        JOIN users u ON m.sender_id = u.id
-        JOIN message_recipients mr ON m.id = mr.message_id
-        WHERE mr.recipient_id = %s
-        ORDER BY m.created_at DESC
-    """, (user_id_int,))
-    
-    # Get broadcast/department/batch messages relevant to this user
-    broadcast_query = """
-        SELECT m.*, u.first_name as sender_first_name, u.last_name as sender_last_name,
-               u.role as sender_role
-        FROM messages m
-        JOIN users u ON m.sender_id = u.id
-        WHERE m.message_type != 'direct'
-        AND m.sender_id != %s
-        AND (
-            m.target_department_id IS NULL 
-            OR m.target_department_id = %s
-        )
-        AND (
-            m.target_batch IS NULL 
-            OR m.target_batch = %s
-        )
-        ORDER BY m.created_at DESC
+    # Direct messages sent to this user plus broadcast/department/batch messages
+    # relevant to this user, merged and sorted by the database and streamed out
+    query = """
+        SELECT * FROM (
+            SELECT m.*, u.first_name as sender_first_name, u.last_name as sender_last_name,
+                   u.role as sender_role, mr.is_read
+            FROM messages m
+            JOIN users u ON m.sender_id = u.id
+            JOIN message_recipients mr ON m.id = mr.message_id
+            WHERE mr.recipient_id = %s
+            UNION ALL
+            SELECT m.*, u.first_name as sender_first_name, u.last_name as sender_last_name,
+                   u.role as sender_role, NULL::boolean as is_read
+            FROM messages m
+            JOIN users u ON m.sender_id = u.id
+            WHERE m.message_type != 'direct'
+            AND m.sender_id != %s
+            AND (
+                m.target_department_id IS NULL 
+                OR m.target_department_id = %s
+            )
+            AND (
+                m.target_batch IS NULL 
+                OR m.target_batch = %s
+            )
+        ) all_messages
     """
-    broadcast_messages = query_db(broadcast_query, (user_id_int, user['department_id'], user.get('batch')))
-    
-    # Combine and sort
-    all_messages = direct_messages + broadcast_messages
-    all_messages.sort(key=lambda x: x['created_at'], reverse=True)
+    params = [user_id_int, user_id_int, user['department_id'], user.get('batch')]
     
     if message_type:
-        all_messages = [m for m in all_messages if m['message_type'] == message_type]
+        query += " WHERE message_type = %s"
+        params.append(message_type)
+    
+    query += " ORDER BY created_at DESC"
+    
+    messages = stream_db(query, tuple(params))
     
-    return jsonify({'messages': all_messages}), 200
+    return stream_json_list('messages', messages)
 
 @chat_bp.route('/sent', methods=['GET'])
 @jwt_required()
+@read_only
 def get_sent_messages():
     """Get messages sent by current user"""
     user_id = get_jwt_identity()
@@ -232,13 +235,14 @@ def mark_message_read(message_id):
 
 @chat_bp.route('/recipients', methods=['GET'])
 @jwt_required()
+@read_only
 def get_recipients():
     """List users by role for chat (professor: admins, professors, students in dept; admin can use for consistency)."""
     user_id = get_jwt_identity()
     user_id_int = int(user_id) if isinstance(user_id, str) else user_id
     role_filter = request.args.get('role')  # 'admin', 'professor', 'student'
 
-    current_user = query_db("SELECT * FROM users WHERE id = %s", (user_id_int,), one=True)
+    current_user = get_current_user()
     if not current_user:
         return jsonify({'error': 'User not found'}), 404
 
@@ -295,6 +299,7 @@ def get_recipients():
 
 @chat_bp.route('/users/search', methods=['GET'])
 @jwt_required()
+@read_only
 def search_users():
     """Search users for messaging"""
     user_id = get_jwt_identity()
@@ -304,7 +309,7 @@ def search_users():
     role = request.args.get('role')
     
     # Get current user info
-    current_user = query_db("SELECT * FROM users WHERE id = %s", (user_id_int,), one=True)
+    current_user = get_current_user()
     
     query = """
         SELECT id, email, first_name, last_name, role, department_id, batch
@@ -340,6 +345,7 @@ def search_users():
 
 @chat_bp.route('/conversations', methods=['GET'])
 @jwt_required()
+@read_only
 def get_conversations():
     """Get list of conversations: people I've had direct messages with (sent or received), with last message."""
     user_id = get_jwt_identity()
@@ -381,6 +387,7 @@ def get_conversations():
 
 @chat_bp.route('/conversation/<int:other_user_id>', methods=['GET'])
 @jwt_required()
+@read_only
 def get_conversation_thread(other_user_id):
     """Get all direct messages between current user and other_user_id (thread for 1:1 chat)."""
     user_id = get_jwt_identity()
@@ -0,0 +1,191 @@
+from datetime import date
+from flask import Blueprint, request, jsonify
+from flask_jwt_extended import jwt_required
+
+from app.db import stream_db
+from app.utils.decorators import role_required, read_only
+from app.utils.serializers import serialize_row
+from app.utils.streaming import stream_csv, stream_ndjson
+from app.utils.validators import int_args
+
+exports_bp = Blueprint('exports', __name__)
+
+EXPORT_FORMATS = ('csv', 'ndjson')
+
+def _export(name, columns, query, params):
+    """
+    Stream a query as CSV or NDJSON (?format=), optionally gzipped (?gzip=1), from a server-side cursor.
+    Filters must be validated before this: once the download starts, an error can no longer be a 400.
+    """
+    fmt = request.args.get('format', 'csv')
+    if fmt not in EXPORT_FORMATS:
+        return jsonify({'error': f'format must be one of: {", ".join(EXPORT_FORMATS)}'}), 400
+    compress = request.args.get('gzip', type=str) in ('1', 'true', 'yes')
+    filename = f'{name}_{date.today().isoformat()}.{fmt}'
+
+    # Tuples are the lightest row type; column names come from `columns`
+    rows = stream_db(query, tuple(params), row_type='tuple')
+    if fmt == 'csv':
+        return stream_csv(columns, rows, filename, compress=compress)
+    return stream_ndjson(rows, filename, transform=lambda row: serialize_row(dict(zip(columns, row))), compress=compress)
+
+def _date_arg(name):
+    value = request.args.get(name)
+    return date.fromisoformat(value) if value else None
+
+@exports_bp.route('/users', methods=['GET'])
+@jwt_required()
+@read_only
+@role_required('admin')
+def export_users():
+    """Export users; optional filters: role, department_id, batch, is_active"""
+    try:
+        filters = int_args(request.args, 'department_id')
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+
+    columns = ['id', 'email', 'role', 'first_name', 'last_name', 'department_code', 'batch',
+               'is_active', 'must_change_password', 'created_at']
+    query = """
+        SELECT u.id, u.email, u.role, u.first_name, u.last_name, d.code, u.batch,
+               u.is_active, u.must_change_password, u.created_at
+        FROM users u
+        LEFT JOIN departments d ON u.department_id = d.id
+        WHERE 1=1
+    """
+    params = []
+
+    if request.args.get('role'):
+        query += " AND u.role = %s"
+        params.append(request.args['role'])
+
+    if filters['department_id'] is not None:
+        query += " AND u.department_id = %s"
+        params.append(filters['department_id'])
+
+    if request.args.get('batch'):
+        query += " AND u.batch = %s"
+        params.append(request.args['batch'])
+
+    if request.args.get('is_active') in ('true', 'false'):
+        query += " AND u.is_active = %s"
+        params.append(request.args['is_active'] == 'true')
+
+    query += " ORDER BY u.id"
+    return _export('users', columns, query, params)
+
+@exports_bp.route('/timetable', methods=['GET'])
+@jwt_required()
+@read_only
+@role_required('admin')
+def export_timetable():
+    """Export timetable entries; optional filters: department_id, batch, day_of_week, professor_id"""
+    try:
+        filters = int_args(request.args, 'department_id', 'day_of_week', 'professor_id')
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    batch = request.args.get('batch', '')
+    filters['batch'] = batch if batch.strip() else None
+
+    columns = ['id', 'department_code', 'batch', 'subject', 'day_of_week', 'start_time', 'end_time',
+               'room_no', 'room_type', 'professor_email', 'professor_first_name', 'professor_last_name']
+    query = """
+        SELECT t.id, d.code, t.batch, t.subject, t.day_of_week, t.start_time, t.end_time,
+               c.room_no, c.room_type, u.email, u.first_name, u.last_name
+        FROM timetable t
+        JOIN departments d ON t.department_id = d.id
+        JOIN classrooms c ON t.classroom_id = c.id
+        JOIN users u ON t.professor_id = u.id
+        WHERE 1=1
+    """
+    params = []
+
+    for arg, column in (('department_id', 't.department_id'), ('batch', 't.batch'),
+                        ('day_of_week', 't.day_of_week'), ('professor_id', 't.professor_id')):
+        if filters[arg] is not None:
+            query += f" AND {column} = %s"
+            params.append(filters[arg])
+
+    query += " ORDER BY t.day_of_week, t.start_time, t.id"
+    return _export('timetable', columns, query, params)
+
+@exports_bp.route('/bookings', methods=['GET'])
+@jwt_required()
+@read_only
+@role_required('admin')
+def export_bookings():
+    """Export auditorium bookings; optional filters: from, to (YYYY-MM-DD), classroom_id"""
+    try:
+        date_from, date_to = _date_arg('from'), _date_arg('to')
+    except ValueError:
+        return jsonify({'error': 'from and to must be dates (YYYY-MM-DD)'}), 400
+    try:
+        classroom_id = int_args(request.args, 'classroom_id')['classroom_id']
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+
+    columns = ['id', 'room_no', 'event_name', 'booking_date', 'start_time', 'end_time', 'status',
+               'booked_by_email']
+    query = """
+        SELECT ab.id, c.room_no, ab.event_name, ab.booking_date, ab.start_time, ab.end_time,
+               ab.status, u.email
+        FROM auditorium_bookings ab
+        JOIN classrooms c ON ab.classroom_id = c.id
+        LEFT JOIN users u ON ab.booked_by = u.id
+        WHERE 1=1
+    """
+    params = []
+
+    if date_from:
+        query += " AND ab.booking_date >= %s"
+        params.append(date_from)
+
+    if date_to:
+        query += " AND ab.booking_date <= %s"
+        params.append(date_to)
+
+    if classroom_id is not None:
+        query += " AND ab.classroom_id = %s"
+        params.append(classroom_id)
+
+    query += " ORDER BY ab.booking_date, ab.start_time, ab.id"
+    return _export('bookings', columns, query, params)
+
+@exports_bp.route('/notifications', methods=['GET'])
+@jwt_required()
+@read_only
+@role_required('admin')
+def export_notifications():
+    """Export notifications; optional filters: user_id, type, since (YYYY-MM-DD)"""
+    try:
+        since = _date_arg('since')
+    except ValueError:
+        return jsonify({'error': 'since must be a date (YYYY-MM-DD)'}), 400
+    try:
+        user_id = int_args(request.args, 'user_id')['user_id']
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+
+    columns = ['id', 'user_id', 'user_email', 'title', 'content', 'notification_type', 'is_read', 'created_at']
+    query = """
+        SELECT n.id, n.user_id, u.email, n.title, n.content, n.notification_type, n.is_read, n.created_at
+        FROM notifications n
+        JOIN users u ON n.user_id = u.id
+        WHERE 1=1
+    """
+    params = []
+
+    if user_id is not None:
+        query += " AND n.user_id = %s"
+        params.append(user_id)
+
+    if request.args.get('type'):
+        query += " AND n.notification_type = %s"
+        params.append(request.args['type'])
+
+    if since:
+        query += " AND n.created_at >= %s"
+        params.append(since)
+
+    query += " ORDER BY n.id"
+    return _export('notifications', columns, query, params)
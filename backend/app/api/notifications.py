@@ -1,6 +1,7 @@
 from flask import Blueprint, request, jsonify
 from flask_jwt_extended import jwt_required, get_jwt_identity
 
+from app.utils.decorators import read_only
 from app.services.notification_service import (
     get_user_notifications,
     mark_notification_read,
@@ -12,6 +13,7 @@ notifications_bp = Blueprint('notifications', __name__)
 
 @notifications_bp.route('', methods=['GET'])
 @jwt_required()
+@read_only
 def get_notifications():
     """Get notifications for current user"""
     user_id = get_jwt_identity()
@@ -48,6 +50,7 @@ def mark_all_read():
 
 @notifications_bp.route('/unread-count', methods=['GET'])
 @jwt_required()
+@read_only
 def unread_notification_count():
     """Get unread notification count"""
     user_id = get_jwt_identity()
@@ -1,15 +1,27 @@
 from flask import Blueprint, request, jsonify
 from flask_jwt_extended import jwt_required, get_jwt_identity
 
-from app.db import query_db, execute_db
-from app.utils.decorators import role_required
+from app.db import query_db
+from app.utils.decorators import role_required, read_only, get_current_user
 from app.utils.serializers import serialize_rows
+from app.utils.pagination import get_page_args, keyset_condition, count_total, KeysetPage, page_fields
+from app.utils.http_cache import make_etag, not_modified, with_etag
 from app.services.notification_service import notify_students_of_timetable_change
+from app.services.timetable_service import update_entry
+from app.services.timetable_version_service import scope_version, professor_scope, VERSION_HEADER
+from app.services.availability_service import GRANULARITIES, suggest_reschedule_slots
 
 professor_bp = Blueprint('professor', __name__)
 
+# Student list order, also the keyset for pagination (matches idx_users_active_students)
+STUDENT_SORT_KEY = ["COALESCE(batch, '')", "COALESCE(last_name, '')", "COALESCE(first_name, '')", 'id']
+
+def student_sort_values(row):
+    return [row['batch'] or '', row['last_name'] or '', row['first_name'] or '', row['id']]
+
 @professor_bp.route('/my-classes', methods=['GET'])
 @jwt_required()
+@read_only
 @role_required('professor')
 def get_my_classes():
     """Get professor's own classes. Optional rescheduled_only=1 returns only classes that were rescheduled (updated_at > created_at)."""
@@ -17,6 +29,12 @@ def get_my_classes():
     day_of_week = request.args.get('day_of_week', type=int)
     rescheduled_only = request.args.get('rescheduled_only', type=str) in ('1', 'true', 'yes')
     
+    version = scope_version(professor_scope(user_id))
+    etag = make_etag('my-classes', user_id, day_of_week, rescheduled_only, version)
+    cached = not_modified(etag, {VERSION_HEADER: str(version)})
+    if cached:
+        return cached
+    
     query = """
         SELECT t.*, d.name as department_name, d.code as department_code,
                c.room_no, c.room_type
@@ -38,7 +56,7 @@ def get_my_classes():
     
     classes = query_db(query, tuple(params))
     classes = serialize_rows(classes)
-    return jsonify({'classes': classes}), 200
+    return with_etag((jsonify({'classes': classes}), 200), etag, {VERSION_HEADER: str(version)})
 
 @professor_bp.route('/reschedule/<int:entry_id>', methods=['PUT'])
 @jwt_required()
@@ -94,78 +112,72 @@ def reschedule_class(entry_id):
     if room_row.get('room_type') != 'classroom':
         return jsonify({'error': 'Only classrooms can be selected for reschedule. Auditoriums are not allowed.'}), 400
     
-    # Check for room conflicts (excluding current entry)
-    room_conflict = query_db("""
-        SELECT id FROM timetable 
-        WHERE classroom_id = %s 
-        AND day_of_week = %s
-        AND id != %s
-        AND (
-            (start_time <= %s AND end_time > %s) OR
-            (start_time < %s AND end_time >= %s) OR
-            (start_time >= %s AND end_time <= %s)
-        )
-    """, (
-        new_room, new_day, entry_id,
-        new_start, new_start,
-        new_end, new_end,
-        new_start, new_end
-    ), one=True)
-    
-    if room_conflict:
-        return jsonify({'error': 'Room is already booked for this time slot'}), 400
-    
-    # Check for professor conflicts (excluding current entry)
-    professor_conflict = query_db("""
-        SELECT id FROM timetable 
-        WHERE professor_id = %s 
-        AND day_of_week = %s
-        AND id != %s
-        AND (
-            (start_time <= %s AND end_time > %s) OR
-            (start_time < %s AND end_time >= %s) OR
-            (start_time >= %s AND end_time <= %s)
+    # Room and professor overlaps (other than this entry) are rejected by the database
+    try:
+        updated_entry = update_entry(
+            entry,
+            {'day_of_week': new_day, 'start_time': new_start, 'end_time': new_end, 'classroom_id': new_room},
+            messages={'timetable_professor_overlap': 'You already have another class at this time'}
         )
-    """, (
-        user_id, new_day, entry_id,
-        new_start, new_start,
-        new_end, new_end,
-        new_start, new_end
-    ), one=True)
-    
-    if professor_conflict:
-        return jsonify({'error': 'You already have another class at this time'}), 400
-    
-    # Update the entry
-    execute_db("""
-        UPDATE timetable 
-        SET day_of_week = %s, start_time = %s, end_time = %s, classroom_id = %s, updated_at = CURRENT_TIMESTAMP
-        WHERE id = %s
-    """, (new_day, new_start, new_end, new_room, entry_id))
-    
-    # Get updated entry
-    updated_entry = query_db("SELECT * FROM timetable WHERE id = %s", (entry_id,), one=True)
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    if not updated_entry:
+        return jsonify({'error': 'Class not found or not authorized'}), 404
     
     # Notify students
     notify_students_of_timetable_change(updated_entry, 'updated')
     
     return jsonify({'message': 'Class rescheduled successfully. Students have been notified.'}), 200
 
+@professor_bp.route('/reschedule/<int:entry_id>/suggestions', methods=['GET'])
+@jwt_required()
+@read_only
+@role_required('professor')
+def reschedule_suggestions(entry_id):
+    """Top free slots to move a class to: ?limit=10&granularity=15&days=0,1,2 (same day, same room, smallest shift first)"""
+    user_id = int(get_jwt_identity())
+    entry = query_db(
+        "SELECT * FROM timetable WHERE id = %s AND professor_id = %s",
+        (entry_id, user_id),
+        one=True
+    )
+    if not entry:
+        return jsonify({'error': 'Class not found or not authorized'}), 404
+    
+    limit = request.args.get('limit', 10, type=int)
+    if not 1 <= limit <= 50:
+        return jsonify({'error': 'limit must be between 1 and 50'}), 400
+    granularity = request.args.get('granularity', 15, type=int)
+    if granularity not in GRANULARITIES:
+        return jsonify({'error': f'granularity must be one of: {", ".join(str(g) for g in GRANULARITIES)}'}), 400
+    try:
+        days = sorted({int(d) for d in request.args.get('days', '').split(',') if d.strip()}) or range(7)
+    except ValueError:
+        return jsonify({'error': 'days must be a comma-separated list of numbers'}), 400
+    if not all(0 <= d <= 6 for d in days):
+        return jsonify({'error': 'days must be between 0 and 6'}), 400
+    
+    suggestions = suggest_reschedule_slots(entry, limit=limit, granularity=granularity, days=days)
+    return jsonify({'entry_id': entry_id, 'suggestions': suggestions}), 200
+
 @professor_bp.route('/students', methods=['GET'])
 @jwt_required()
 @role_required('professor')
 def get_my_students():
-    """Get students in professor's department"""
-    user_id = get_jwt_identity()
-    
+    """Get students in professor's department. Optional keyset pagination: ?limit=&cursor=, ?include_total=exact|estimate"""
     # Get professor's department
-    professor = query_db("SELECT department_id FROM users WHERE id = %s", (user_id,), one=True)
+    professor = get_current_user()
     
     if not professor or not professor['department_id']:
         return jsonify({'error': 'Department not found'}), 400
     
     batch = request.args.get('batch')
     
+    try:
+        limit, cursor = get_page_args((str, str, str, int))
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    
     query = """
         SELECT id, email, first_name, last_name, batch
         FROM users 
@@ -176,14 +188,31 @@ def get_my_students():
     params = [professor['department_id']]
     
     if batch:
-        query += " AND batch = %s"
+        # Written against the indexed expression (same as batch = %s for a non-empty batch)
+        query += " AND COALESCE(batch, '') = %s"
         params.append(batch)
     
-    query += " ORDER BY batch, last_name, first_name"
+    total = count_total(query, tuple(params), request.args.get('include_total'))
+    
+    if cursor:
+        query += " AND " + keyset_condition(STUDENT_SORT_KEY)
+        params.extend(cursor)
+    
+    query += " ORDER BY " + ", ".join(STUDENT_SORT_KEY)
+    
+    if not limit:
+        students = query_db(query, tuple(params))
+        response = {'students': students}
+        if total is not None:
+            response['total'] = total
+        return jsonify(response), 200
     
-    students = query_db(query, tuple(params))
+    query += " LIMIT %s"
+    params.append(limit + 1)
+    page = KeysetPage(query_db(query, tuple(params)), limit, key=student_sort_values)
+    students = list(page)
     
-    return jsonify({'students': students}), 200
+    return jsonify({'students': students, **page_fields(page, total)}), 200
 
 @professor_bp.route('/batches', methods=['GET'])
 @jwt_required()
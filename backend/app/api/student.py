@@ -2,30 +2,56 @@ from flask import Blueprint, request, jsonify
 from flask_jwt_extended import jwt_required, get_jwt_identity
 
 from app.db import query_db
-from app.utils.decorators import role_required
+from app.utils.decorators import role_required, read_only, get_current_user
 from app.utils.serializers import serialize_rows
+from app.utils.pagination import get_page_args, keyset_condition, count_total, KeysetPage, page_fields
+from app.utils.http_cache import make_etag, not_modified, with_etag
+from app.services.timetable_version_service import scope_version, batch_scope, VERSION_HEADER
+from app.services.timetable_snapshot import get_snapshot, fragments_response
 
 student_bp = Blueprint('student', __name__)
 
+# Classmate list order, also the keyset for pagination
+CLASSMATE_SORT_KEY = ["COALESCE(last_name, '')", "COALESCE(first_name, '')", 'id']
+
+def _snapshot_lookup(student):
+    """(version, {day: fragment}) for the student's batch from the timetable snapshot, or None"""
+    snapshot = get_snapshot()
+    if snapshot is None:
+        return None
+    return snapshot.lookup(student['department_id'], student['batch'])
+
 @student_bp.route('/timetable', methods=['GET'])
 @jwt_required()
+@read_only
 @role_required('student')
 def get_my_timetable():
     """Get student's timetable based on their department and batch"""
-    user_id = get_jwt_identity()
-    
     # Get student's department and batch
-    student = query_db(
-        "SELECT department_id, batch FROM users WHERE id = %s",
-        (user_id,),
-        one=True
-    )
+    student = get_current_user()
     
     if not student or not student['department_id'] or not student['batch']:
         return jsonify({'error': 'Student department or batch not set'}), 400
     
     day_of_week = request.args.get('day_of_week', type=int)
     
+    # Served from the compiled snapshot when it is available: no SQL, rows already serialized
+    compiled = _snapshot_lookup(student)
+    if compiled is not None:
+        version, days = compiled
+    else:
+        version = scope_version(batch_scope(student['department_id'], student['batch']))
+    
+    # Unchanged since the client's copy: answer 304 without building the timetable
+    etag = make_etag('student-timetable', student['department_id'], student['batch'], day_of_week, version)
+    cached = not_modified(etag, {VERSION_HEADER: str(version)})
+    if cached:
+        return cached
+    
+    if compiled is not None:
+        fragments = [days.get(day_of_week)] if day_of_week is not None else [days[d] for d in sorted(days)]
+        return with_etag(fragments_response('timetable', fragments), etag, {VERSION_HEADER: str(version)})
+    
     query = """
         SELECT t.*, d.name as department_name, d.code as department_code,
                c.room_no, c.room_type,
@@ -46,10 +72,11 @@ def get_my_timetable():
     
     timetable = query_db(query, tuple(params))
     timetable = serialize_rows(timetable)
-    return jsonify({'timetable': timetable}), 200
+    return with_etag((jsonify({'timetable': timetable}), 200), etag, {VERSION_HEADER: str(version)})
 
 @student_bp.route('/auditorium', methods=['GET'])
 @jwt_required()
+@read_only
 @role_required('student')
 def get_auditorium_schedule():
     """Get auditorium booking schedule (view only)"""
@@ -68,17 +95,12 @@ def get_auditorium_schedule():
 
 @student_bp.route('/today', methods=['GET'])
 @jwt_required()
+@read_only
 @role_required('student')
 def get_today_classes():
     """Get today's classes for the student"""
-    user_id = get_jwt_identity()
-    
     # Get student's department and batch
-    student = query_db(
-        "SELECT department_id, batch FROM users WHERE id = %s",
-        (user_id,),
-        one=True
-    )
+    student = get_current_user()
     
     if not student or not student['department_id'] or not student['batch']:
         return jsonify({'error': 'Student department or batch not set'}), 400
@@ -87,6 +109,20 @@ def get_today_classes():
     from datetime import datetime
     today = datetime.now().weekday()
     
+    compiled = _snapshot_lookup(student)
+    if compiled is not None:
+        version, days = compiled
+    else:
+        version = scope_version(batch_scope(student['department_id'], student['batch']))
+    
+    etag = make_etag('student-today', student['department_id'], student['batch'], today, version)
+    cached = not_modified(etag, {VERSION_HEADER: str(version)})
+    if cached:
+        return cached
+    
+    if compiled is not None:
+        return with_etag(fragments_response('classes', [days.get(today)]), etag, {VERSION_HEADER: str(version)})
+    
     classes = query_db("""
         SELECT t.*, d.name as department_name,
                c.room_no, c.room_type,
@@ -102,34 +138,58 @@ def get_today_classes():
     """, (student['department_id'], student['batch'], today))
     
     classes = serialize_rows(classes)
-    return jsonify({'classes': classes}), 200
+    return with_etag((jsonify({'classes': classes}), 200), etag, {VERSION_HEADER: str(version)})
 
 @student_bp.route('/classmates', methods=['GET'])
 @jwt_required()
+@read_only
 @role_required('student')
 def get_classmates():
-    """Get classmates in the same department and batch"""
+    """Get classmates in the same department and batch. Optional keyset pagination: ?limit=&cursor=, ?include_total=exact|estimate"""
     user_id = get_jwt_identity()
     
     # Get student's department and batch
-    student = query_db(
-        "SELECT department_id, batch FROM users WHERE id = %s",
-        (user_id,),
-        one=True
-    )
+    student = get_current_user()
     
     if not student or not student['department_id'] or not student['batch']:
         return jsonify({'error': 'Student department or batch not set'}), 400
     
-    classmates = query_db("""
+    try:
+        limit, cursor = get_page_args((str, str, int))
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    
+    # batch compared through the indexed expression (idx_users_active_students)
+    query = """
         SELECT id, email, first_name, last_name
         FROM users 
         WHERE role = 'student' 
         AND department_id = %s 
-        AND batch = %s 
+        AND COALESCE(batch, '') = %s 
         AND id != %s
         AND is_active = TRUE
-        ORDER BY last_name, first_name
-    """, (student['department_id'], student['batch'], user_id))
+    """
+    params = [student['department_id'], student['batch'], user_id]
+    
+    total = count_total(query, tuple(params), request.args.get('include_total'))
+    
+    if cursor:
+        query += " AND " + keyset_condition(CLASSMATE_SORT_KEY)
+        params.extend(cursor)
+    
+    query += " ORDER BY " + ", ".join(CLASSMATE_SORT_KEY)
+    
+    if not limit:
+        classmates = query_db(query, tuple(params))
+        response = {'classmates': classmates}
+        if total is not None:
+            response['total'] = total
+        return jsonify(response), 200
+    
+    query += " LIMIT %s"
+    params.append(limit + 1)
+    page = KeysetPage(query_db(query, tuple(params)), limit,
+                      key=lambda r: [r['last_name'] or '', r['first_name'] or '', r['id']])
+    classmates = list(page)
     
-    return jsonify({'classmates': classmates}), 200
+    return jsonify({'classmates': classmates, **page_fields(page, total)}), 200
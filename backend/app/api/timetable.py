@@ -1,21 +1,49 @@
-from flask import Blueprint, request, jsonify
+import math
+from datetime import date, timedelta
+from flask import Blueprint, request, jsonify, current_app
 from flask_jwt_extended import jwt_required, get_jwt_identity
 
-from app.db import query_db, insert_db, execute_db
-from app.utils.decorators import role_required
-from app.utils.serializers import serialize_rows
-from app.services.notification_service import notify_students_of_timetable_change
+from app.db import query_db, stream_db
+from app.utils.decorators import role_required, read_only, get_current_user
+from app.utils.serializers import serialize_row
+from app.utils.streaming import stream_json_list
+from app.utils.http_cache import make_etag, not_modified, with_etag
+from app.utils.validators import int_args
+from app.services.notification_service import (
+    notify_students_of_timetable_change, notify_students_of_timetable_changes
+)
+from app.services.timetable_service import (
+    create_entry, update_entry, plan_changes, apply_plan, parse_time, check_slot, timetable_writes
+)
+from app.services.availability_service import GRANULARITIES, room_masks, encode_mask
+from app.services.timetable_generator import WEEKLY_SLOTS, build_problem, generate, insert_entries
+from app.services.timetable_bulk_service import plan_bulk, apply_bulk
+from app.services.timetable_version_service import (
+    scope_for, scope_version, caller_scope, get_changes, ResyncRequired, VERSION_HEADER
+)
 
 timetable_bp = Blueprint('timetable', __name__)
 
 @timetable_bp.route('', methods=['GET'])
 @jwt_required()
+@read_only
 def get_timetable():
     """Get timetable with filters"""
-    department_id = request.args.get('department_id')
+    # Checked before streaming: once the response has started, a bad value can no longer be a 400
+    try:
+        filters = int_args(request.args, 'department_id', 'day_of_week', 'professor_id')
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    department_id = filters['department_id']
     batch = request.args.get('batch')
-    day_of_week = request.args.get('day_of_week')
-    professor_id = request.args.get('professor_id')
+    day_of_week = filters['day_of_week']
+    professor_id = filters['professor_id']
+    
+    version = scope_version(scope_for(department_id, batch, professor_id))
+    etag = make_etag('timetable', department_id, batch, day_of_week, professor_id, version)
+    cached = not_modified(etag, {VERSION_HEADER: str(version)})
+    if cached:
+        return cached
     
     query = """
         SELECT t.*, d.name as department_name, d.code as department_code,
@@ -37,7 +65,7 @@ def get_timetable():
         query += " AND t.batch = %s"
         params.append(batch)
     
-    if day_of_week is not None and str(day_of_week).strip() != '':
+    if day_of_week is not None:
         query += " AND t.day_of_week = %s"
         params.append(day_of_week)
     
@@ -47,9 +75,37 @@ def get_timetable():
     
     query += " ORDER BY t.day_of_week, t.start_time"
     
-    timetable = query_db(query, tuple(params))
-    timetable = serialize_rows(timetable)
-    return jsonify({'timetable': timetable}), 200
+    timetable = stream_db(query, tuple(params))
+    return with_etag(stream_json_list('timetable', timetable, transform=serialize_row),
+                     etag, {VERSION_HEADER: str(version)})
+
+@timetable_bp.route('/changes', methods=['GET'])
+@jwt_required()
+@read_only
+def get_timetable_changes():
+    """Entries changed since a timetable version (delta sync)"""
+    since = request.args.get('since', 0)
+    try:
+        since = int(since)
+    except (TypeError, ValueError):
+        return jsonify({'error': 'since must be a version number'}), 400
+    if since < 0:
+        return jsonify({'error': 'since must be a version number'}), 400
+    
+    # Students sync their batch and professors their own classes; admins choose the scope
+    try:
+        scope = caller_scope(get_current_user(), request.args)
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    
+    try:
+        result = get_changes(since, **scope)
+    except ResyncRequired:
+        return jsonify({'error': 'Change history no longer covers this version; fetch the full timetable again'}), 410
+    
+    response = jsonify(result)
+    response.headers[VERSION_HEADER] = str(result['version'])
+    return response, 200
 
 @timetable_bp.route('', methods=['POST'])
 @jwt_required()
@@ -70,65 +126,18 @@ def create_timetable_entry():
     if not (0 <= data['day_of_week'] <= 6):
         return jsonify({'error': 'day_of_week must be between 0 and 6'}), 400
     
-    # Check for room conflicts
-    room_conflict = query_db("""
-        SELECT id FROM timetable 
-        WHERE classroom_id = %s 
-        AND day_of_week = %s
-        AND (
-            (start_time <= %s AND end_time > %s) OR
-            (start_time < %s AND end_time >= %s) OR
-            (start_time >= %s AND end_time <= %s)
-        )
-    """, (
-        data['classroom_id'], data['day_of_week'],
-        data['start_time'], data['start_time'],
-        data['end_time'], data['end_time'],
-        data['start_time'], data['end_time']
-    ), one=True)
-    
-    if room_conflict:
-        return jsonify({'error': 'Room is already booked for this time slot'}), 400
-    
-    # Check for professor conflicts
-    professor_conflict = query_db("""
-        SELECT id FROM timetable 
-        WHERE professor_id = %s 
-        AND day_of_week = %s
-        AND (
-            (start_time <= %s AND end_time > %s) OR
-            (start_time < %s AND end_time >= %s) OR
-            (start_time >= %s AND end_time <= %s)
-        )
-    """, (
-        data['professor_id'], data['day_of_week'],
-        data['start_time'], data['start_time'],
-        data['end_time'], data['end_time'],
-        data['start_time'], data['end_time']
-    ), one=True)
-    
-    if professor_conflict:
-        return jsonify({'error': 'Professor is already assigned to another class at this time'}), 400
-    
-    # Create timetable entry
-    entry_id = insert_db("""
-        INSERT INTO timetable 
-        (department_id, batch, classroom_id, professor_id, subject, day_of_week, start_time, end_time, created_by)
-        VALUES (%s, %s, %s, %s, %s, %s, %s, %s, %s)
-    """, (
-        data['department_id'], data['batch'], data['classroom_id'], data['professor_id'],
-        data['subject'], data['day_of_week'], data['start_time'], data['end_time'], user_id
-    ))
-    
-    # Get full entry for notification
-    entry = query_db("SELECT * FROM timetable WHERE id = %s", (entry_id,), one=True)
+    # Room, professor and batch overlaps are rejected by the database in the same statement
+    try:
+        entry = create_entry(data, user_id)
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
     
     # Notify students
     notify_students_of_timetable_change(entry, 'created')
     
     return jsonify({
         'message': 'Timetable entry created successfully',
-        'entry_id': entry_id
+        'entry_id': entry['id']
     }), 201
 
 @timetable_bp.route('/<int:entry_id>', methods=['PUT'])
@@ -143,45 +152,21 @@ def update_timetable_entry(entry_id):
     if not entry:
         return jsonify({'error': 'Timetable entry not found'}), 404
     
-    # Build update query
-    update_fields = []
-    params = []
+    changes = {field: data[field] for field in ('classroom_id', 'day_of_week', 'start_time', 'end_time', 'subject')
+               if field in data}
     
-    if 'classroom_id' in data:
-        update_fields.append("classroom_id = %s")
-        params.append(data['classroom_id'])
-    
-    if 'day_of_week' in data:
-        if not (0 <= data['day_of_week'] <= 6):
-            return jsonify({'error': 'day_of_week must be between 0 and 6'}), 400
-        update_fields.append("day_of_week = %s")
-        params.append(data['day_of_week'])
-    
-    if 'start_time' in data:
-        update_fields.append("start_time = %s")
-        params.append(data['start_time'])
-    
-    if 'end_time' in data:
-        update_fields.append("end_time = %s")
-        params.append(data['end_time'])
-    
-    if 'subject' in data:
-        update_fields.append("subject = %s")
-        params.append(data['subject'])
+    if 'day_of_week' in changes and not (0 <= changes['day_of_week'] <= 6):
+        return jsonify({'error': 'day_of_week must be between 0 and 6'}), 400
     
-    if not update_fields:
+    if not changes:
         return jsonify({'error': 'No fields to update'}), 400
     
-    update_fields.append("updated_at = CURRENT_TIMESTAMP")
-    params.append(entry_id)
-    
-    execute_db(
-        f"UPDATE timetable SET {', '.join(update_fields)} WHERE id = %s",
-        tuple(params)
-    )
-    
-    # Get updated entry
-    updated_entry = query_db("SELECT * FROM timetable WHERE id = %s", (entry_id,), one=True)
+    try:
+        updated_entry = update_entry(entry, changes)
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    if not updated_entry:
+        return jsonify({'error': 'Timetable entry not found'}), 404
     
     # Notify students
     notify_students_of_timetable_change(updated_entry, 'updated')
@@ -200,12 +185,183 @@ def delete_timetable_entry(entry_id):
     # Notify students before deletion
     notify_students_of_timetable_change(entry, 'deleted')
     
-    execute_db("DELETE FROM timetable WHERE id = %s", (entry_id,))
+    with timetable_writes() as cur:
+        cur.execute("DELETE FROM timetable WHERE id = %s", (entry_id,))
     
     return jsonify({'message': 'Timetable entry deleted successfully'}), 200
 
+@timetable_bp.route('/validate', methods=['POST'])
+@jwt_required()
+@role_required('admin')
+def validate_timetable_changes():
+    """Check proposed creates/moves/deletes for conflicts in one pass; optionally apply them atomically"""
+    data = request.get_json(silent=True) or {}
+    
+    try:
+        result = plan_changes(data.get('changes'))
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    
+    plan = result.pop('plan')
+    result['summary'] = {op: len(plan[op]) for op in ('create', 'move', 'delete')}
+    if not data.get('apply'):
+        return jsonify(result), 200
+    
+    if not result['valid']:
+        return jsonify(dict(result, error='Changes have conflicts or errors; nothing was applied', applied=False)), 400
+    
+    try:
+        applied = apply_plan(plan, get_jwt_identity())
+    except ValueError as e:
+        # Someone else changed the timetable after validation; the whole set was rolled back
+        return jsonify(dict(result, valid=False, error=str(e), applied=False)), 409
+    
+    notify_students_of_timetable_changes(applied['changed'])
+    
+    return jsonify(dict(result, applied=True, created_ids=applied['created_ids'])), 200
+
+@timetable_bp.route('/bulk', methods=['POST'])
+@jwt_required()
+@role_required('admin')
+def bulk_timetable_operations():
+    """Shift, reassign or clone every entry matching a filter, checked as one set (apply: true to write)"""
+    data = request.get_json(silent=True) or {}
+    
+    try:
+        result = plan_bulk(data.get('operations'))
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    
+    plan = result.pop('plan')
+    if not data.get('apply'):
+        return jsonify(result), 200
+    
+    if not result['valid']:
+        return jsonify(dict(result, error='Operations have conflicts or errors; nothing was applied', applied=False)), 400
+    
+    try:
+        applied = apply_bulk(plan, get_jwt_identity())
+    except ValueError as e:
+        # The timetable changed after validation; the whole set was rolled back
+        return jsonify(dict(result, valid=False, error=str(e), applied=False)), 409
+    
+    # One notification per affected student, however many of their classes changed
+    notify_students_of_timetable_changes(applied['changed'])
+    
+    return jsonify(dict(result, applied=True, created_ids=applied['created_ids'])), 200
+
+@timetable_bp.route('/generate', methods=['POST'])
+@jwt_required()
+@role_required('admin')
+def generate_timetable():
+    """Generate a conflict-free timetable for a list of courses; dry_run returns it without saving"""
+    data = request.get_json(silent=True) or {}
+    user_id = get_jwt_identity()
+    
+    try:
+        budget = float(data.get('time_budget') or current_app.config['TIMETABLE_GENERATOR_BUDGET_SECONDS'])
+    except (TypeError, ValueError):
+        return jsonify({'error': 'time_budget must be a number of seconds'}), 400
+    # NaN would make the search deadline unreachable
+    if not (math.isfinite(budget) and budget > 0):
+        return jsonify({'error': 'time_budget must be a positive number of seconds'}), 400
+    budget = min(budget, current_app.config['TIMETABLE_GENERATOR_MAX_BUDGET_SECONDS'])
+    
+    try:
+        problem = build_problem(data)
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    
+    def report(progress):
+        try:
+            from app import socketio
+            if socketio is not None:
+                socketio.emit('timetable_generate_progress', progress, room=f'user_{user_id}')
+        except Exception:
+            pass  # Vercel/serverless: socketio may be None; ignore
+    
+    result = generate(problem, budget, on_progress=report)
+    entries = result.pop('entries')
+    if data.get('dry_run'):
+        return jsonify(dict(result, entries=[serialize_row(e) for e in entries], created=0)), 200
+    
+    try:
+        ids = insert_entries(entries, user_id)
+    except ValueError as e:
+        # The timetable changed while generating; nothing was saved
+        return jsonify({'error': str(e)}), 409
+    
+    notify_students_of_timetable_changes(_count_by_batch(entries))
+    
+    return jsonify(dict(result, created=len(ids), entry_ids=ids)), 201
+
+def _count_by_batch(entries):
+    counts = {}
+    for entry in entries:
+        key = (entry['department_id'], entry['batch'])
+        counts[key] = counts.get(key, 0) + 1
+    return counts
+
+@timetable_bp.route('/availability', methods=['GET'])
+@jwt_required()
+@read_only
+def get_room_availability():
+    """
+    Occupancy bitmap per room per day (hex; first cell = high bit of the first digit).
+    Optional: granularity (minutes), day_start, day_end, room_type, min_capacity, room_ids,
+    date (YYYY-MM-DD: that Monday-Sunday week, including confirmed auditorium bookings).
+    """
+    granularity = request.args.get('granularity', 15, type=int)
+    if granularity not in GRANULARITIES:
+        return jsonify({'error': f'granularity must be one of: {", ".join(str(g) for g in GRANULARITIES)}'}), 400
+    
+    try:
+        day_start = parse_time(request.args.get('day_start') or current_app.config['AVAILABILITY_DAY_START'], 'day_start')
+        day_end = parse_time(request.args.get('day_end') or current_app.config['AVAILABILITY_DAY_END'], 'day_end')
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    
+    try:
+        room_ids = [int(r) for r in request.args.get('room_ids', '').split(',') if r.strip()]
+    except ValueError:
+        return jsonify({'error': 'room_ids must be a comma-separated list of numbers'}), 400
+    
+    week_start = None
+    if request.args.get('date'):
+        try:
+            day = date.fromisoformat(request.args['date'])
+        except ValueError:
+            return jsonify({'error': 'date must be YYYY-MM-DD'}), 400
+        week_start = day - timedelta(days=day.weekday())
+    
+    if day_end <= day_start:
+        return jsonify({'error': 'day_end must be after day_start'}), 400
+    
+    start_minute = day_start.hour * 60 + day_start.minute
+    end_minute = day_end.hour * 60 + day_end.minute
+    rooms, cells = room_masks(
+        granularity, start_minute, end_minute,
+        room_type=request.args.get('room_type') or None,
+        min_capacity=request.args.get('min_capacity', type=int),
+        room_ids=room_ids,
+        week_start=week_start
+    )
+    
+    return jsonify({
+        'granularity': granularity,
+        'day_start': day_start.strftime('%H:%M'),
+        'day_end': day_end.strftime('%H:%M'),
+        'cells': cells,
+        'week_start': week_start.isoformat() if week_start else None,
+        'rooms': [{
+            'id': room['id'], 'room_no': room['room_no'], 'room_type': room['room_type'],
+            'capacity': room['capacity'], 'busy': [encode_mask(mask, cells) for mask in room['masks']],
+        } for room in rooms],
+    }), 200
+
 @timetable_bp.route('/available-rooms', methods=['GET'])
 @jwt_required()
+@read_only
 def get_available_rooms():
     """Get available rooms for a specific day and time"""
     day_of_week = request.args.get('day_of_week', type=int)
@@ -215,34 +371,27 @@ def get_available_rooms():
     if day_of_week is None or not start_time or not end_time:
         return jsonify({'error': 'day_of_week, start_time, and end_time are required'}), 400
     
-    # Get all rooms not booked at this time
+    try:
+        start_time, end_time = check_slot(start_time, end_time)
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    
+    # Get all rooms not booked at this time (range overlap on the indexed slot column)
     available = query_db("""
         SELECT c.* FROM classrooms c
-        WHERE c.id NOT IN (
-            SELECT classroom_id FROM timetable 
-            WHERE day_of_week = %s
-            AND (
-                (start_time <= %s AND end_time > %s) OR
-                (start_time < %s AND end_time >= %s) OR
-                (start_time >= %s AND end_time <= %s)
-            )
+        WHERE NOT EXISTS (
+            SELECT 1 FROM timetable t
+            WHERE t.classroom_id = c.id
+            AND t.day_of_week = %s
+            AND t.slot && timerange(%s, %s, '[)')
         )
         ORDER BY c.room_no
-    """, (
-        day_of_week,
-        start_time, start_time,
-        end_time, end_time,
-        start_time, end_time
-    ))
+    """, (day_of_week, start_time, end_time))
     
     return jsonify({'rooms': available}), 200
 
 
-# Weekly time slots (9:00-9:55 style) for seed data - (start, end)
-WEEKLY_SLOTS = [
-    ('09:00', '09:55'), ('10:00', '10:55'), ('11:00', '11:55'), ('12:00', '12:55'),
-    ('13:00', '13:55'), ('14:00', '14:55'), ('15:00', '15:55'), ('16:00', '16:55'),
-]
+# Subjects for seed data
 SAMPLE_SUBJECTS = [
     'Data Structures', 'Algorithms', 'DBMS', 'Computer Networks', 'Operating Systems',
     'Software Engineering', 'Calculus', 'Signals & Systems', 'Digital Electronics',
@@ -267,33 +416,22 @@ def seed_timetable():
     if not professors:
         return jsonify({'error': 'No professors found. Add at least one professor to seed timetable.'}), 400
 
-    created = 0
+    # One sample course per department + batch, placed by the generator around existing entries
     batches = ['2024', '2025', '2026']
-    user_id = get_jwt_identity()
-    idx = 0
-    for day in range(7):
-        for slot_idx, (start_time, end_time) in enumerate(WEEKLY_SLOTS):
-            dept = departments[idx % len(departments)]
-            room = classrooms[idx % len(classrooms)]
-            prof = professors[idx % len(professors)]
-            batch = batches[idx % len(batches)]
-            subject = SAMPLE_SUBJECTS[idx % len(SAMPLE_SUBJECTS)]
-            conflict = query_db("""
-                SELECT id FROM timetable
-                WHERE classroom_id = %s AND day_of_week = %s
-                AND ((start_time <= %s AND end_time > %s) OR (start_time < %s AND end_time >= %s))
-            """, (room['id'], day, start_time, start_time, end_time, end_time), one=True)
-            if not conflict:
-                try:
-                    insert_db("""
-                        INSERT INTO timetable
-                        (department_id, batch, classroom_id, professor_id, subject, day_of_week, start_time, end_time, created_by)
-                        VALUES (%s, %s, %s, %s, %s, %s, %s, %s, %s)
-                    """, (dept['id'], batch, room['id'], prof['id'], subject, day, start_time, end_time, user_id))
-                    created += 1
-                except Exception:
-                    pass
-            idx += 1
+    groups = [(dept['id'], batch) for dept in departments for batch in batches]
+    hours = max(1, len(WEEKLY_SLOTS) * 7 // len(groups))
+    courses = [{
+        'department_id': dept_id, 'batch': batch, 'subject': SAMPLE_SUBJECTS[idx % len(SAMPLE_SUBJECTS)],
+        'professor_id': professors[idx % len(professors)]['id'], 'hours_per_week': hours,
+    } for idx, (dept_id, batch) in enumerate(groups)]
+    
+    try:
+        problem = build_problem({'courses': courses, 'days': list(range(7))})
+        result = generate(problem, budget_seconds=2)
+        created = len(insert_entries(result['entries'], get_jwt_identity()))
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    
     return jsonify({
         'message': f'Sample timetable created: {created} entries added.',
         'created': created
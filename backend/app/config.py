@@ -1,4 +1,5 @@
 import os
+import tempfile
 from dotenv import load_dotenv
 
 load_dotenv()
@@ -10,10 +11,79 @@ class Config:
     DB_USER = os.getenv('DB_USER', 'postgres')
     DB_PASSWORD = os.getenv('DB_PASSWORD', 'password')
     DB_PORT = os.getenv('DB_PORT', '5432')
+    # Optional read replica for @read_only endpoints (empty DB_REPLICA_HOST disables routing).
+    # Other DB_REPLICA_* settings default to the primary's values.
+    DB_REPLICA_HOST = os.getenv('DB_REPLICA_HOST', '')
+    DB_REPLICA_PORT = os.getenv('DB_REPLICA_PORT', DB_PORT)
+    DB_REPLICA_NAME = os.getenv('DB_REPLICA_NAME', DB_NAME)
+    DB_REPLICA_USER = os.getenv('DB_REPLICA_USER', DB_USER)
+    DB_REPLICA_PASSWORD = os.getenv('DB_REPLICA_PASSWORD', DB_PASSWORD)
+    # Route the caller's reads to the primary for this long after their own write
+    DB_REPLICA_STICKY_SECONDS = float(os.getenv('DB_REPLICA_STICKY_SECONDS', 5))
+    # Route every SELECT outside write requests to the replica, not just @read_only endpoints
+    DB_REPLICA_ROUTE_SELECTS = os.getenv('DB_REPLICA_ROUTE_SELECTS', 'False').lower() == 'true'
+    # After a replica error, use the primary for this long before trying the replica again
+    DB_REPLICA_RETRY_SECONDS = float(os.getenv('DB_REPLICA_RETRY_SECONDS', 30))
+    
+    # Rows fetched per round trip by server-side cursors (stream_db)
+    DB_STREAM_FETCH_SIZE = int(os.getenv('DB_STREAM_FETCH_SIZE', 500))
+    # Apply pending migrations on startup (set False to run scripts/migrate.py in deploys instead)
+    AUTO_MIGRATE = os.getenv('AUTO_MIGRATE', 'True').lower() == 'true'
+    
+    # Lazy initialization (default on Vercel): create the DB pool on first use and
+    # import each blueprint on the first request for its url prefix
+    LAZY_INIT = os.getenv('LAZY_INIT', 'True' if os.getenv('VERCEL') == '1' else 'False').lower() == 'true'
     
     # JWT
     JWT_SECRET_KEY = os.getenv('JWT_SECRET_KEY', 'your-secret-key-change-in-production')
     JWT_ACCESS_TOKEN_EXPIRES = 86400  # 24 hours
+    # How often each worker pulls token revocations made by other workers
+    REVOCATION_SYNC_SECONDS = float(os.getenv('REVOCATION_SYNC_SECONDS', 5))
+    
+    # Per-process user cache for identity/role resolution (0 disables)
+    USER_CACHE_TTL = float(os.getenv('USER_CACHE_TTL', 60))
+    USER_CACHE_SIZE = int(os.getenv('USER_CACHE_SIZE', 10000))
+    
+    # bcrypt cost factors; pick BCRYPT_ROUNDS with scripts/calibrate_bcrypt.py.
+    # Temporary (generated, must-change) passwords use the cheaper BCRYPT_TEMP_ROUNDS.
+    BCRYPT_ROUNDS = int(os.getenv('BCRYPT_ROUNDS', 12))
+    BCRYPT_TEMP_ROUNDS = int(os.getenv('BCRYPT_TEMP_ROUNDS', 10))
+    # Password hashing pool: 'thread' (bcrypt releases the GIL) or 'process'
+    PASSWORD_HASH_EXECUTOR = os.getenv('PASSWORD_HASH_EXECUTOR', 'thread')
+    PASSWORD_HASH_WORKERS = int(os.getenv('PASSWORD_HASH_WORKERS', os.cpu_count() or 4))
+    # Passwords handed to each process-pool worker at a time in bulk hashing
+    PASSWORD_HASH_CHUNK_SIZE = int(os.getenv('PASSWORD_HASH_CHUNK_SIZE', 16))
+    
+    # CSV user imports: rows validated, hashed and inserted (one commit) per chunk
+    IMPORT_CHUNK_SIZE = int(os.getenv('IMPORT_CHUNK_SIZE', 500))
+    # Admin dashboard statistics snapshot cache (counters are maintained by triggers)
+    STATS_CACHE_SECONDS = float(os.getenv('STATS_CACHE_SECONDS', 30))
+    # Background import jobs (?async=1): uploads are stored in the job row; a worker keeps a local
+    # copy here while it runs the job. A running job with no progress for IMPORT_JOB_STALE_SECONDS
+    # is resumed by another worker, on any host.
+    IMPORT_JOB_DIR = os.getenv('IMPORT_JOB_DIR', os.path.join(tempfile.gettempdir(), 'campusone-imports'))
+    IMPORT_JOB_STALE_SECONDS = int(os.getenv('IMPORT_JOB_STALE_SECONDS', 120))
+    # Timetable generator (POST /api/timetable/generate): default and maximum search time per request
+    TIMETABLE_GENERATOR_BUDGET_SECONDS = float(os.getenv('TIMETABLE_GENERATOR_BUDGET_SECONDS', 10))
+    TIMETABLE_GENERATOR_MAX_BUDGET_SECONDS = float(os.getenv('TIMETABLE_GENERATOR_MAX_BUDGET_SECONDS', 60))
+    # Room availability bitmaps (GET /api/timetable/availability): day window and per-process cache
+    AVAILABILITY_DAY_START = os.getenv('AVAILABILITY_DAY_START', '08:00')
+    AVAILABILITY_DAY_END = os.getenv('AVAILABILITY_DAY_END', '20:00')
+    AVAILABILITY_CACHE_SECONDS = float(os.getenv('AVAILABILITY_CACHE_SECONDS', 30))
+    # Timetable change log kept for delta sync (GET /api/timetable/changes); older clients resync in full
+    TIMETABLE_CHANGES_RETENTION_DAYS = int(os.getenv('TIMETABLE_CHANGES_RETENTION_DAYS', 30))
+    # Compiled timetable snapshot (memory-mapped, shared by worker processes) serving student timetable
+    # reads without SQL. Workers check for timetable changes every TIMETABLE_SNAPSHOT_CHECK_SECONDS;
+    # the whole file is recompiled every TIMETABLE_SNAPSHOT_MAX_AGE_SECONDS to pick up renames.
+    TIMETABLE_SNAPSHOT = os.getenv('TIMETABLE_SNAPSHOT', 'True').lower() == 'true'
+    TIMETABLE_SNAPSHOT_PATH = os.getenv('TIMETABLE_SNAPSHOT_PATH', os.path.join(tempfile.gettempdir(), 'campusone-timetable.snap'))
+    TIMETABLE_SNAPSHOT_CHECK_SECONDS = float(os.getenv('TIMETABLE_SNAPSHOT_CHECK_SECONDS', 2))
+    TIMETABLE_SNAPSHOT_MAX_AGE_SECONDS = int(os.getenv('TIMETABLE_SNAPSHOT_MAX_AGE_SECONDS', 300))
+    # Dated calendar (GET /api/calendar): longest range per request and lifetime of cached expanded weeks
+    CALENDAR_MAX_DAYS = int(os.getenv('CALENDAR_MAX_DAYS', 366))
+    CALENDAR_CACHE_SECONDS = float(os.getenv('CALENDAR_CACHE_SECONDS', 300))
+    # Rendered .ics feeds (GET /api/calendar/feeds/<token>.ics), one file per target and version
+    CALENDAR_FEED_DIR = os.getenv('CALENDAR_FEED_DIR', os.path.join(tempfile.gettempdir(), 'campusone-feeds'))
     
     # Mail
     MAIL_SERVER = os.getenv('MAIL_SERVER', 'smtp.gmail.com')
@@ -22,6 +92,24 @@ class Config:
     MAIL_USERNAME = os.getenv('MAIL_USERNAME', '')
     MAIL_PASSWORD = os.getenv('MAIL_PASSWORD', '')
     MAIL_DEFAULT_SENDER = os.getenv('MAIL_DEFAULT_SENDER', os.getenv('MAIL_USERNAME', ''))
+    # Outgoing mail is queued in email_outbox and delivered by a worker over one reused
+    # SMTP connection (started by create_app in each process). Off on Vercel, where mail is sent inline.
+    EMAIL_QUEUE = os.getenv('EMAIL_QUEUE', str(os.getenv('VERCEL') != '1')).lower() == 'true'
+    # Run the delivery worker in this process (started by create_app and when mail is queued)
+    EMAIL_WORKER = os.getenv('EMAIL_WORKER', 'True').lower() == 'true'
+    EMAIL_QUEUE_BATCH_SIZE = int(os.getenv('EMAIL_QUEUE_BATCH_SIZE', 50))
+    EMAIL_QUEUE_POLL_SECONDS = float(os.getenv('EMAIL_QUEUE_POLL_SECONDS', 2))
+    # Provider quotas (0 = unlimited)
+    EMAIL_RATE_PER_SECOND = float(os.getenv('EMAIL_RATE_PER_SECOND', 5))
+    EMAIL_MAX_PER_HOUR = int(os.getenv('EMAIL_MAX_PER_HOUR', 0))
+    # Retries: delay doubles from EMAIL_RETRY_BASE_SECONDS up to EMAIL_RETRY_MAX_SECONDS
+    EMAIL_MAX_ATTEMPTS = int(os.getenv('EMAIL_MAX_ATTEMPTS', 5))
+    EMAIL_RETRY_BASE_SECONDS = float(os.getenv('EMAIL_RETRY_BASE_SECONDS', 30))
+    EMAIL_RETRY_MAX_SECONDS = float(os.getenv('EMAIL_RETRY_MAX_SECONDS', 3600))
+    # Close the SMTP connection after this long without mail to send
+    EMAIL_SMTP_IDLE_SECONDS = float(os.getenv('EMAIL_SMTP_IDLE_SECONDS', 30))
+    # Sent and failed rows (bodies already cleared) are deleted after this many days
+    EMAIL_OUTBOX_RETENTION_DAYS = int(os.getenv('EMAIL_OUTBOX_RETENTION_DAYS', 7))
     
     # CORS – allow frontend origin; never leave empty (causes CORS block)
     # Normalize: strip trailing slashes so "https://example.com/" matches browser origin "https://example.com"
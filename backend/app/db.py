@@ -1,16 +1,37 @@
-import os
-import re
+import time
+import uuid
+import threading
+from contextlib import contextmanager
 import psycopg2
 from psycopg2 import pool
-from psycopg2.extras import RealDictCursor
-from flask import g
+from psycopg2.extras import RealDictCursor, NamedTupleCursor
+from flask import g, request, current_app
+from itsdangerous import BadSignature, TimestampSigner
 
 connection_pool = None
+_pool_settings = None
+_migrate_on_first_use = False
+_pool_lock = threading.Lock()
 
-def init_db(app):
-    """Initialize the database connection pool"""
-    global connection_pool
-    connection_pool = psycopg2.pool.ThreadedConnectionPool(
+# Optional read replica (DB_REPLICA_HOST). Reads are routed here only when safe:
+# the endpoint is marked @read_only (or DB_REPLICA_ROUTE_SELECTS is on), the request
+# has not written yet, and the caller has not written within DB_REPLICA_STICKY_SECONDS.
+# The caller's last write travels with the client as a signed LAST_WRITE_HEADER token
+# (identity + timestamp), so every worker process and host sees it.
+replica_pool = None
+_replica_settings = None
+_replica_down_until = 0.0
+_replica_options = {'sticky_seconds': 5, 'route_selects': False, 'retry_seconds': 30}
+
+LAST_WRITE_HEADER = 'X-Last-Write'
+
+def init_db(app, lazy=False):
+    """
+    Initialize the database connection pool.
+    With lazy=True the pool is created, and pending migrations applied, on first get_db().
+    """
+    global _pool_settings, _migrate_on_first_use
+    _pool_settings = dict(
         minconn=1,
         maxconn=10,
         host=app.config['DB_HOST'],
@@ -19,57 +40,253 @@ def init_db(app):
         password=app.config['DB_PASSWORD'],
         port=app.config['DB_PORT']
     )
+    _migrate_on_first_use = lazy and app.config.get('AUTO_MIGRATE', True)
+    _init_replica(app)
+    if not lazy:
+        _ensure_pool()
+
+def _ensure_pool():
+    """Create the pool once per process (thread-safe)"""
+    global connection_pool, _migrate_on_first_use
+    if connection_pool is not None:
+        return connection_pool
+    with _pool_lock:
+        if connection_pool is None:
+            new_pool = psycopg2.pool.ThreadedConnectionPool(**_pool_settings)
+            if _migrate_on_first_use:
+                from .migrations import migrate
+                conn = new_pool.getconn()
+                try:
+                    migrate(conn)
+                finally:
+                    new_pool.putconn(conn)
+                _migrate_on_first_use = False
+            connection_pool = new_pool
+    return connection_pool
+
+def _init_replica(app):
+    """Read replica settings; the replica pool itself is created on first routed read"""
+    global _replica_settings
+    _replica_options.update(
+        sticky_seconds=app.config.get('DB_REPLICA_STICKY_SECONDS', 5),
+        route_selects=app.config.get('DB_REPLICA_ROUTE_SELECTS', False),
+        retry_seconds=app.config.get('DB_REPLICA_RETRY_SECONDS', 30),
+    )
+    if not app.config.get('DB_REPLICA_HOST'):
+        _replica_settings = None
+        return
+    _replica_settings = dict(
+        minconn=0,
+        maxconn=app.config.get('DB_REPLICA_MAXCONN', 10),
+        host=app.config['DB_REPLICA_HOST'],
+        database=app.config.get('DB_REPLICA_NAME') or app.config['DB_NAME'],
+        user=app.config.get('DB_REPLICA_USER') or app.config['DB_USER'],
+        password=app.config.get('DB_REPLICA_PASSWORD') or app.config['DB_PASSWORD'],
+        port=app.config.get('DB_REPLICA_PORT') or app.config['DB_PORT'],
+        connect_timeout=app.config.get('DB_REPLICA_CONNECT_TIMEOUT', 2)
+    )
+
+def _mark_replica_down(error):
+    """Send reads to the primary for DB_REPLICA_RETRY_SECONDS after a replica failure"""
+    global _replica_down_until
+    _replica_down_until = time.monotonic() + _replica_options['retry_seconds']
+    try:
+        current_app.logger.warning(f"Read replica unavailable, falling back to primary: {error}")
+    except RuntimeError:
+        pass
+
+def _ensure_replica_pool():
+    global replica_pool
+    if replica_pool is None:
+        with _pool_lock:
+            if replica_pool is None:
+                replica_pool = psycopg2.pool.ThreadedConnectionPool(**_replica_settings)
+    return replica_pool
+
+def _request_identity():
+    """JWT identity of the current request, if any (used for read-your-writes stickiness)"""
+    try:
+        from flask_jwt_extended import get_jwt_identity
+        return get_jwt_identity()
+    except Exception:
+        return None
+
+def _write_signer():
+    return TimestampSigner(current_app.config['JWT_SECRET_KEY'], salt='db-last-write')
+
+def _record_write():
+    """Pin this request, and the caller for a short window (see sign_last_write), to the primary"""
+    g.db_wrote = True
+    if _replica_settings is not None and 'db_write_identity' not in g:
+        g.db_write_identity = _request_identity()
+
+def sign_last_write(response):
+    """after_request hook: hand a caller who wrote a signed LAST_WRITE_HEADER token to send back"""
+    identity = g.get('db_write_identity')
+    if identity is not None:
+        response.headers[LAST_WRITE_HEADER] = _write_signer().sign(str(identity)).decode()
+    return response
+
+def _wrote_recently(identity):
+    """True when the request carries this caller's LAST_WRITE_HEADER token from the sticky window"""
+    token = request.headers.get(LAST_WRITE_HEADER)
+    if not token:
+        return False
+    try:
+        signed_identity = _write_signer().unsign(token, max_age=_replica_options['sticky_seconds'])
+    except BadSignature:  # forged, another secret, or expired (SignatureExpired)
+        return False
+    return signed_identity.decode() == str(identity)
+
+def _use_replica():
+    if _replica_settings is None or time.monotonic() < _replica_down_until:
+        return False
+    if g.get('db_wrote') or not (g.get('db_read_only') or _replica_options['route_selects']):
+        return False
+    identity = _request_identity()
+    if identity is not None and _wrote_recently(identity):
+        return False
+    return True
+
+def get_read_db():
+    """
+    Connection for read-only queries: the replica when configured and safe to use,
+    otherwise the primary (same as get_db()).
+    """
+    if 'read_db' in g:
+        return g.read_db
+    if not _use_replica():
+        return get_db()
+    try:
+        g.read_db = _ensure_replica_pool().getconn()
+    except psycopg2.Error as e:
+        _mark_replica_down(e)
+        return get_db()
+    return g.read_db
+
+def _release_read_db(broken=False):
+    conn = g.pop('read_db', None)
+    if conn is not None:
+        replica_pool.putconn(conn, close=broken or conn.closed)
 
 def init_schema(app):
     """
-    Create tables and seed data if they don't exist.
-    Idempotent: safe to run on every app startup.
+    Apply pending versioned migrations (see app/migrations.py).
+    When the schema is current this is a single version check.
     """
-    schema_path = os.path.join(os.path.dirname(__file__), '..', 'schema_init.sql')
-    if not os.path.isfile(schema_path):
+    if not app.config.get('AUTO_MIGRATE', True):
         return
-    with open(schema_path, 'r', encoding='utf-8') as f:
-        content = f.read()
-    conn = get_db()
-    try:
-        with conn.cursor() as cur:
-            for stmt in re.split(r';\s*\n', content):
-                stmt = stmt.strip()
-                if not stmt:
-                    continue
-                cur.execute(stmt)
-        conn.commit()
-    except Exception:
-        conn.rollback()
-        raise
+    from .migrations import migrate
+    applied = migrate(get_db())
+    if applied:
+        app.logger.info(f"Applied migrations: {', '.join(str(v) for v in applied)}")
 
 def get_db():
     """Get a database connection from the pool"""
     if 'db' not in g:
-        g.db = connection_pool.getconn()
+        g.db = _ensure_pool().getconn()
     return g.db
 
 def close_db(e=None):
-    """Return the connection to the pool"""
+    """Return the connection(s) to the pool"""
     db = g.pop('db', None)
     if db is not None:
         connection_pool.putconn(db)
+    _release_read_db()
+
+def _is_read(query):
+    q = query.strip().upper()
+    # Plain EXPLAIN only plans the statement; EXPLAIN ANALYZE would run it
+    return q.startswith('SELECT') or (q.startswith('EXPLAIN') and 'ANALYZE' not in q.split('SELECT', 1)[0])
 
 def query_db(query, args=(), one=False):
     """Execute a query and return results as dictionaries"""
+    if _is_read(query):
+        conn = get_read_db()
+        if conn is not g.get('db'):
+            try:
+                return _fetch(conn, query, args, one)
+            except psycopg2.OperationalError as e:
+                # Replica went away or cancelled the query: retry once on the primary
+                _release_read_db(broken=True)
+                _mark_replica_down(e)
+        return _fetch(get_db(), query, args, one)
     conn = get_db()
     try:
         with conn.cursor(cursor_factory=RealDictCursor) as cur:
             cur.execute(query, args)
-            if query.strip().upper().startswith('SELECT'):
-                rv = cur.fetchall()
-                return (dict(rv[0]) if rv else None) if one else [dict(row) for row in rv]
             conn.commit()
+            _record_write()
             return cur.rowcount
     except Exception as e:
         conn.rollback()
         raise e
 
+def _fetch(conn, query, args, one):
+    try:
+        with conn.cursor(cursor_factory=RealDictCursor) as cur:
+            cur.execute(query, args)
+            rv = cur.fetchall()
+            return (dict(rv[0]) if rv else None) if one else [dict(row) for row in rv]
+    except Exception as e:
+        if not conn.closed:
+            conn.rollback()
+        raise e
+
+# Row types for stream_db: 'dict' rows come straight from RealDictCursor (no copy),
+# 'namedtuple' and 'tuple' are lighter for exports and internal processing.
+ROW_FACTORIES = {
+    'dict': RealDictCursor,
+    'namedtuple': NamedTupleCursor,
+    'tuple': None,
+}
+
+def stream_db(query, args=(), fetch_size=None, row_type='dict'):
+    """Yield rows of a SELECT through a named server-side cursor.
+
+    Only `fetch_size` rows are held in memory at a time, so large reads stay flat.
+    Use with `stream_with_context` when the generator outlives the view function.
+    """
+    if row_type not in ROW_FACTORIES:
+        raise ValueError(f'Unknown row_type: {row_type}')
+    if fetch_size is None:
+        fetch_size = current_app.config.get('DB_STREAM_FETCH_SIZE', 500)
+
+    def open_cursor(conn):
+        cur = conn.cursor(name=f'stream_{uuid.uuid4().hex}', cursor_factory=ROW_FACTORIES[row_type])
+        cur.itersize = fetch_size
+        cur.execute(query, args)
+        return cur
+
+    conn = get_read_db()
+    try:
+        try:
+            cur = open_cursor(conn)
+        except psycopg2.OperationalError as e:
+            if conn is g.get('db'):
+                raise
+            # Replica failed before any row was sent: retry on the primary
+            _release_read_db(broken=True)
+            _mark_replica_down(e)
+            conn = get_db()
+            cur = open_cursor(conn)
+    except Exception:
+        if not conn.closed:
+            conn.rollback()
+        raise
+    try:
+        for row in cur:
+            yield row
+    except Exception:
+        conn.rollback()
+        raise
+    finally:
+        if not cur.closed:
+            try:
+                cur.close()
+            except psycopg2.Error:
+                conn.rollback()
+
 def insert_db(query, args=()):
     """Execute an insert and return the new ID"""
     conn = get_db()
@@ -77,11 +294,25 @@ def insert_db(query, args=()):
         with conn.cursor() as cur:
             cur.execute(query + " RETURNING id", args)
             conn.commit()
+            _record_write()
             return cur.fetchone()[0]
     except Exception as e:
         conn.rollback()
         raise e
 
+@contextmanager
+def transaction():
+    """Run several statements on one cursor and commit them together (rollback on error)"""
+    conn = get_db()
+    try:
+        with conn.cursor(cursor_factory=RealDictCursor) as cur:
+            yield cur
+        conn.commit()
+        _record_write()
+    except Exception:
+        conn.rollback()
+        raise
+
 def execute_db(query, args=()):
     """Execute a query without returning results (for UPDATE, DELETE)"""
     conn = get_db()
@@ -89,6 +320,7 @@ def execute_db(query, args=()):
         with conn.cursor() as cur:
             cur.execute(query, args)
             conn.commit()
+            _record_write()
             return cur.rowcount
     except Exception as e:
         conn.rollback()
@@ -0,0 +1,99 @@
+"""
+Versioned schema migrations.
+
+Migrations are numbered SQL files in backend/migrations (0001_initial_schema.sql, ...).
+Applied versions are recorded in the schema_version table, so startup only runs
+a single version check and applies pending files under an advisory lock, each in
+its own transaction.
+"""
+import os
+import re
+import psycopg2
+
+MIGRATIONS_DIR = os.path.join(os.path.dirname(__file__), '..', 'migrations')
+
+# Arbitrary application-wide key for pg_advisory_xact_lock
+MIGRATION_LOCK_KEY = 724311
+
+_FILENAME_RE = re.compile(r'^(\d{4})_(\w+)\.sql$')
+
+def list_migrations():
+    """Return [(version, name, path)] for migration files, sorted by version"""
+    if not os.path.isdir(MIGRATIONS_DIR):
+        return []
+    migrations = []
+    for filename in os.listdir(MIGRATIONS_DIR):
+        match = _FILENAME_RE.match(filename)
+        if match:
+            migrations.append((int(match.group(1)), match.group(2), os.path.join(MIGRATIONS_DIR, filename)))
+    return sorted(migrations)
+
+def current_version(conn):
+    """Latest applied version (0 if schema_version does not exist yet)"""
+    try:
+        with conn.cursor() as cur:
+            cur.execute("SELECT COALESCE(MAX(version), 0) FROM schema_version")
+            version = cur.fetchone()[0]
+        conn.commit()
+        return version
+    except psycopg2.errors.UndefinedTable:
+        conn.rollback()
+        return 0
+
+class MigrationError(Exception):
+    """A migration failed; the ones listed in `applied` were committed before it"""
+    def __init__(self, number, name, error, applied):
+        super().__init__(f'Migration {number:04d}_{name} failed: {error}')
+        self.applied = applied
+
+def _apply_next(conn, number, name, path):
+    """Apply one migration in its own transaction; False if another process already did"""
+    try:
+        with conn.cursor() as cur:
+            # Serialize concurrent boots (several workers / cold starts at once)
+            cur.execute("SELECT pg_advisory_xact_lock(%s)", (MIGRATION_LOCK_KEY,))
+            cur.execute("""
+                CREATE TABLE IF NOT EXISTS schema_version (
+                    version INTEGER PRIMARY KEY,
+                    name VARCHAR(200) NOT NULL,
+                    applied_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+                )
+            """)
+            # Re-read under the lock: another process may have migrated meanwhile
+            cur.execute("SELECT 1 FROM schema_version WHERE version = %s", (number,))
+            if cur.fetchone():
+                conn.commit()
+                return False
+            with open(path, 'r', encoding='utf-8') as f:
+                cur.execute(f.read())
+            cur.execute(
+                "INSERT INTO schema_version (version, name) VALUES (%s, %s)",
+                (number, name)
+            )
+        conn.commit()
+        return True
+    except Exception:
+        conn.rollback()
+        raise
+
+def migrate(conn):
+    """
+    Apply pending migrations, each in its own transaction, and return the versions applied.
+    A failing migration is rolled back alone: earlier ones stay applied and MigrationError
+    names the one that needs attention (e.g. 0007 lists overlapping timetable entries).
+    """
+    migrations = list_migrations()
+    version = current_version(conn)
+    if not migrations or version >= migrations[-1][0]:
+        return []
+
+    applied = []
+    for number, name, path in migrations:
+        if number <= version:
+            continue
+        try:
+            if _apply_next(conn, number, name, path):
+                applied.append(number)
+        except Exception as e:
+            raise MigrationError(number, name, e, applied) from e
+    return applied
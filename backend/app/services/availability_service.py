@@ -0,0 +1,213 @@
+"""
+Room availability as occupancy bitmaps.
+
+A day between AVAILABILITY_DAY_START and AVAILABILITY_DAY_END is split into cells
+of `granularity` minutes; bit i of a room's day mask is set when anything
+occupies cell i. One query loads the selected rooms with their weekly timetable
+entries and, for a date-specific week, that week's cancelled and moved
+occurrences (timetable_exceptions) and confirmed auditorium bookings. Results
+are cached per process for AVAILABILITY_CACHE_SECONDS and dropped on local
+timetable, exception, booking and classroom writes.
+
+Reschedule suggestions intersect the professor's, the batch's and every eligible
+classroom's free cells with bitwise operations, then scan the runs long enough
+for the class.
+"""
+import time
+import heapq
+import threading
+from datetime import timedelta, time as time_of_day
+
+from flask import current_app
+
+from app.db import query_db
+
+GRANULARITIES = (5, 10, 15, 30, 60)
+MAX_CACHE_ENTRIES = 256
+
+_cache = {}
+_cache_lock = threading.Lock()
+
+def invalidate_availability():
+    """Drop cached bitmaps after a write that changes room occupancy"""
+    with _cache_lock:
+        _cache.clear()
+
+def _minutes(t):
+    return t.hour * 60 + t.minute + t.second / 60
+
+def _config_minutes(name):
+    return int(_minutes(time_of_day.fromisoformat(current_app.config[name])))
+
+def _clock(minutes):
+    minutes = int(round(minutes))
+    return f'{minutes // 60:02d}:{minutes % 60:02d}'
+
+def cell_mask(start, end, day_start, granularity, cells):
+    """Cells of [day_start, ...) touched by [start, end), as a bitmask (bit 0 = first cell)"""
+    first = max(0, int((_minutes(start) - day_start) // granularity))
+    last = min(cells, -int(-(_minutes(end) - day_start) // granularity))
+    if last <= first:
+        return 0
+    return ((1 << (last - first)) - 1) << first
+
+def encode_mask(mask, cells):
+    """Hex bitmap read left to right: the first cell is the high bit of the first digit"""
+    width = -(-cells // 4)
+    bits = format(mask, f'0{cells}b')[::-1] + '0' * (width * 4 - cells)
+    return format(int(bits, 2), f'0{width}x')
+
+def _load(granularity, day_start, day_end, room_type, min_capacity, room_ids, week_start):
+    params = []
+    if week_start is None:
+        occupied = "SELECT classroom_id, day_of_week AS day, start_time, end_time FROM timetable"
+    else:
+        # That week's occurrences: cancelled and moved-away ones free their slot, moved ones
+        # (to new_date, or the same date at another time or room) take the new one
+        week_end = week_start + timedelta(days=6)
+        occupied = """
+            SELECT t.classroom_id, t.day_of_week AS day, t.start_time, t.end_time FROM timetable t
+            WHERE NOT EXISTS (SELECT 1 FROM timetable_exceptions x
+                              WHERE x.timetable_id = t.id AND x.exception_date = %s::date + t.day_of_week)
+            UNION ALL
+            SELECT COALESCE(x.classroom_id, t.classroom_id),
+                   EXTRACT(ISODOW FROM COALESCE(x.new_date, x.exception_date))::int - 1, x.start_time, x.end_time
+            FROM timetable_exceptions x JOIN timetable t ON t.id = x.timetable_id
+            WHERE x.status = 'moved' AND COALESCE(x.new_date, x.exception_date) BETWEEN %s AND %s
+            UNION ALL
+            SELECT classroom_id, EXTRACT(ISODOW FROM booking_date)::int - 1, start_time, end_time
+            FROM auditorium_bookings
+            WHERE status = 'confirmed' AND booking_date BETWEEN %s AND %s
+        """
+        params.extend([week_start, week_start, week_end, week_start, week_end])
+    query = f"""
+        SELECT c.id, c.room_no, c.room_type, c.capacity, o.day, o.start_time, o.end_time
+        FROM classrooms c
+        LEFT JOIN ({occupied}) o ON o.classroom_id = c.id WHERE 1=1
+    """
+
+    if room_type:
+        query += " AND c.room_type = %s"
+        params.append(room_type)
+    if min_capacity is not None:
+        query += " AND c.capacity >= %s"
+        params.append(min_capacity)
+    if room_ids:
+        query += " AND c.id = ANY(%s)"
+        params.append(list(room_ids))
+    query += " ORDER BY c.room_no"
+
+    cells = int((day_end - day_start) // granularity)
+    rooms = {}
+    for row in query_db(query, tuple(params)):
+        room = rooms.get(row['id'])
+        if room is None:
+            room = rooms[row['id']] = {
+                'id': row['id'], 'room_no': row['room_no'], 'room_type': row['room_type'],
+                'capacity': row['capacity'], 'masks': [0] * 7,
+            }
+        if row['day'] is not None:
+            room['masks'][row['day']] |= cell_mask(row['start_time'], row['end_time'], day_start, granularity, cells)
+    return list(rooms.values()), cells
+
+def room_masks(granularity, day_start, day_end, room_type=None, min_capacity=None, room_ids=None, week_start=None):
+    """
+    ([{'id', 'room_no', 'room_type', 'capacity', 'masks': [int x 7]}], cells) for the selected rooms.
+    day_start/day_end are minutes after midnight; week_start (a Monday) applies that week's
+    exceptions and bookings.
+    """
+    key = (granularity, day_start, day_end, room_type, min_capacity,
+           tuple(sorted(room_ids)) if room_ids else None, week_start)
+    ttl = current_app.config.get('AVAILABILITY_CACHE_SECONDS', 30)
+    cached = _cache.get(key)
+    if cached is not None and time.monotonic() - cached[0] < ttl:
+        return cached[1]
+
+    result = _load(granularity, day_start, day_end, room_type, min_capacity, room_ids, week_start)
+    with _cache_lock:
+        if len(_cache) >= MAX_CACHE_ENTRIES:
+            _cache.clear()
+        _cache[key] = (time.monotonic(), result)
+    return result
+
+def fit_starts(free, length):
+    """Cells where `length` consecutive free cells begin (free & free>>1 & ... by doubling shifts)"""
+    run, covered = free, 1
+    while covered < length:
+        step = min(covered, length - covered)
+        run &= run >> step
+        covered += step
+    return run
+
+def suggest_reschedule_slots(entry, limit=10, granularity=15, days=range(7)):
+    """
+    Ranked free (day, start, room) options for moving a timetable entry: times when the
+    professor, the batch and an eligible classroom are all free for the entry's duration.
+    Same day first, then same room, then the smallest shift from the current start.
+    """
+    day_start = _config_minutes('AVAILABILITY_DAY_START')
+    day_end = _config_minutes('AVAILABILITY_DAY_END')
+    cells = int((day_end - day_start) // granularity)
+    duration = _minutes(entry['end_time']) - _minutes(entry['start_time'])
+    length = -int(-duration // granularity)
+    if length > cells:
+        return []
+
+    # Professor and batch occupancy for the week (excluding the entry itself), one query
+    professor_busy, batch_busy = [0] * 7, [0] * 7
+    for row in query_db("""
+        SELECT professor_id, department_id, batch, day_of_week, start_time, end_time FROM timetable
+        WHERE id <> %s AND (professor_id = %s OR (department_id = %s AND batch = %s))
+    """, (entry['id'], entry['professor_id'], entry['department_id'], entry['batch'])):
+        mask = cell_mask(row['start_time'], row['end_time'], day_start, granularity, cells)
+        if row['professor_id'] == entry['professor_id']:
+            professor_busy[row['day_of_week']] |= mask
+        if row['department_id'] == entry['department_id'] and row['batch'] == entry['batch']:
+            batch_busy[row['day_of_week']] |= mask
+
+    size = query_db("""
+        SELECT COUNT(*) AS students FROM users
+        WHERE role = 'student' AND is_active = TRUE AND department_id = %s AND batch = %s
+    """, (entry['department_id'], entry['batch']), one=True)['students']
+    rooms, _ = room_masks(granularity, day_start, day_end, room_type='classroom')
+    rooms = [room for room in rooms if room['capacity'] is None or room['capacity'] >= size]
+
+    own = cell_mask(entry['start_time'], entry['end_time'], day_start, granularity, cells)
+    current = (_minutes(entry['start_time']) - day_start) / granularity
+    all_cells = (1 << cells) - 1
+    candidates = []
+    for day in days:
+        common = all_cells & ~professor_busy[day] & ~batch_busy[day]
+        if not fit_starts(common, length):
+            continue
+        for room in rooms:
+            busy = room['masks'][day]
+            if room['id'] == entry['classroom_id'] and day == entry['day_of_week']:
+                busy &= ~own
+            starts = fit_starts(common & ~busy, length)
+            while starts:
+                low = starts & -starts
+                cell = low.bit_length() - 1
+                starts ^= low
+                same_day, same_room = day == entry['day_of_week'], room['id'] == entry['classroom_id']
+                shift = abs(cell - current)
+                if same_day and same_room and shift == 0:
+                    continue  # where it is now
+                candidates.append(((not same_day, not same_room, shift, abs(day - entry['day_of_week']),
+                                    room['room_no']), day, cell, room))
+
+    suggestions = []
+    for rank, day, cell, room in heapq.nsmallest(limit, candidates, key=lambda c: c[0]):
+        start = day_start + cell * granularity
+        suggestions.append({
+            'day_of_week': day,
+            'start_time': _clock(start),
+            'end_time': _clock(start + duration),
+            'classroom_id': room['id'],
+            'room_no': room['room_no'],
+            'capacity': room['capacity'],
+            'same_day': not rank[0],
+            'same_room': not rank[1],
+            'shift_minutes': int(round((cell - current) * granularity)),
+        })
+    return suggestions
@@ -0,0 +1,123 @@
+"""
+Set-based bulk operations on users for admins.
+
+Users are selected by an ID list or a filter (role, department_id, batch,
+is_active); admin accounts are never selected. Each action is one UPDATE ...
+RETURNING statement, followed by one token revocation or identity cache
+invalidation for all affected users.
+"""
+from app.db import query_db, transaction
+from app.services.revocation_service import revoke_user_tokens
+from app.services.user_cache import invalidate_users
+
+BULK_ACTIONS = ('deactivate', 'reactivate', 'move', 'force_password_reset')
+FILTER_FIELDS = ('role', 'department_id', 'batch', 'is_active')
+BULK_ROLES = ('professor', 'student')  # roles a filter may select (never admin)
+MAX_BULK_IDS = 50000
+
+def build_selection(data):
+    """WHERE clause and params for the users selected by user_ids or filter; raises ValueError"""
+    user_ids = data.get('user_ids')
+    filters = data.get('filter')
+    if (user_ids is None) == (filters is None):
+        raise ValueError('Provide exactly one of user_ids or filter')
+
+    # Admin accounts are never changed in bulk
+    where = ["role <> 'admin'"]
+    params = []
+    if user_ids is not None:
+        if not isinstance(user_ids, list) or not user_ids or len(user_ids) > MAX_BULK_IDS:
+            raise ValueError(f'user_ids must be a list of 1 to {MAX_BULK_IDS} ids')
+        try:
+            params.append([int(u) for u in user_ids])
+        except (TypeError, ValueError):
+            raise ValueError('user_ids must be numbers')
+        where.append("id = ANY(%s)")
+        return ' AND '.join(where), params
+
+    if not isinstance(filters, dict) or not any(filters.get(f) not in (None, '') for f in FILTER_FIELDS):
+        raise ValueError(f'filter needs at least one of: {", ".join(FILTER_FIELDS)}')
+    unknown = set(filters) - set(FILTER_FIELDS)
+    if unknown:
+        raise ValueError(f'Unknown filter fields: {", ".join(sorted(unknown))}')
+    for field in FILTER_FIELDS:
+        value = filters.get(field)
+        if value in (None, ''):
+            continue
+        if field == 'role' and value not in BULK_ROLES:
+            raise ValueError(f'role must be one of: {", ".join(BULK_ROLES)}')
+        if field == 'department_id':
+            try:
+                value = int(value)
+            except (TypeError, ValueError):
+                raise ValueError('department_id must be a number')
+        if field == 'batch':
+            value = str(value)
+        if field == 'is_active' and not isinstance(value, bool):
+            value = str(value).lower() == 'true'
+        where.append(f"{field} = %s")
+        params.append(value)
+    return ' AND '.join(where), params
+
+def _set_clause(action, data):
+    """SET clause, its params, and a condition that skips rows already in the target state"""
+    if action == 'deactivate':
+        return "is_active = FALSE", [], "is_active = TRUE"
+    if action == 'reactivate':
+        return "is_active = TRUE", [], "is_active = FALSE"
+    if action == 'force_password_reset':
+        return "must_change_password = TRUE", [], None
+    # move
+    department_id = data.get('department_id')
+    batch = data.get('batch')
+    if department_id in (None, '') and batch in (None, ''):
+        raise ValueError('move needs department_id and/or batch')
+    sets, params, changed = [], [], []
+    if department_id not in (None, ''):
+        sets.append("department_id = %s")
+        changed.append("department_id IS DISTINCT FROM %s")
+        try:
+            params.append(int(department_id))
+        except (TypeError, ValueError):
+            raise ValueError('department_id must be a number')
+    if batch not in (None, ''):
+        sets.append("batch = %s")
+        changed.append("batch IS DISTINCT FROM %s")
+        params.append(str(batch))
+    return ', '.join(sets), params, '(' + ' OR '.join(changed) + ')'
+
+def _by_role(rows):
+    counts = {}
+    for row in rows:
+        counts[row['role']] = counts.get(row['role'], 0) + 1
+    return counts
+
+def bulk_update_users(action, data, dry_run=False):
+    """Apply one bulk action; returns {'action', 'affected', 'by_role'} (raises ValueError on bad input)"""
+    if action not in BULK_ACTIONS:
+        raise ValueError(f'action must be one of: {", ".join(BULK_ACTIONS)}')
+    where, where_params = build_selection(data)
+    set_sql, set_params, pending = _set_clause(action, data)
+    condition_params = set_params if action == 'move' else []
+    if pending:
+        where += f" AND {pending}"
+
+    if dry_run:
+        rows = query_db(f"SELECT role, COUNT(*) AS count FROM users WHERE {where} GROUP BY role",
+                        tuple(where_params + condition_params))
+        by_role = {row['role']: row['count'] for row in rows}
+        return {'action': action, 'dry_run': True, 'affected': sum(by_role.values()), 'by_role': by_role}
+
+    with transaction() as cur:
+        cur.execute(f"UPDATE users SET {set_sql} WHERE {where} RETURNING id, role",
+                    tuple(set_params + where_params + condition_params))
+        rows = cur.fetchall()
+
+    user_ids = [row['id'] for row in rows]
+    if user_ids:
+        if action in ('deactivate', 'force_password_reset'):
+            # Existing sessions end; also drops the users from the identity cache
+            revoke_user_tokens(user_ids)
+        else:
+            invalidate_users(user_ids)
+    return {'action': action, 'affected': len(user_ids), 'by_role': _by_role(rows)}
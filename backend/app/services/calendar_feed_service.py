@@ -0,0 +1,205 @@
+"""
+Tokenized iCalendar feeds.
+
+A feed token names a target: a department + batch, a professor, or the
+auditorium. Each target is rendered to one .ics file in CALENDAR_FEED_DIR whose
+name carries the versions it was built from (timetable scope and exceptions, or
+bookings), so a request whose versions match an existing file is served
+straight from disk, and any timetable, exception or booking write makes the
+next request render a new file. Weekly classes are written as one recurring
+event each; cancelled and moved occurrences as EXDATE / RECURRENCE-ID overrides.
+"""
+import os
+import glob
+import secrets
+import tempfile
+from datetime import datetime, timedelta, timezone
+
+from flask import current_app
+
+from app.db import query_db, insert_db
+from app.utils.http_cache import make_etag
+from app.utils.ical import escape_text, local_datetime, utc_datetime, calendar
+from app.services.calendar_service import calendar_versions, scope_condition
+
+FEED_KINDS = ('batch', 'professor', 'auditorium')
+ICAL_DAYS = ('MO', 'TU', 'WE', 'TH', 'FR', 'SA', 'SU')
+# Past bookings kept in the auditorium feed
+BOOKING_HISTORY_DAYS = 30
+
+def feed_scope(feed):
+    """Timetable filter for a feed row (empty for the auditorium)"""
+    if feed['kind'] == 'batch':
+        return {'department_id': feed['department_id'], 'batch': feed['batch']}
+    if feed['kind'] == 'professor':
+        return {'professor_id': feed['professor_id']}
+    return {}
+
+def feed_versions(feed):
+    """Versions the feed content depends on"""
+    timetable, exceptions, bookings = calendar_versions(feed_scope(feed))
+    return (bookings,) if feed['kind'] == 'auditorium' else (timetable, exceptions)
+
+def get_feed(token):
+    """Feed row for a token, or None (unknown token or deactivated owner)"""
+    return query_db("""
+        SELECT f.id, f.kind, f.department_id, f.batch, f.professor_id
+        FROM calendar_feeds f
+        JOIN users u ON u.id = f.user_id
+        WHERE f.token = %s AND u.is_active = TRUE
+    """, (token,), one=True)
+
+def create_feed(user_id, kind, department_id=None, batch=None, professor_id=None):
+    """The user's feed for a target, creating it with a new token if needed; returns (row, created)"""
+    existing = query_db("""
+        SELECT * FROM calendar_feeds
+        WHERE user_id = %s AND kind = %s AND department_id IS NOT DISTINCT FROM %s
+        AND batch IS NOT DISTINCT FROM %s AND professor_id IS NOT DISTINCT FROM %s
+    """, (user_id, kind, department_id, batch, professor_id), one=True)
+    if existing:
+        return existing, False
+    feed_id = insert_db("""
+        INSERT INTO calendar_feeds (token, user_id, kind, department_id, batch, professor_id)
+        VALUES (%s, %s, %s, %s, %s, %s)
+    """, (secrets.token_urlsafe(32), user_id, kind, department_id, batch, professor_id))
+    return query_db("SELECT * FROM calendar_feeds WHERE id = %s", (feed_id,), one=True), True
+
+def _first_date(entry):
+    """First date on the entry's weekday on or after it was created"""
+    start = (entry['created_at'] or datetime.now()).date()
+    return start + timedelta(days=(entry['day_of_week'] - start.weekday()) % 7)
+
+def _class_events(scope, stamp):
+    where, params = scope_condition(scope)
+    entries = query_db(f"""
+        SELECT t.id, t.subject, t.batch, t.day_of_week, t.start_time, t.end_time, t.created_at,
+               d.code as department_code, c.room_no,
+               u.first_name as professor_first_name, u.last_name as professor_last_name
+        FROM timetable t
+        JOIN departments d ON t.department_id = d.id
+        JOIN classrooms c ON t.classroom_id = c.id
+        JOIN users u ON t.professor_id = u.id
+        WHERE {where}
+        ORDER BY t.day_of_week, t.start_time, t.id
+    """, tuple(params))
+    exceptions = {}
+    for row in query_db(f"""
+        SELECT x.timetable_id, x.exception_date, x.status, x.new_date, x.start_time, x.end_time,
+               x.note, c.room_no
+        FROM timetable_exceptions x
+        JOIN timetable t ON t.id = x.timetable_id
+        LEFT JOIN classrooms c ON c.id = x.classroom_id
+        WHERE {where}
+        ORDER BY x.exception_date
+    """, tuple(params)):
+        exceptions.setdefault(row['timetable_id'], []).append(row)
+
+    events = []
+    for entry in entries:
+        uid = f"timetable-{entry['id']}@campusone"
+        first = _first_date(entry)
+        summary = escape_text(entry['subject'])
+        description = escape_text(f"{entry['professor_first_name'] or ''} {entry['professor_last_name'] or ''}".strip()
+                                  + f" - {entry['department_code']} {entry['batch']}")
+        own = [x for x in exceptions.get(entry['id'], ()) if x['exception_date'] >= first]
+        event = [
+            ('UID', uid), ('DTSTAMP', stamp), ('SUMMARY', summary),
+            ('DTSTART', local_datetime(first, entry['start_time'])),
+            ('DTEND', local_datetime(first, entry['end_time'])),
+            ('RRULE', f"FREQ=WEEKLY;BYDAY={ICAL_DAYS[entry['day_of_week']]}"),
+            ('LOCATION', escape_text(f"Room {entry['room_no']}")),
+            ('DESCRIPTION', description),
+        ]
+        cancelled = [local_datetime(x['exception_date'], entry['start_time']) for x in own if x['status'] == 'cancelled']
+        if cancelled:
+            event.append(('EXDATE', ','.join(cancelled)))
+        events.append(event)
+        for x in own:
+            if x['status'] != 'moved':
+                continue
+            day = x['new_date'] or x['exception_date']
+            events.append([
+                ('UID', uid), ('DTSTAMP', stamp), ('SUMMARY', summary),
+                ('RECURRENCE-ID', local_datetime(x['exception_date'], entry['start_time'])),
+                ('DTSTART', local_datetime(day, x['start_time'])),
+                ('DTEND', local_datetime(day, x['end_time'])),
+                ('LOCATION', escape_text(f"Room {x['room_no'] or entry['room_no']}")),
+                ('DESCRIPTION', escape_text(x['note']) if x['note'] else description),
+            ])
+    return events
+
+def _booking_events(stamp):
+    bookings = query_db("""
+        SELECT ab.id, ab.event_name, ab.booking_date, ab.start_time, ab.end_time, c.room_no
+        FROM auditorium_bookings ab
+        JOIN classrooms c ON ab.classroom_id = c.id
+        WHERE ab.status = 'confirmed' AND ab.booking_date >= CURRENT_DATE - %s
+        ORDER BY ab.booking_date, ab.start_time
+    """, (BOOKING_HISTORY_DAYS,))
+    return [[
+        ('UID', f"booking-{b['id']}@campusone"), ('DTSTAMP', stamp),
+        ('SUMMARY', escape_text(b['event_name'] or 'Auditorium booking')),
+        ('DTSTART', local_datetime(b['booking_date'], b['start_time'])),
+        ('DTEND', local_datetime(b['booking_date'], b['end_time'])),
+        ('LOCATION', escape_text(b['room_no'])),
+    ] for b in bookings]
+
+def _feed_name(feed):
+    if feed['kind'] == 'batch':
+        department = query_db("SELECT code FROM departments WHERE id = %s", (feed['department_id'],), one=True)
+        return f"{department['code'] if department else ''} {feed['batch']} timetable".strip()
+    if feed['kind'] == 'professor':
+        professor = query_db("SELECT first_name, last_name FROM users WHERE id = %s", (feed['professor_id'],), one=True)
+        name = f"{professor['first_name'] or ''} {professor['last_name'] or ''}".strip() if professor else ''
+        return f"{name} classes".strip()
+    return 'Auditorium bookings'
+
+def _older(name, key, versions):
+    """Whether a render file name is for versions strictly behind `versions` (never a newer render)"""
+    try:
+        found = tuple(int(v) for v in name[len(key) + 1:-len('.ics')].split('-'))
+    except ValueError:
+        return False
+    return (len(found) == len(versions) and found != tuple(versions)
+            and all(a <= b for a, b in zip(found, versions)))
+
+def feed_file(feed, force=False):
+    """
+    (path, etag) of the rendered feed for its current versions, rendering it if needed
+    (or always, with force: the caller found the file gone).
+    """
+    target = (feed['kind'], feed['department_id'], feed['batch'], feed['professor_id'])
+    versions = feed_versions(feed)
+    key = make_etag('feed', *target)
+    etag = make_etag(key, *versions)
+    directory = current_app.config['CALENDAR_FEED_DIR']
+    path = os.path.join(directory, f"{key}-{'-'.join(str(v) for v in versions)}.ics")
+    if not force and os.path.exists(path):
+        return path, etag
+
+    stamp = utc_datetime(datetime.now(timezone.utc))
+    events = _booking_events(stamp) if feed['kind'] == 'auditorium' else _class_events(feed_scope(feed), stamp)
+    os.makedirs(directory, exist_ok=True)
+    # A unique temp file per render: threads and processes may render the same feed at once
+    fd, tmp = tempfile.mkstemp(dir=directory, prefix=f'{key}-', suffix='.tmp')
+    try:
+        with os.fdopen(fd, 'w', encoding='utf-8', newline='') as f:
+            f.write(calendar(_feed_name(feed), events))
+        os.replace(tmp, path)
+    except BaseException:
+        try:
+            os.remove(tmp)
+        except OSError:
+            pass
+        raise
+
+    # Renders for lower versions are never served again. A worker that read stale versions
+    # (e.g. from a replica) must not delete a peer's newer file, so anything not strictly
+    # behind is kept.
+    for old in glob.glob(os.path.join(directory, f'{key}-*.ics')):
+        if old != path and _older(os.path.basename(old), key, versions):
+            try:
+                os.remove(old)
+            except OSError:
+                pass
+    return path, etag
@@ -0,0 +1,275 @@
+"""
+Dated calendar occurrences.
+
+The timetable holds weekly rows (day_of_week) and auditorium bookings are dated.
+A calendar range is expanded one Monday-Sunday week at a time: every weekly entry
+in the caller's scope gets an occurrence on its day, timetable_exceptions cancel
+or move single occurrences, and confirmed bookings are merged in. Weeks are
+cached per process, keyed by the timetable, exception and booking versions they
+were built from (timetable_versions), so any write elsewhere produces a new key.
+"""
+import time
+import threading
+from datetime import date, timedelta
+
+import psycopg2
+from flask import current_app
+
+from app.db import query_db, transaction
+from app.utils.serializers import serialize_row
+from app.services.timetable_service import CONFLICT_MESSAGES, check_slot
+from app.services.availability_service import invalidate_availability
+from app.services.timetable_version_service import scope_for
+
+EXCEPTIONS_SCOPE = 'exceptions'
+BOOKINGS_SCOPE = 'bookings'
+EXCEPTION_STATUSES = ('cancelled', 'moved')
+# Serializes exception writes so two one-off moves cannot both take the same slot
+EXCEPTION_LOCK_KEY = 724313
+MAX_CACHE_ENTRIES = 512
+
+ENTRY_QUERY = """
+    SELECT t.id, t.department_id, t.batch, t.classroom_id, t.professor_id, t.subject,
+           t.day_of_week, t.start_time, t.end_time,
+           d.code as department_code, c.room_no,
+           u.first_name as professor_first_name, u.last_name as professor_last_name
+    FROM timetable t
+    JOIN departments d ON t.department_id = d.id
+    JOIN classrooms c ON t.classroom_id = c.id
+    JOIN users u ON t.professor_id = u.id
+"""
+
+_weeks = {}
+_weeks_lock = threading.Lock()
+
+def week_start(day):
+    """Monday of the week containing `day`"""
+    return day - timedelta(days=day.weekday())
+
+def scope_condition(scope, alias='t'):
+    """SQL condition and params restricting timetable rows to a caller scope"""
+    clauses, params = [], []
+    for column in ('department_id', 'batch', 'professor_id'):
+        if scope.get(column):
+            clauses.append(f"{alias}.{column} = %s")
+            params.append(scope[column])
+    return ' AND '.join(clauses) or 'TRUE', params
+
+def calendar_versions(scope):
+    """(timetable scope, exceptions, bookings) versions a calendar view depends on"""
+    timetable_scope = scope_for(scope.get('department_id'), scope.get('batch'), scope.get('professor_id'))
+    rows = query_db("SELECT scope, version FROM timetable_versions WHERE scope IN (%s, %s, %s)",
+                    (timetable_scope, EXCEPTIONS_SCOPE, BOOKINGS_SCOPE))
+    versions = {row['scope']: row['version'] for row in rows}
+    return tuple(versions.get(name, 0) for name in (timetable_scope, EXCEPTIONS_SCOPE, BOOKINGS_SCOPE))
+
+def _occurrence(entry, day, status='scheduled', exception=None):
+    occurrence = {
+        'type': 'class',
+        'date': day,
+        'start_time': entry['start_time'],
+        'end_time': entry['end_time'],
+        'status': status,
+        'timetable_id': entry['id'],
+        'subject': entry['subject'],
+        'department_id': entry['department_id'],
+        'department_code': entry['department_code'],
+        'batch': entry['batch'],
+        'classroom_id': entry['classroom_id'],
+        'room_no': entry['room_no'],
+        'professor_id': entry['professor_id'],
+        'professor_first_name': entry['professor_first_name'],
+        'professor_last_name': entry['professor_last_name'],
+    }
+    if exception is not None:
+        occurrence['exception_id'] = exception['id']
+        occurrence['note'] = exception['note']
+        if status == 'moved':
+            occurrence.update({
+                'date': exception['new_date'] or exception['exception_date'],
+                'start_time': exception['start_time'],
+                'end_time': exception['end_time'],
+                'original_date': exception['exception_date'],
+                'original_start_time': entry['start_time'],
+            })
+            if exception['classroom_id']:
+                occurrence['classroom_id'] = exception['classroom_id']
+                occurrence['room_no'] = exception['room_no']
+    return occurrence
+
+def _expand(scope, weeks):
+    """{monday: [occurrence, ...] in date order} for the given weeks, in three queries"""
+    first, last = min(weeks), max(weeks) + timedelta(days=6)
+    condition, params = scope_condition(scope)
+    entries = {row['id']: row for row in query_db(f"{ENTRY_QUERY} WHERE {condition}", tuple(params))}
+
+    exceptions = query_db(f"""
+        SELECT x.id, x.timetable_id, x.exception_date, x.status, x.new_date, x.start_time, x.end_time,
+               x.classroom_id, x.note, c.room_no
+        FROM timetable_exceptions x
+        JOIN timetable t ON t.id = x.timetable_id
+        LEFT JOIN classrooms c ON c.id = x.classroom_id
+        WHERE (x.exception_date BETWEEN %s AND %s OR x.new_date BETWEEN %s AND %s) AND {condition}
+    """, tuple([first, last, first, last] + params))
+    bookings = query_db("""
+        SELECT ab.id, ab.classroom_id, ab.event_name, ab.booking_date, ab.start_time, ab.end_time, c.room_no
+        FROM auditorium_bookings ab
+        JOIN classrooms c ON ab.classroom_id = c.id
+        WHERE ab.status = 'confirmed' AND ab.booking_date BETWEEN %s AND %s
+    """, (first, last))
+
+    by_date = {(x['timetable_id'], x['exception_date']): x for x in exceptions}
+    days = {monday: [] for monday in weeks}
+    for monday in weeks:
+        for entry in entries.values():
+            day = monday + timedelta(days=entry['day_of_week'])
+            exception = by_date.get((entry['id'], day))
+            if exception is None:
+                days[monday].append(_occurrence(entry, day))
+            elif exception['status'] == 'cancelled':
+                days[monday].append(_occurrence(entry, day, 'cancelled', exception))
+    # A moved occurrence belongs to the week it moved to
+    for exception in exceptions:
+        target = week_start(exception['new_date'] or exception['exception_date'])
+        if exception['status'] == 'moved' and target in days:
+            days[target].append(_occurrence(entries[exception['timetable_id']], None, 'moved', exception))
+    for booking in bookings:
+        monday = week_start(booking['booking_date'])
+        if monday not in days:
+            continue  # a cached week between two missing ones
+        days[monday].append({
+            'type': 'booking',
+            'date': booking['booking_date'],
+            'start_time': booking['start_time'],
+            'end_time': booking['end_time'],
+            'status': 'confirmed',
+            'booking_id': booking['id'],
+            'event_name': booking['event_name'],
+            'classroom_id': booking['classroom_id'],
+            'room_no': booking['room_no'],
+        })
+
+    for monday, occurrences in days.items():
+        occurrences.sort(key=lambda o: (o['date'], o['start_time'], o['type'], o.get('timetable_id') or 0))
+        days[monday] = [serialize_row(o) for o in occurrences]
+    return days
+
+def calendar_weeks(scope, start, end, versions):
+    """Expanded weeks covering start..end, oldest first, from the week cache where possible"""
+    ttl = current_app.config.get('CALENDAR_CACHE_SECONDS', 300)
+    filters = tuple(scope.get(column) for column in ('department_id', 'batch', 'professor_id'))
+    mondays, monday = [], week_start(start)
+    while monday <= end:
+        mondays.append(monday)
+        monday += timedelta(days=7)
+
+    now, weeks, missing = time.monotonic(), {}, []
+    for monday in mondays:
+        cached = _weeks.get((filters, monday, versions))
+        if cached is not None and now - cached[0] < ttl:
+            weeks[monday] = cached[1]
+        else:
+            missing.append(monday)
+    if missing:
+        built = _expand(scope, missing)
+        with _weeks_lock:
+            if len(_weeks) + len(built) > MAX_CACHE_ENTRIES:
+                _weeks.clear()
+            for monday, occurrences in built.items():
+                _weeks[(filters, monday, versions)] = (now, occurrences)
+        weeks.update(built)
+    return [weeks[monday] for monday in mondays]
+
+def _find_conflict(cur, entry, original, day, start, end, classroom_id):
+    """
+    First clash for the `original` date's occurrence of `entry` moved to day start-end in
+    classroom_id, or None. Only that occurrence is left out: the entry's other occurrences
+    (its regular class on `day`, or another moved date) still count.
+    """
+    cur.execute("""
+        SELECT o.classroom_id, o.professor_id, o.department_id, o.batch FROM (
+            SELECT t.classroom_id, t.professor_id, t.department_id, t.batch, t.start_time, t.end_time
+            FROM timetable t
+            WHERE t.day_of_week = %s AND NOT (t.id = %s AND %s = %s)
+              AND NOT EXISTS (SELECT 1 FROM timetable_exceptions x
+                              WHERE x.timetable_id = t.id AND x.exception_date = %s)
+            UNION ALL
+            SELECT COALESCE(x.classroom_id, t.classroom_id), t.professor_id, t.department_id, t.batch,
+                   x.start_time, x.end_time
+            FROM timetable_exceptions x JOIN timetable t ON t.id = x.timetable_id
+            WHERE x.status = 'moved' AND COALESCE(x.new_date, x.exception_date) = %s
+              AND NOT (x.timetable_id = %s AND x.exception_date = %s)
+            UNION ALL
+            SELECT classroom_id, NULL, NULL, NULL, start_time, end_time FROM auditorium_bookings
+            WHERE status = 'confirmed' AND booking_date = %s
+        ) o
+        WHERE o.start_time < %s AND o.end_time > %s
+          AND (o.classroom_id = %s OR o.professor_id = %s OR (o.department_id = %s AND o.batch = %s))
+        LIMIT 1
+    """, (day.weekday(), entry['id'], day, original, day, day, entry['id'], original, day, end, start,
+          classroom_id, entry['professor_id'], entry['department_id'], entry['batch']))
+    row = cur.fetchone()
+    if row is None:
+        return None
+    if row['classroom_id'] == classroom_id:
+        return CONFLICT_MESSAGES['timetable_room_overlap']
+    if row['professor_id'] == entry['professor_id']:
+        return CONFLICT_MESSAGES['timetable_professor_overlap']
+    return CONFLICT_MESSAGES['timetable_batch_overlap']
+
+def save_exception(entry, data, created_by):
+    """
+    Cancel or move one occurrence of a timetable entry (replacing an earlier exception
+    for that date). Returns the exception row; raises ValueError on bad input or a clash.
+    """
+    status = data.get('status')
+    if status not in EXCEPTION_STATUSES:
+        raise ValueError(f'status must be one of: {", ".join(EXCEPTION_STATUSES)}')
+    try:
+        day = date.fromisoformat(str(data.get('date')))
+    except ValueError:
+        raise ValueError('date must be a date (YYYY-MM-DD)')
+    if day.weekday() != entry['day_of_week']:
+        raise ValueError('The class does not take place on this date')
+
+    values = {'new_date': None, 'start_time': None, 'end_time': None, 'classroom_id': None}
+    if status == 'moved':
+        try:
+            values['new_date'] = date.fromisoformat(str(data['new_date'])) if data.get('new_date') else None
+        except ValueError:
+            raise ValueError('new_date must be a date (YYYY-MM-DD)')
+        values['start_time'], values['end_time'] = check_slot(data.get('start_time') or entry['start_time'],
+                                                             data.get('end_time') or entry['end_time'])
+        if data.get('classroom_id') is not None:
+            try:
+                values['classroom_id'] = int(data['classroom_id'])
+            except (TypeError, ValueError):
+                raise ValueError('classroom_id must be a number')
+
+    try:
+        with transaction() as cur:
+            exception = _write_exception(cur, entry, day, status, values, data.get('note'), created_by)
+    except psycopg2.errors.ForeignKeyViolation:
+        raise ValueError('Room not found') from None
+    invalidate_availability()
+    return exception
+
+def _write_exception(cur, entry, day, status, values, note, created_by):
+    cur.execute("SELECT pg_advisory_xact_lock(%s)", (EXCEPTION_LOCK_KEY,))
+    if status == 'moved':
+        conflict = _find_conflict(cur, entry, day, values['new_date'] or day, values['start_time'],
+                                  values['end_time'], values['classroom_id'] or entry['classroom_id'])
+        if conflict:
+            raise ValueError(conflict)
+    cur.execute("""
+        INSERT INTO timetable_exceptions (timetable_id, exception_date, status, new_date, start_time,
+                                          end_time, classroom_id, note, created_by)
+        VALUES (%s, %s, %s, %s, %s, %s, %s, %s, %s)
+        ON CONFLICT (timetable_id, exception_date) DO UPDATE SET
+            status = EXCLUDED.status, new_date = EXCLUDED.new_date, start_time = EXCLUDED.start_time,
+            end_time = EXCLUDED.end_time, classroom_id = EXCLUDED.classroom_id, note = EXCLUDED.note,
+            created_by = EXCLUDED.created_by, created_at = CURRENT_TIMESTAMP
+        RETURNING *
+    """, (entry['id'], day, status, values['new_date'], values['start_time'], values['end_time'],
+          values['classroom_id'], note, created_by))
+    return dict(cur.fetchone())
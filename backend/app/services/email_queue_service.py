@@ -0,0 +1,249 @@
+"""
+Delivery worker for the email_outbox queue.
+
+One background thread claims batches of pending mail with FOR UPDATE SKIP LOCKED
+(so several processes can run it), sends them over a single SMTP connection that
+stays open between batches, and closes it after EMAIL_SMTP_IDLE_SECONDS idle.
+Sends are spaced to EMAIL_RATE_PER_SECOND and capped at EMAIL_MAX_PER_HOUR.
+Failures go back to pending with exponential backoff until EMAIL_MAX_ATTEMPTS;
+rows left 'sending' by a crashed worker are picked up again.
+
+Credential mails are queued with TEMP_PASSWORD_PLACEHOLDER instead of the
+password; just before sending, the worker sets a new temporary password on the
+user (only while must_change_password is still set) and fills it in, so no
+plaintext password waits in the table. Bodies are cleared once a row is sent or
+has failed for good, and finished rows are purged after
+EMAIL_OUTBOX_RETENTION_DAYS.
+"""
+import time
+import secrets
+import smtplib
+import threading
+from collections import deque
+
+from flask_mail import Message
+from psycopg2.extras import execute_values
+
+from app.db import execute_db, transaction
+
+_wakeup = threading.Event()
+_stop = threading.Event()
+_thread = None
+_start_lock = threading.Lock()
+
+TEMP_PASSWORD_PLACEHOLDER = '{temporary_password}'
+
+# Rows still 'sending' after this long were claimed by a worker that died
+SENDING_STALE_SECONDS = 300
+
+def wake_worker():
+    """Deliver newly queued mail now instead of at the next poll"""
+    _wakeup.set()
+
+class RateLimiter:
+    """Spaces sends to at most `per_second`, and at most `per_hour` in any rolling hour (0 = unlimited)"""
+
+    def __init__(self, per_second=0, per_hour=0):
+        self.interval = 1.0 / per_second if per_second > 0 else 0
+        self.per_hour = per_hour
+        self.next_at = 0.0
+        self.sent = deque()
+
+    def hourly_budget(self):
+        """How many more messages may be sent now, or None when unlimited"""
+        if not self.per_hour:
+            return None
+        cutoff = time.monotonic() - 3600
+        while self.sent and self.sent[0] <= cutoff:
+            self.sent.popleft()
+        return self.per_hour - len(self.sent)
+
+    def seconds_until_budget(self):
+        return max(0.0, self.sent[0] + 3600 - time.monotonic()) if self.sent else 0.0
+
+    def wait(self):
+        now = time.monotonic()
+        if self.next_at > now:
+            time.sleep(self.next_at - now)
+            now = self.next_at
+        self.next_at = now + self.interval
+        if self.per_hour:
+            self.sent.append(now)
+
+class SMTPSession:
+    """One Flask-Mail connection reused across messages; reconnects once if the server dropped it"""
+
+    def __init__(self, mail):
+        self.mail = mail
+        self.conn = None
+        self.last_used = 0.0
+
+    def send(self, message):
+        for attempt in (1, 2):
+            if self.conn is None:
+                self.conn = self.mail.connect()
+                self.conn.__enter__()
+            try:
+                self.conn.send(message)
+                self.last_used = time.monotonic()
+                return
+            except (smtplib.SMTPServerDisconnected, ConnectionError):
+                self.close()
+                if attempt == 2:
+                    raise
+
+    def close_if_idle(self, idle_seconds):
+        if self.conn is not None and time.monotonic() - self.last_used >= idle_seconds:
+            self.close()
+
+    def close(self):
+        if self.conn is not None:
+            try:
+                self.conn.__exit__(None, None, None)
+            except Exception:
+                pass
+            self.conn = None
+
+def _claim_batch(limit):
+    with transaction() as cur:
+        cur.execute("""
+            UPDATE email_outbox
+            SET status = 'sending', locked_at = CURRENT_TIMESTAMP, attempts = attempts + 1
+            WHERE id IN (
+                SELECT id FROM email_outbox
+                WHERE (status = 'pending' AND next_attempt_at <= CURRENT_TIMESTAMP)
+                OR (status = 'sending' AND locked_at < CURRENT_TIMESTAMP - make_interval(secs => %s))
+                ORDER BY id
+                LIMIT %s
+                FOR UPDATE SKIP LOCKED
+            )
+            RETURNING id, recipient, subject, body, attempts, credentials_user_id
+        """, (SENDING_STALE_SECONDS, limit))
+        return sorted(cur.fetchall(), key=lambda row: row['id'])
+
+def _issue_password(user_id):
+    """Set a new temporary password for a user who has not chosen one yet; returns it, or None"""
+    from app.services.password_service import hash_password
+    password = secrets.token_urlsafe(12)
+    updated = execute_db(
+        "UPDATE users SET password_hash = %s WHERE id = %s AND must_change_password = TRUE",
+        (hash_password(password, temporary=True), user_id)
+    )
+    return password if updated else None
+
+def _body(row):
+    """Body to send, or None when there is nothing left to send"""
+    if row.get('credentials_user_id') is None:
+        return row['body']
+    password = _issue_password(row['credentials_user_id'])
+    if password is None:
+        return None  # the user has set a password already (or was deleted)
+    return row['body'].replace(TEMP_PASSWORD_PLACEHOLDER, password)
+
+def deliver(session, limiter, rows):
+    """Send claimed rows; returns (sent ids, {id: error})"""
+    sent, failed = [], {}
+    for row in rows:
+        try:
+            body = _body(row)
+            if body is not None:
+                limiter.wait()
+                session.send(Message(subject=row['subject'], recipients=[row['recipient']], body=body))
+            sent.append(row['id'])
+        except Exception as e:
+            failed[row['id']] = str(e)
+    return sent, failed
+
+def _record(rows, sent, failed, config):
+    if sent:
+        execute_db("""
+            UPDATE email_outbox
+            SET status = 'sent', sent_at = CURRENT_TIMESTAMP, locked_at = NULL, last_error = NULL, body = ''
+            WHERE id = ANY(%s)
+        """, (sent,))
+    if not failed:
+        return
+    updates = []
+    for row in rows:
+        if row['id'] not in failed:
+            continue
+        if row['attempts'] >= config['EMAIL_MAX_ATTEMPTS']:
+            status, delay = 'failed', 0
+        else:
+            status = 'pending'
+            delay = min(config['EMAIL_RETRY_BASE_SECONDS'] * 2 ** (row['attempts'] - 1), config['EMAIL_RETRY_MAX_SECONDS'])
+        updates.append((row['id'], status, float(delay), failed[row['id']][:1000]))
+    with transaction() as cur:
+        execute_values(cur, """
+            UPDATE email_outbox o
+            SET status = v.status, next_attempt_at = CURRENT_TIMESTAMP + make_interval(secs => v.delay),
+                locked_at = NULL, last_error = v.error,
+                body = CASE WHEN v.status = 'failed' THEN '' ELSE o.body END
+            FROM (VALUES %s) AS v(id, status, delay, error)
+            WHERE o.id = v.id
+        """, updates)
+
+def purge_outbox(retention_days):
+    """Delete sent and failed rows older than retention_days; returns the number deleted"""
+    return execute_db("""
+        DELETE FROM email_outbox
+        WHERE status IN ('sent', 'failed') AND created_at < CURRENT_TIMESTAMP - make_interval(days => %s)
+    """, (retention_days,))
+
+def run_worker(app, mail):
+    """Worker loop; returns when stop_email_worker() is called"""
+    config = app.config
+    session = SMTPSession(mail)
+    limiter = RateLimiter(config['EMAIL_RATE_PER_SECOND'], config['EMAIL_MAX_PER_HOUR'])
+    poll = config['EMAIL_QUEUE_POLL_SECONDS']
+    while not _stop.is_set():
+        rows = []
+        try:
+            with app.app_context():
+                limit = config['EMAIL_QUEUE_BATCH_SIZE']
+                budget = limiter.hourly_budget()
+                if budget is not None and budget <= 0:
+                    session.close()
+                    _stop.wait(limiter.seconds_until_budget())
+                    continue
+                if budget is not None:
+                    limit = min(limit, budget)
+                rows = _claim_batch(limit)
+                if rows:
+                    sent, failed = deliver(session, limiter, rows)
+                    _record(rows, sent, failed, config)
+                else:
+                    session.close_if_idle(config['EMAIL_SMTP_IDLE_SECONDS'])
+        except Exception as e:
+            app.logger.error(f"Email queue worker error: {str(e)}")
+            session.close()
+        if not rows:
+            _wakeup.wait(poll)
+            _wakeup.clear()
+    session.close()
+
+def start_email_worker(app):
+    """
+    Start the delivery thread once per process (no-op when EMAIL_QUEUE is off or it is
+    already running). Called by create_app and again when mail is queued, so a worker
+    process forked after create_app still gets its own thread.
+    """
+    global _thread
+    if not (app.config.get('EMAIL_QUEUE') and app.config.get('EMAIL_WORKER', True)) or (
+            _thread is not None and _thread.is_alive()):
+        return _thread
+    with _start_lock:
+        if _thread is not None and _thread.is_alive():
+            return _thread
+        from app import mail
+        _stop.clear()
+        _thread = threading.Thread(target=run_worker, args=(app, mail), name='email-queue', daemon=True)
+        _thread.start()
+    return _thread
+
+def stop_email_worker(timeout=10):
+    """Stop the delivery thread, letting the current message finish"""
+    _stop.set()
+    _wakeup.set()
+    if _thread is not None:
+        _thread.join(timeout)
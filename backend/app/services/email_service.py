@@ -1,13 +1,61 @@
+"""
+Outgoing mail. With EMAIL_QUEUE on, messages are written to email_outbox and
+delivered by email_queue_service over one reused SMTP connection; otherwise
+they are sent inline.
+
+Queued credential mails never hold the password: the body carries
+TEMP_PASSWORD_PLACEHOLDER and the row the user id, and the worker sets a fresh
+temporary password and fills it in at send time.
+"""
 from flask_mail import Message
 from flask import current_app
+from psycopg2.extras import execute_values
 
-def send_credentials_email(mail, user_email, temp_password, role, first_name):
-    """Send login credentials to newly created user"""
-    try:
-        msg = Message(
-            subject="Your CampusOne Login Credentials",
-            recipients=[user_email],
-            body=f"""
+from app.db import transaction
+from app.services.email_queue_service import SMTPSession, TEMP_PASSWORD_PLACEHOLDER, start_email_worker, wake_worker
+
+def email_queue_enabled():
+    return current_app.config.get('EMAIL_QUEUE', False)
+
+def queue_emails(mail, messages, cur=None):
+    """
+    Queue (recipient, subject, body) tuples for delivery; pass cur to queue them in
+    the caller's transaction. A fourth item, a user id, marks a credentials mail whose
+    password is set at send time. Without EMAIL_QUEUE they are sent now over one
+    connection. Returns the number queued or sent.
+    """
+    messages = list(messages)
+    if not messages:
+        return 0
+    if not email_queue_enabled():
+        session = SMTPSession(mail)
+        sent = 0
+        try:
+            for recipient, subject, body, *_ in messages:
+                try:
+                    session.send(Message(subject=subject, recipients=[recipient], body=body))
+                    sent += 1
+                except Exception as e:
+                    current_app.logger.error(f"Failed to send email to {recipient}: {str(e)}")
+        finally:
+            session.close()
+        return sent
+
+    insert = "INSERT INTO email_outbox (recipient, subject, body, credentials_user_id) VALUES %s"
+    rows = [tuple(m) + (None,) * (4 - len(m)) for m in messages]
+    if cur is not None:
+        execute_values(cur, insert, rows, page_size=1000)
+    else:
+        with transaction() as cur:
+            execute_values(cur, insert, rows, page_size=1000)
+    # Processes not started through run.py (e.g. gunicorn on index.py) start their worker here
+    start_email_worker(current_app._get_current_object())
+    wake_worker()
+    return len(rows)
+
+def _credentials_content(user_email, temp_password, role, first_name):
+    subject = "Your CampusOne Login Credentials"
+    body = f"""
 Hello {first_name},
 
 Welcome to CampusOne!
@@ -22,34 +70,40 @@ Please change your password after your first login.
 Best regards,
 CampusOne Administration
             """
-        )
-        mail.send(msg)
-        return True
+    return user_email, subject, body
+
+def _credentials_messages(recipients):
+    queued = email_queue_enabled()
+    for email, temp_password, role, first_name, user_id in recipients:
+        if queued:
+            # The worker replaces the placeholder with a password it sets just before sending
+            yield _credentials_content(email, TEMP_PASSWORD_PLACEHOLDER, role, first_name) + (user_id,)
+        else:
+            yield _credentials_content(email, temp_password, role, first_name)
+
+def send_credentials_email(mail, user_email, temp_password, role, first_name, user_id):
+    """Send login credentials to newly created user"""
+    try:
+        return queue_emails(mail, _credentials_messages([(user_email, temp_password, role, first_name, user_id)])) == 1
     except Exception as e:
         current_app.logger.error(f"Failed to send email: {str(e)}")
         return False
 
+def send_credentials_emails(mail, recipients, cur=None):
+    """Send credentials to many new users. recipients: iterable of (email, temp_password, role, first_name, user_id)"""
+    return queue_emails(mail, _credentials_messages(recipients), cur=cur)
+
 def send_notification_email(mail, user_email, subject, content):
     """Send notification email"""
     try:
-        msg = Message(
-            subject=subject,
-            recipients=[user_email],
-            body=content
-        )
-        mail.send(msg)
-        return True
+        return queue_emails(mail, [(user_email, subject, content)]) == 1
     except Exception as e:
         current_app.logger.error(f"Failed to send notification email: {str(e)}")
         return False
 
 def send_password_reset_email(mail, user_email, reset_token):
     """Send password reset email"""
-    try:
-        msg = Message(
-            subject="Password Reset Request - CampusOne",
-            recipients=[user_email],
-            body=f"""
+    body = f"""
 You have requested to reset your password for CampusOne.
 
 Your password reset token: {reset_token}
@@ -61,9 +115,8 @@ If you did not request this reset, please ignore this email.
 Best regards,
 CampusOne Administration
             """
-        )
-        mail.send(msg)
-        return True
+    try:
+        return queue_emails(mail, [(user_email, "Password Reset Request - CampusOne", body)]) == 1
     except Exception as e:
         current_app.logger.error(f"Failed to send reset email: {str(e)}")
         return False
@@ -0,0 +1,187 @@
+"""
+Background CSV import jobs.
+
+The upload is stored in its import_jobs row (file_data), so any worker on any
+host can run or resume the job; IMPORT_JOB_DIR only holds a local copy of the
+file while a worker reads it. A worker thread runs the chunked import from
+import_service. Each chunk's
+progress (rows processed, successes, errors, last_committed_row) is written in
+the same transaction as the chunk's users, so a job interrupted by a crash or
+restart resumes from the last committed chunk: resume_import_jobs() (at startup
+and from the scheduler) reclaims queued jobs and running jobs whose heartbeat
+is older than IMPORT_JOB_STALE_SECONDS. Progress is also pushed over Socket.IO
+as 'import_progress' to the admin's user_<id> room.
+"""
+import os
+import csv
+import uuid
+import threading
+
+from flask import current_app
+import psycopg2
+from psycopg2.extras import Json
+
+from app.db import query_db, insert_db, execute_db, transaction
+from app.utils.serializers import serialize_row
+from app.services.import_service import (
+    has_required_columns, department_map, iter_chunks, import_chunk, ROLE_COLUMNS
+)
+
+JOB_COLUMNS = """
+    id, role, filename, status, created_by, total_rows, rows_processed, success_count,
+    error_count, last_committed_row, error_message, created_at, started_at, finished_at,
+    EXTRACT(EPOCH FROM (COALESCE(finished_at, LOCALTIMESTAMP) - started_at)) AS elapsed_seconds
+"""
+
+def _open(path):
+    return open(path, newline='', encoding='utf-8-sig')
+
+def job_summary(job):
+    """JSON-friendly job status with throughput"""
+    out = serialize_row(job)
+    elapsed = out.pop('elapsed_seconds', None)
+    elapsed = float(elapsed) if elapsed else 0
+    out['rows_per_second'] = round(job['rows_processed'] / elapsed, 1) if elapsed > 0 else None
+    return out
+
+def get_job(job_id, include_errors=False):
+    columns = JOB_COLUMNS + (', errors' if include_errors else '')
+    return query_db(f"SELECT {columns} FROM import_jobs WHERE id = %s", (job_id,), one=True)
+
+def _emit_progress(job):
+    try:
+        from app import socketio
+        if socketio is not None and job.get('created_by'):
+            socketio.emit('import_progress', job_summary(job), room=f"user_{job['created_by']}")
+    except Exception:
+        pass  # Vercel/serverless: socketio may be None; ignore
+
+def _local_path(job):
+    """Where this worker keeps its copy of the job's upload"""
+    return os.path.join(current_app.config['IMPORT_JOB_DIR'], os.path.basename(job['file_path']))
+
+def _local_copy(job):
+    """Path of a local copy of the upload, fetched from the job row if this host has none"""
+    path = _local_path(job)
+    if os.path.exists(path):
+        return path
+    row = query_db("SELECT file_data FROM import_jobs WHERE id = %s", (job['id'],), one=True)
+    if not row or row['file_data'] is None:
+        raise ValueError('Uploaded file is no longer available')
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    tmp = f'{path}.{uuid.uuid4().hex}.tmp'
+    with open(tmp, 'wb') as f:
+        f.write(bytes(row['file_data']))
+    os.replace(tmp, path)
+    return path
+
+def create_import_job(file, role, admin_id):
+    """Store the upload and queue an import job; raises ValueError if the CSV header is invalid"""
+    job_dir = current_app.config['IMPORT_JOB_DIR']
+    os.makedirs(job_dir, exist_ok=True)
+    name = f'import_{uuid.uuid4().hex}.csv'
+    path = os.path.join(job_dir, name)
+    file.save(path)
+
+    with _open(path) as f:
+        valid = has_required_columns(csv.DictReader(f), role)
+    if not valid:
+        os.remove(path)
+        raise ValueError(f'CSV must contain columns: {", ".join(ROLE_COLUMNS[role])}')
+
+    with open(path, 'rb') as f:
+        data = f.read()
+    job_id = insert_db(
+        """INSERT INTO import_jobs (role, filename, file_path, file_data, created_by)
+           VALUES (%s, %s, %s, %s, %s)""",
+        (role, file.filename, name, psycopg2.Binary(data), admin_id)
+    )
+    start_job(current_app._get_current_object(), job_id)
+    return job_id
+
+def start_job(app, job_id):
+    thread = threading.Thread(target=_run_job, args=(app, job_id), name=f'import-job-{job_id}', daemon=True)
+    thread.start()
+    return thread
+
+def _claim(job_id, stale_seconds):
+    """Mark a queued (or stale running) job as running in this worker; None if someone else has it"""
+    with transaction() as cur:
+        cur.execute("""
+            UPDATE import_jobs
+            SET status = 'running', started_at = COALESCE(started_at, CURRENT_TIMESTAMP),
+                heartbeat_at = CURRENT_TIMESTAMP
+            WHERE id = %s
+            AND (status = 'queued'
+                 OR (status = 'running' AND heartbeat_at < CURRENT_TIMESTAMP - make_interval(secs => %s)))
+            RETURNING id, role, file_path, total_rows, last_committed_row
+        """, (job_id, stale_seconds))
+        return cur.fetchone()
+
+def _finish(job, status, error_message=None):
+    execute_db("""
+        UPDATE import_jobs SET status = %s, error_message = %s, finished_at = CURRENT_TIMESTAMP, file_data = NULL
+        WHERE id = %s
+    """, (status, error_message, job['id']))
+    try:
+        os.remove(_local_path(job))
+    except OSError:
+        pass
+    _emit_progress(get_job(job['id']))
+
+def _process_job(job):
+    job_id = job['id']
+    path = _local_copy(job)
+    if job['total_rows'] is None:
+        with _open(path) as f:
+            total_rows = sum(1 for _ in csv.DictReader(f))
+        execute_db("UPDATE import_jobs SET total_rows = %s WHERE id = %s", (total_rows, job_id))
+
+    dept_map = department_map()
+    seen_emails = set()
+    chunk_size = current_app.config.get('IMPORT_CHUNK_SIZE', 500)
+    with _open(path) as f:
+        reader = csv.DictReader(f)
+        for chunk in iter_chunks(reader, chunk_size, start_row=job['last_committed_row'] + 1):
+            def save_progress(cur, results, chunk=chunk):
+                cur.execute("""
+                    UPDATE import_jobs
+                    SET rows_processed = rows_processed + %s,
+                        success_count = success_count + %s,
+                        error_count = error_count + %s,
+                        errors = errors || %s,
+                        last_committed_row = %s,
+                        heartbeat_at = CURRENT_TIMESTAMP
+                    WHERE id = %s
+                """, (len(chunk), len(results['success']), len(results['errors']),
+                      Json(results['errors']), chunk[-1][0], job_id))
+
+            import_chunk(chunk, job['role'], dept_map, seen_emails, on_commit=save_progress)
+            _emit_progress(get_job(job_id))
+
+def _run_job(app, job_id):
+    with app.app_context():
+        job = _claim(job_id, app.config.get('IMPORT_JOB_STALE_SECONDS', 120))
+        if not job:
+            return
+        try:
+            _process_job(job)
+        except Exception as e:
+            app.logger.error(f"Import job {job_id} failed: {str(e)}")
+            _finish(job, 'failed', str(e))
+            return
+        _finish(job, 'completed')
+
+def resume_import_jobs(app):
+    """Start workers for queued jobs and running jobs abandoned by a crashed worker"""
+    with app.app_context():
+        stale_seconds = app.config.get('IMPORT_JOB_STALE_SECONDS', 120)
+        jobs = query_db("""
+            SELECT id FROM import_jobs
+            WHERE status = 'queued'
+            OR (status = 'running' AND heartbeat_at < CURRENT_TIMESTAMP - make_interval(secs => %s))
+            ORDER BY id
+        """, (stale_seconds,))
+    for job in jobs:
+        start_job(app, job['id'])
+    return len(jobs)
@@ -0,0 +1,206 @@
+"""
+Streaming bulk user import for the admin CSV endpoints.
+
+The upload is decoded incrementally and processed IMPORT_CHUNK_SIZE rows at a
+time: rows are validated in Python, the chunk's emails are checked against
+users in one query, temporary passwords are hashed in parallel, the chunk is
+inserted with one multi-row INSERT and committed together with the chunk's
+credential emails in the outbox. Errors are still reported per row.
+"""
+import io
+import csv
+import secrets
+from itertools import islice
+
+from flask import current_app
+from psycopg2.extras import execute_values
+
+from app import mail
+from app.db import query_db, transaction
+from app.utils.validators import validate_email
+from app.services.email_service import send_credentials_emails, email_queue_enabled
+from app.services.password_service import hash_passwords
+
+# Required CSV columns per role
+ROLE_COLUMNS = {
+    'student': ['email', 'first_name', 'last_name', 'department_code', 'batch'],
+    'professor': ['email', 'first_name', 'last_name', 'department_code'],
+}
+
+INSERT_USERS_SQL = """
+    INSERT INTO users (email, password_hash, role, first_name, last_name, department_id, batch, must_change_password)
+    VALUES %s
+    ON CONFLICT (email) DO NOTHING
+    RETURNING id, email
+"""
+INSERT_USERS_TEMPLATE = '(%s, %s, %s, %s, %s, %s, %s, TRUE)'
+
+def open_csv(file):
+    """DictReader over an uploaded file, decoded as it is read rather than all at once"""
+    stream = io.TextIOWrapper(file.stream, encoding='utf-8-sig', newline='')
+    return csv.DictReader(stream)
+
+def has_required_columns(reader, role):
+    fieldnames = reader.fieldnames or []
+    return all(col in fieldnames for col in ROLE_COLUMNS[role])
+
+def _row_error(row_num, email, error):
+    return {'row': row_num, 'email': email, 'error': error}
+
+def _validate_row(row_num, row, role, dept_map):
+    """Return (record, None) for a valid row or (None, error) otherwise"""
+    email = (row.get('email') or '').strip().lower()
+    first_name = (row.get('first_name') or '').strip()
+    last_name = (row.get('last_name') or '').strip()
+    department_code = (row.get('department_code') or '').strip().upper()
+    batch = (row.get('batch') or '').strip() if role == 'student' else None
+
+    required = [email, first_name, last_name, department_code]
+    if role == 'student':
+        required.append(batch)
+    if not all(required):
+        return None, _row_error(row_num, email or 'N/A', 'Missing required fields')
+
+    if not validate_email(email):
+        return None, _row_error(row_num, email, 'Invalid email format')
+
+    department_id = dept_map.get(department_code)
+    if not department_id:
+        return None, _row_error(row_num, email, f'Department code "{department_code}" not found')
+
+    return {
+        'row': row_num,
+        'email': email,
+        'first_name': first_name,
+        'last_name': last_name,
+        'department_id': department_id,
+        'batch': batch,
+    }, None
+
+def _insert_all(cur, values):
+    rows = execute_values(cur, INSERT_USERS_SQL, values, template=INSERT_USERS_TEMPLATE,
+                          page_size=len(values), fetch=True)
+    return {row['email']: row['id'] for row in rows}, {}
+
+def _insert_each(cur, values):
+    """Fallback when a chunk INSERT fails: one savepoint per row so each failure gets its own error"""
+    inserted, failed = {}, {}
+    for value in values:
+        cur.execute("SAVEPOINT import_row")
+        try:
+            rows = execute_values(cur, INSERT_USERS_SQL, [value], template=INSERT_USERS_TEMPLATE, fetch=True)
+            cur.execute("RELEASE SAVEPOINT import_row")
+        except Exception as e:
+            cur.execute("ROLLBACK TO SAVEPOINT import_row")
+            failed[value[0]] = str(e)
+            continue
+        for row in rows:
+            inserted[row['email']] = row['id']
+    return inserted, failed
+
+def iter_chunks(reader, chunk_size, start_row=2):
+    """Yield lists of (row_num, row) from a DictReader, skipping rows before start_row"""
+    rows = enumerate(reader, start=2)  # Start at 2 (1 is header)
+    if start_row > 2:
+        rows = islice(rows, start_row - 2, None)
+    while True:
+        chunk = list(islice(rows, chunk_size))
+        if not chunk:
+            return
+        yield chunk
+
+def import_chunk(chunk, role, dept_map, seen_emails, on_commit=None):
+    """
+    Validate, hash, insert and email one chunk of (row_num, row) pairs.
+    Returns {'success': [...], 'errors': [...]} for the chunk. on_commit(cur, results)
+    runs inside the chunk's transaction, so progress saved there commits with the rows.
+    """
+    errors = []
+    candidates = []
+    for row_num, row in chunk:
+        try:
+            record, error = _validate_row(row_num, row, role, dept_map)
+        except Exception as e:
+            record, error = None, _row_error(row_num, row.get('email', 'N/A'), str(e))
+        if error:
+            errors.append(error)
+        elif record['email'] in seen_emails:
+            errors.append(_row_error(row_num, record['email'], 'Email already registered'))
+        else:
+            seen_emails.add(record['email'])
+            candidates.append(record)
+
+    # One set-based existence check for the whole chunk
+    existing = set()
+    if candidates:
+        existing = {r['email'] for r in query_db(
+            "SELECT email FROM users WHERE email = ANY(%s)",
+            ([c['email'] for c in candidates],)
+        )}
+    pending = []
+    for record in candidates:
+        if record['email'] in existing:
+            errors.append(_row_error(record['row'], record['email'], 'Email already registered'))
+        else:
+            pending.append(record)
+
+    temp_passwords = [secrets.token_urlsafe(12) for _ in pending]
+    password_hashes = hash_passwords(temp_passwords, temporary=True)
+    values = [
+        (r['email'], password_hash, role, r['first_name'], r['last_name'], r['department_id'], r['batch'])
+        for r, password_hash in zip(pending, password_hashes)
+    ]
+
+    for insert in (_insert_all, _insert_each):
+        results = {'success': [], 'errors': list(errors)}
+        recipients = []
+        try:
+            with transaction() as cur:
+                inserted, failed = insert(cur, values) if values else ({}, {})
+                for record, temp_password in zip(pending, temp_passwords):
+                    email = record['email']
+                    if email in inserted:
+                        results['success'].append({'row': record['row'], 'email': email, 'user_id': inserted[email]})
+                        recipients.append((email, temp_password, role, record['first_name'], inserted[email]))
+                    else:
+                        # Not returned by ON CONFLICT DO NOTHING: registered concurrently
+                        results['errors'].append(_row_error(record['row'], email, failed.get(email, 'Email already registered')))
+                # Queued with the rows so a committed chunk never loses its emails
+                if email_queue_enabled():
+                    send_credentials_emails(mail, recipients, cur=cur)
+                if on_commit:
+                    on_commit(cur, results)
+            break
+        except Exception as e:
+            if insert is _insert_each or not values:
+                raise
+            current_app.logger.warning(f"Chunk insert failed, retrying row by row: {str(e)}")
+
+    if not email_queue_enabled():
+        send_credentials_emails(mail, recipients)
+    return results
+
+def department_map():
+    departments = query_db("SELECT id, code FROM departments")
+    return {dept['code'].upper(): dept['id'] for dept in departments}
+
+def import_users(reader, role, chunk_size=None):
+    """Import every row of a CSV DictReader as users of the given role"""
+    chunk_size = chunk_size or current_app.config.get('IMPORT_CHUNK_SIZE', 500)
+    results = {
+        'success': [],
+        'errors': [],
+        'total': 0
+    }
+
+    dept_map = department_map()
+    seen_emails = set()
+    for chunk in iter_chunks(reader, chunk_size):
+        results['total'] += len(chunk)
+        chunk_results = import_chunk(chunk, role, dept_map, seen_emails)
+        results['success'].extend(chunk_results['success'])
+        results['errors'].extend(chunk_results['errors'])
+
+    results['success'].sort(key=lambda r: r['row'])
+    results['errors'].sort(key=lambda r: r['row'])
+    return results
@@ -1,4 +1,6 @@
-from app.db import query_db, insert_db
+from psycopg2.extras import execute_values
+
+from app.db import query_db, insert_db, transaction
 
 
 def _serialize_notification(row):
@@ -62,6 +64,40 @@ def notify_students_of_timetable_change(timetable_entry, change_type='updated'):
     
     return len(students)
 
+def notify_students_of_timetable_changes(changed):
+    """
+    One notification per affected student for a set of timetable changes.
+    `changed` maps (department_id, batch) -> number of changed classes; returns notifications sent.
+    """
+    if not changed:
+        return 0
+    groups = [
+        (department_id, batch,
+         "Class Rescheduled" if count == 1 else "Timetable Updated",
+         "A class in your timetable has changed." if count == 1
+         else f"{count} classes in your timetable have changed.")
+        for (department_id, batch), count in changed.items()
+    ]
+    with transaction() as cur:
+        rows = execute_values(cur, """
+            INSERT INTO notifications (user_id, title, content, notification_type)
+            SELECT u.id, v.title, v.content, 'timetable_updated'
+            FROM (VALUES %s) AS v(department_id, batch, title, content)
+            JOIN users u ON u.department_id = v.department_id AND u.batch = v.batch
+            WHERE u.role = 'student' AND u.is_active = TRUE
+            RETURNING id, user_id, title, content, notification_type, is_read, created_at
+        """, groups, fetch=True)
+
+    try:
+        from app import socketio
+        if socketio is not None:
+            for row in rows:
+                socketio.emit('new_notification', _serialize_notification(row), room=f"user_{row['user_id']}")
+    except Exception:
+        pass  # Vercel/serverless: socketio may be None; ignore
+
+    return len(rows)
+
 def notify_class_reminder(timetable_entry):
     """Send 15-minute reminder notification to students"""
     # Get all students in the department and batch
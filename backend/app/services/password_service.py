@@ -0,0 +1,142 @@
+"""
+Password hashing on a bounded worker pool, off the request thread.
+
+The bcrypt cost comes from BCRYPT_ROUNDS, or BCRYPT_TEMP_ROUNDS for generated
+temporary passwords (which must be changed on first login anyway). Logins
+rehash in the background when a stored hash's cost differs from the target.
+
+bcrypt releases the GIL, so a thread pool gives real parallelism; set
+PASSWORD_HASH_EXECUTOR=process to use worker processes instead. When eventlet
+has monkey-patched threading, work goes through eventlet.tpool so the hub
+keeps serving other connections while a hash runs.
+"""
+import sys
+import threading
+from concurrent.futures import ThreadPoolExecutor, ProcessPoolExecutor
+
+import bcrypt
+from flask import current_app, has_app_context
+
+from app.config import Config
+from app.db import execute_db
+from app.services.user_cache import invalidate_user
+
+_executor = None
+_executor_lock = threading.Lock()
+
+def _setting(name, default):
+    if has_app_context():
+        return current_app.config.get(name, default)
+    return getattr(Config, name, default)
+
+def _hash(password, rounds=None):
+    salt = bcrypt.gensalt(rounds) if rounds else bcrypt.gensalt()
+    return bcrypt.hashpw(password.encode('utf-8'), salt).decode('utf-8')
+
+def _check(password, password_hash):
+    # password_hash from DB may be str or bytes
+    if isinstance(password_hash, str):
+        password_hash = password_hash.encode('utf-8')
+    return bcrypt.checkpw(password.encode('utf-8'), password_hash)
+
+def _eventlet_patched():
+    if 'eventlet' not in sys.modules:
+        return False
+    from eventlet import patcher
+    return patcher.is_monkey_patched('thread')
+
+def _get_executor():
+    global _executor
+    if _executor is None:
+        with _executor_lock:
+            if _executor is None:
+                workers = _setting('PASSWORD_HASH_WORKERS', 4)
+                if _setting('PASSWORD_HASH_EXECUTOR', 'thread') == 'process':
+                    _executor = ProcessPoolExecutor(max_workers=workers)
+                else:
+                    _executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix='password-hash')
+    return _executor
+
+def _run(fn, *args):
+    if _eventlet_patched():
+        from eventlet import tpool
+        return tpool.execute(fn, *args)
+    return _get_executor().submit(fn, *args).result()
+
+def _map(fn, *iterables):
+    if _eventlet_patched():
+        from eventlet import GreenPool, tpool
+        pool = GreenPool(_setting('PASSWORD_HASH_WORKERS', 4))
+        return list(pool.imap(lambda *args: tpool.execute(fn, *args), *iterables))
+    chunksize = _setting('PASSWORD_HASH_CHUNK_SIZE', 16)
+    return list(_get_executor().map(fn, *iterables, chunksize=chunksize))
+
+def target_rounds(temporary=False):
+    """bcrypt cost for new hashes"""
+    if temporary:
+        return _setting('BCRYPT_TEMP_ROUNDS', 10)
+    return _setting('BCRYPT_ROUNDS', 12)
+
+def hash_cost(password_hash):
+    """Cost factor of a stored hash ('$2b$12$...' -> 12), or None if unrecognised"""
+    if isinstance(password_hash, bytes):
+        password_hash = password_hash.decode('utf-8')
+    parts = (password_hash or '').split('$')
+    try:
+        return int(parts[2])
+    except (IndexError, ValueError):
+        return None
+
+def needs_rehash(password_hash, temporary=False):
+    """True when the stored hash was made with a different cost than the current target"""
+    return hash_cost(password_hash) != target_rounds(temporary)
+
+def hash_password(password, temporary=False):
+    """Hash one password on the worker pool"""
+    return _run(_hash, password, target_rounds(temporary))
+
+def check_password(password, password_hash):
+    """Verify a password against a stored bcrypt hash on the worker pool"""
+    return _run(_check, password, password_hash)
+
+def hash_passwords(passwords, temporary=False):
+    """Hash many passwords in parallel; results are in input order"""
+    passwords = list(passwords)
+    if not passwords:
+        return []
+    return _map(_hash, passwords, [target_rounds(temporary)] * len(passwords))
+
+def rehash_in_background(user, password):
+    """
+    After a successful login, re-hash the password at the target cost without
+    delaying the response. The UPDATE only applies if the stored hash is unchanged.
+    """
+    temporary = bool(user.get('must_change_password'))
+    if not needs_rehash(user['password_hash'], temporary):
+        return None
+    rounds = target_rounds(temporary)
+    app = current_app._get_current_object()
+
+    def rehash():
+        try:
+            new_hash = _run(_hash, password, rounds)
+            with app.app_context():
+                execute_db(
+                    "UPDATE users SET password_hash = %s WHERE id = %s AND password_hash = %s",
+                    (new_hash, user['id'], user['password_hash'])
+                )
+                invalidate_user(user['id'])
+        except Exception as e:
+            app.logger.warning(f"Background rehash failed for user {user['id']}: {str(e)}")
+
+    thread = threading.Thread(target=rehash, name='password-rehash', daemon=True)
+    thread.start()
+    return thread
+
+def shutdown_executor():
+    """Stop the worker pool (tests, benchmarks, interpreter exit)"""
+    global _executor
+    with _executor_lock:
+        if _executor is not None:
+            _executor.shutdown(wait=True)
+            _executor = None
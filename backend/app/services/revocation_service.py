@@ -0,0 +1,139 @@
+"""
+Token revocation store for logout and deactivation.
+
+Each worker keeps, in memory, a per-user "tokens issued before" timestamp and a
+deny-list of revoked JTIs. Revocations are written to the database and other
+workers pick them up with one query at most every REVOCATION_SYNC_SECONDS, so
+checking a token in the JWT blocklist loader never costs a per-request query.
+Users whose tokens are revoked are also dropped from the identity cache.
+"""
+import time
+import threading
+from flask import current_app
+from psycopg2.extras import execute_values
+
+from app.db import get_db
+from app.services.user_cache import invalidate_users
+
+_revoked_before = {}  # user_id -> whole epoch seconds; tokens with iat before this are revoked
+_revoked_jtis = {}    # jti -> token expiry (epoch seconds)
+_sync_lock = threading.Lock()
+_last_sync = 0.0      # time.monotonic() of the last sync
+_watermark = None     # epoch seconds; rows revoked after this are fetched on the next sync
+
+def _apply_user_revocations(rows):
+    for user_id, revoked_before in rows:
+        if revoked_before > _revoked_before.get(user_id, 0):
+            _revoked_before[user_id] = revoked_before
+
+def _sync():
+    """Pull revocations made by other workers since the last sync"""
+    global _last_sync, _watermark
+    now = time.time()
+    if _watermark is None:
+        # First sync: anything older than the token lifetime cannot matter
+        since = now - current_app.config['JWT_ACCESS_TOKEN_EXPIRES']
+    else:
+        # Overlap so revocations committed late with an earlier timestamp are not missed
+        since = _watermark - current_app.config.get('REVOCATION_SYNC_OVERLAP', 60)
+
+    conn = get_db()
+    try:
+        with conn.cursor() as cur:
+            cur.execute("""
+                SELECT user_id, NULL AS jti, revoked_before AS ts
+                FROM user_token_revocations WHERE revoked_before > %s
+                UNION ALL
+                SELECT user_id, jti, expires_at AS ts
+                FROM revoked_tokens WHERE revoked_at > %s AND expires_at > %s
+            """, (since, since, now))
+            rows = cur.fetchall()
+        conn.commit()
+    except Exception:
+        conn.rollback()
+        raise
+
+    newly_revoked = []
+    for user_id, jti, ts in rows:
+        if jti is not None:
+            _revoked_jtis[jti] = ts
+        elif int(ts) > _revoked_before.get(user_id, 0):
+            _revoked_before[user_id] = int(ts)
+            newly_revoked.append(user_id)
+    if newly_revoked:
+        invalidate_users(newly_revoked)
+
+    # Forget deny-listed tokens that have expired anyway
+    for jti in [j for j, exp in _revoked_jtis.items() if exp <= now]:
+        _revoked_jtis.pop(jti, None)
+
+    _watermark = now
+    _last_sync = time.monotonic()
+
+def _maybe_sync():
+    interval = current_app.config.get('REVOCATION_SYNC_SECONDS', 5)
+    if time.monotonic() - _last_sync < interval:
+        return
+    # Only one thread syncs; others keep using the current in-memory state
+    if not _sync_lock.acquire(blocking=False):
+        return
+    try:
+        if time.monotonic() - _last_sync >= interval:
+            _sync()
+    except Exception as e:
+        current_app.logger.warning(f"Token revocation sync failed: {str(e)}")
+    finally:
+        _sync_lock.release()
+
+def is_token_revoked(jwt_payload):
+    """JWT blocklist check: revoked JTI, or issued before the user's revocation time"""
+    _maybe_sync()
+    if jwt_payload.get('jti') in _revoked_jtis:
+        return True
+    try:
+        user_id = int(jwt_payload.get('sub'))
+    except (TypeError, ValueError):
+        return False
+    revoked_before = _revoked_before.get(user_id)
+    return revoked_before is not None and jwt_payload.get('iat', 0) < revoked_before
+
+def revoke_token(jti, user_id, expires_at):
+    """Deny-list a single token (logout)"""
+    now = time.time()
+    user_id = int(user_id) if user_id is not None else None
+    conn = get_db()
+    try:
+        with conn.cursor() as cur:
+            cur.execute("""
+                INSERT INTO revoked_tokens (jti, user_id, expires_at, revoked_at)
+                VALUES (%s, %s, %s, %s)
+                ON CONFLICT (jti) DO NOTHING
+            """, (jti, user_id, expires_at, now))
+        conn.commit()
+    except Exception:
+        conn.rollback()
+        raise
+    _revoked_jtis[jti] = expires_at
+
+def revoke_user_tokens(user_ids):
+    """Revoke every token issued so far to these users (deactivation, forced reset), in one statement"""
+    user_ids = [int(u) for u in user_ids]
+    if not user_ids:
+        return 0
+    # iat is whole seconds: a token issued later in this same second (e.g. a login right
+    # after reactivation) must stay valid, so revoke from the start of the second
+    now = int(time.time())
+    conn = get_db()
+    try:
+        with conn.cursor() as cur:
+            execute_values(cur, """
+                INSERT INTO user_token_revocations (user_id, revoked_before) VALUES %s
+                ON CONFLICT (user_id) DO UPDATE SET revoked_before = EXCLUDED.revoked_before
+            """, [(user_id, now) for user_id in user_ids], page_size=1000)
+        conn.commit()
+    except Exception:
+        conn.rollback()
+        raise
+    _apply_user_revocations((user_id, now) for user_id in user_ids)
+    invalidate_users(user_ids)
+    return len(user_ids)
@@ -29,6 +29,41 @@ def check_upcoming_classes(app):
         for entry in upcoming:
             notify_class_reminder(entry)
 
+def resume_stale_import_jobs(app):
+    """Run every minute to resume interrupted background CSV imports"""
+    from app.services.import_job_service import resume_import_jobs
+    try:
+        resume_import_jobs(app)
+    except Exception as e:
+        app.logger.warning(f"Import job resume check failed: {str(e)}")
+
+def rollup_room_stats(app):
+    """Run every 15 minutes to refresh the room utilization rollup"""
+    with app.app_context():
+        from app.services.stats_service import rollup_recent_room_utilization
+        try:
+            rollup_recent_room_utilization()
+        except Exception as e:
+            app.logger.warning(f"Room utilization rollup failed: {str(e)}")
+
+def prune_timetable_changes(app):
+    """Run daily to drop timetable change log rows past the retention window"""
+    with app.app_context():
+        from app.services.timetable_version_service import prune_changes
+        try:
+            prune_changes(app.config['TIMETABLE_CHANGES_RETENTION_DAYS'])
+        except Exception as e:
+            app.logger.warning(f"Timetable change log pruning failed: {str(e)}")
+
+def purge_email_outbox(app):
+    """Run daily to delete delivered and failed mail past the retention window"""
+    with app.app_context():
+        from app.services.email_queue_service import purge_outbox
+        try:
+            purge_outbox(app.config['EMAIL_OUTBOX_RETENTION_DAYS'])
+        except Exception as e:
+            app.logger.warning(f"Email outbox purge failed: {str(e)}")
+
 def init_scheduler(app):
     """Initialize the scheduler with the app context"""
     if not scheduler.running:
@@ -40,6 +75,40 @@ def init_scheduler(app):
             id='class_reminder_job',
             replace_existing=True
         )
+        # Pick up CSV import jobs left queued or abandoned by a crashed worker
+        scheduler.add_job(
+            func=resume_stale_import_jobs,
+            trigger='interval',
+            minutes=1,
+            args=[app],
+            id='import_job_resume',
+            replace_existing=True
+        )
+        scheduler.add_job(
+            func=rollup_room_stats,
+            trigger='interval',
+            minutes=15,
+            args=[app],
+            id='room_stats_rollup',
+            replace_existing=True,
+            next_run_time=datetime.now()
+        )
+        scheduler.add_job(
+            func=prune_timetable_changes,
+            trigger='interval',
+            hours=24,
+            args=[app],
+            id='timetable_changes_prune',
+            replace_existing=True
+        )
+        scheduler.add_job(
+            func=purge_email_outbox,
+            trigger='interval',
+            hours=24,
+            args=[app],
+            id='email_outbox_purge',
+            replace_existing=True
+        )
         scheduler.start()
 
 def shutdown_scheduler():
@@ -0,0 +1,119 @@
+"""
+Admin dashboard statistics.
+
+Counters and daily rollups are maintained by database triggers (migration 0006),
+so building the dashboard snapshot is one small query over stats_counters and
+today's stats_daily rows. The snapshot is cached per process for
+STATS_CACHE_SECONDS. Room utilization (minutes booked per room per day) is
+recomputed by the scheduler, since timetable slots recur every week.
+"""
+import time
+import threading
+from datetime import date, datetime, timedelta
+
+from flask import current_app
+
+from app.db import query_db, execute_db
+
+# Metrics in stats_daily available to the time-series endpoint
+DAILY_METRICS = ('users_created', 'messages', 'notifications', 'bookings', 'room_minutes')
+
+_snapshot = None
+_snapshot_at = 0.0
+_snapshot_lock = threading.Lock()
+
+def _build_snapshot():
+    rows = query_db("""
+        SELECT 'counter' AS kind, name, '' AS dimension, SUM(value) AS value
+        FROM stats_counters GROUP BY name
+        UNION ALL
+        SELECT 'today', metric, dimension, value
+        FROM stats_daily WHERE day = CURRENT_DATE
+    """)
+    counters, today = {}, {}
+    for row in rows:
+        if row['kind'] == 'counter':
+            counters[row['name']] = int(row['value'])
+        else:
+            today.setdefault(row['name'], {})[row['dimension']] = int(row['value'])
+
+    def by_prefix(prefix):
+        return {name[len(prefix):]: value for name, value in counters.items()
+                if name.startswith(prefix) and '.' not in name[len(prefix):]}
+
+    users_by_department = {}
+    for name, value in counters.items():
+        parts = name.split('.')
+        if len(parts) == 4 and parts[0] == 'users' and parts[2] == 'dept':
+            users_by_department.setdefault(parts[3], {})[parts[1]] = value
+
+    return {
+        'total_students': counters.get('users.student', 0),
+        'total_professors': counters.get('users.professor', 0),
+        # total_classes = number of available classrooms (rooms), not timetable entries
+        'total_classes': counters.get('classrooms', 0),
+        'total_departments': counters.get('departments', 0),
+        'total_timetable_entries': counters.get('timetable_entries', 0),
+        'total_bookings': counters.get('auditorium_bookings', 0),
+        'total_messages': counters.get('messages', 0),
+        'total_notifications': counters.get('notifications', 0),
+        'rooms_by_type': by_prefix('classrooms.'),
+        'messages_by_channel': by_prefix('messages.'),
+        'notifications_by_type': by_prefix('notifications.'),
+        'users_by_department': users_by_department,
+        'today': {metric: today.get(metric, {}) for metric in DAILY_METRICS},
+        'generated_at': datetime.now().isoformat(),
+    }
+
+def get_snapshot():
+    """Dashboard statistics, rebuilt at most every STATS_CACHE_SECONDS per process"""
+    global _snapshot, _snapshot_at
+    ttl = current_app.config.get('STATS_CACHE_SECONDS', 30)
+    if _snapshot is not None and time.monotonic() - _snapshot_at < ttl:
+        return _snapshot
+    with _snapshot_lock:
+        if _snapshot is None or time.monotonic() - _snapshot_at >= ttl:
+            _snapshot = _build_snapshot()
+            _snapshot_at = time.monotonic()
+    return _snapshot
+
+def get_timeseries(metric, days=30, dimension=None):
+    """Daily values of a metric for the last `days` days: {dimension: [{'day', 'value'}, ...]}"""
+    query = """
+        SELECT day, dimension, value FROM stats_daily
+        WHERE metric = %s AND day > CURRENT_DATE - %s AND day <= CURRENT_DATE
+    """
+    params = [metric, days]
+    if dimension is not None:
+        query += " AND dimension = %s"
+        params.append(dimension)
+    query += " ORDER BY dimension, day"
+
+    series = {}
+    for row in query_db(query, tuple(params)):
+        series.setdefault(row['dimension'], []).append({'day': row['day'].isoformat(), 'value': int(row['value'])})
+    return series
+
+def rollup_room_utilization(day=None):
+    """Recompute room_minutes for one day: weekly timetable slots on that weekday plus confirmed bookings"""
+    day = day or date.today()
+    return execute_db("""
+        INSERT INTO stats_daily (day, metric, dimension, value)
+        SELECT %s, 'room_minutes', c.id::text, COALESCE(t.minutes, 0) + COALESCE(b.minutes, 0)
+        FROM classrooms c
+        LEFT JOIN (
+            SELECT classroom_id, SUM(EXTRACT(EPOCH FROM end_time - start_time) / 60) AS minutes
+            FROM timetable WHERE day_of_week = %s GROUP BY classroom_id
+        ) t ON t.classroom_id = c.id
+        LEFT JOIN (
+            SELECT classroom_id, SUM(EXTRACT(EPOCH FROM end_time - start_time) / 60) AS minutes
+            FROM auditorium_bookings WHERE booking_date = %s AND status = 'confirmed' GROUP BY classroom_id
+        ) b ON b.classroom_id = c.id
+        ON CONFLICT (day, metric, dimension) DO UPDATE SET value = EXCLUDED.value
+    """, (day, day.weekday(), day))
+
+def rollup_recent_room_utilization():
+    """Today's figure changes as bookings are made; yesterday's is finalised after midnight"""
+    today = date.today()
+    rollup_room_utilization(today - timedelta(days=1))
+    rollup_room_utilization(today)
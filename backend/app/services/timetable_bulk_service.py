@@ -0,0 +1,380 @@
+"""
+Set-based timetable operations (POST /api/timetable/bulk).
+
+Each operation selects entries with a filter and changes all of them:
+
+    shift     to another day (`days`) and/or by `minutes`
+    reassign  to another classroom_id and/or professor_id
+    clone     copy to another department + batch (`to`), optionally replacing it
+
+Weekly operations become one change list for plan_changes() / apply_plan(): the
+set is checked against the timetable and itself, then written in one transaction
+with deferred overlap constraints, so room swaps and chains of moves work.
+
+Operations with a `date` (shift) or a `from`/`to` range (reassign classroom_id)
+change single occurrences instead, as timetable_exceptions rows. They are checked
+per target date against that day's classes, other moved occurrences and
+auditorium bookings, and written together under the exception lock.
+"""
+from datetime import date, timedelta
+
+import psycopg2
+from psycopg2.extras import execute_values
+
+from app.db import query_db, transaction
+from app.utils.intervals import IntervalIndex
+from app.services.timetable_service import (
+    ENTRY_COLUMNS, CONFLICT_MESSAGES, CONFLICT_SCOPES, plan_changes, apply_plan, parse_time
+)
+from app.services.calendar_service import EXCEPTION_LOCK_KEY
+from app.services.availability_service import invalidate_availability
+
+BULK_OPS = ('shift', 'reassign', 'clone')
+FILTER_FIELDS = ('department_id', 'batch', 'professor_id', 'classroom_id', 'day_of_week')
+MAX_BULK_OPERATIONS = 50
+MAX_DATED_DAYS = 31
+DAY_SECONDS = 24 * 3600
+
+def _int(value, field):
+    try:
+        return int(value)
+    except (TypeError, ValueError):
+        raise ValueError(f'{field} must be a number')
+
+def _date(value, field):
+    try:
+        return date.fromisoformat(str(value))
+    except ValueError:
+        raise ValueError(f'{field} must be a date (YYYY-MM-DD)')
+
+def _seconds(t):
+    return t.hour * 3600 + t.minute * 60 + t.second
+
+def _shift(t, minutes):
+    """Time moved by `minutes`; raises ValueError when it leaves the day"""
+    seconds = _seconds(parse_time(t)) + minutes * 60
+    if not 0 <= seconds < DAY_SECONDS:
+        raise ValueError('Shift moves a class past midnight')
+    return parse_time(f'{seconds // 3600:02d}:{seconds // 60 % 60:02d}:{seconds % 60:02d}')
+
+def _select(filters, day_of_week=None):
+    """Entries matching an operation filter (and a weekday for dated operations)"""
+    if not isinstance(filters, dict):
+        raise ValueError('filter must be an object')
+    unknown = set(filters) - set(FILTER_FIELDS) - {'ids'}
+    if unknown:
+        raise ValueError(f'Unknown filter fields: {", ".join(sorted(unknown))}')
+    clauses, params = [], []
+    for field in FILTER_FIELDS:
+        if filters.get(field) is not None:
+            clauses.append(f"{field} = %s")
+            params.append(str(filters[field]) if field == 'batch' else _int(filters[field], field))
+    if filters.get('ids'):
+        clauses.append("id = ANY(%s)")
+        params.append([_int(i, 'ids') for i in filters['ids']])
+    if day_of_week is not None:
+        clauses.append("day_of_week = %s")
+        params.append(day_of_week)
+    if not clauses:
+        raise ValueError('filter needs at least one of: ' + ', '.join(FILTER_FIELDS + ('ids',)))
+    return query_db(f"SELECT id, {', '.join(ENTRY_COLUMNS)} FROM timetable WHERE {' AND '.join(clauses)} ORDER BY id",
+                    tuple(params))
+
+def _is_dated(operation):
+    return any(operation.get(field) for field in ('date', 'from', 'to_date')) or (
+        operation.get('op') == 'reassign' and operation.get('to'))
+
+def plan_bulk(operations):
+    """
+    Check a list of bulk operations. Returns {'valid', 'errors', 'conflicts', 'summary', 'plan'};
+    errors and conflicts name the operation they come from. `plan` is what apply_bulk() writes.
+    """
+    if not isinstance(operations, list) or not operations:
+        raise ValueError('operations must be a non-empty list')
+    if len(operations) > MAX_BULK_OPERATIONS:
+        raise ValueError(f'At most {MAX_BULK_OPERATIONS} operations per request')
+    for index, operation in enumerate(operations):
+        if not isinstance(operation, dict) or operation.get('op') not in BULK_OPS:
+            raise ValueError(f'operation {index}: op must be one of: {", ".join(BULK_OPS)}')
+    dated = {_is_dated(operation) for operation in operations}
+    if len(dated) > 1:
+        raise ValueError('Weekly and date-scoped operations cannot be combined in one request')
+    return _plan_dated(operations) if dated.pop() else _plan_weekly(operations)
+
+def _plan_weekly(operations):
+    changes, origin, errors, matched = [], [], [], []
+    for index, operation in enumerate(operations):
+        try:
+            ops = _weekly_changes(operation)
+        except ValueError as e:
+            errors.append({'operation': index, 'error': str(e)})
+            matched.append(0)
+            continue
+        matched.append(sum(1 for change in ops if change['op'] != 'delete'))
+        changes.extend(ops)
+        origin.extend([index] * len(ops))
+
+    if not changes:
+        return {'valid': False, 'errors': errors or [{'error': 'No timetable entries matched'}],
+                'conflicts': [], 'summary': {'matched': matched}, 'plan': None}
+
+    result = plan_changes(changes)
+    for error in result['errors']:
+        error['operation'] = origin[error['change']]
+    for conflict in result['conflicts']:
+        for ref in conflict['entries']:
+            if 'change' in ref:
+                ref['operation'] = origin[ref.pop('change')]
+    for error in result['errors']:
+        error.pop('change')
+    plan = result['plan']
+    return {
+        'valid': result['valid'] and not errors,
+        'errors': errors + result['errors'],
+        'conflicts': result['conflicts'],
+        'summary': dict({op: len(plan[op]) for op in ('create', 'move', 'delete')}, matched=matched),
+        'plan': {'weekly': plan},
+    }
+
+def _weekly_changes(operation):
+    """Changes (plan_changes format) for one weekly operation"""
+    kind = operation['op']
+    if kind == 'clone':
+        target = operation.get('to') or {}
+        if target.get('department_id') is None or not target.get('batch'):
+            raise ValueError('clone needs to.department_id and to.batch')
+        department_id, batch = _int(target['department_id'], 'department_id'), str(target['batch'])
+        entries = _select(operation.get('filter') or {})
+        changes = [dict({c: e[c] for c in ENTRY_COLUMNS}, op='create', department_id=department_id, batch=batch)
+                   for e in entries]
+        if operation.get('replace'):
+            changes += [{'op': 'delete', 'id': e['id']}
+                        for e in _select({'department_id': department_id, 'batch': batch})]
+        return changes
+
+    entries = _select(operation.get('filter') or {})
+    if kind == 'shift':
+        days, minutes = _int(operation.get('days', 0), 'days'), _int(operation.get('minutes', 0), 'minutes')
+        if not days and not minutes:
+            raise ValueError('shift needs days or minutes')
+        return [{'op': 'move', 'id': e['id'], 'day_of_week': (e['day_of_week'] + days) % 7,
+                 'start_time': _shift(e['start_time'], minutes), 'end_time': _shift(e['end_time'], minutes)}
+                for e in entries]
+
+    fields = {field: _int(operation[field], field) for field in ('classroom_id', 'professor_id')
+              if operation.get(field) is not None}
+    if not fields:
+        raise ValueError('reassign needs classroom_id or professor_id')
+    if 'professor_id' in fields and not query_db(
+            "SELECT id FROM users WHERE id = %s AND role = 'professor'", (fields['professor_id'],), one=True):
+        raise ValueError('Professor not found')
+    return [dict(fields, op='move', id=e['id']) for e in entries]
+
+def _plan_dated(operations):
+    """Occurrence overrides keyed (entry_id, date), checked per target date"""
+    errors, matched, overrides = [], [], {}
+    for index, operation in enumerate(operations):
+        try:
+            found = _dated_overrides(operation)
+        except ValueError as e:
+            errors.append({'operation': index, 'error': str(e)})
+            matched.append(0)
+            continue
+        matched.append(len(found))
+        for key, override in found.items():
+            if key in overrides:
+                errors.append({'operation': index, 'id': key[0], 'date': key[1].isoformat(),
+                               'error': 'Occurrence changed more than once'})
+                continue
+            override['operation'] = index
+            overrides[key] = override
+
+    if overrides:
+        errors.extend(_apply_existing(overrides))
+    conflicts = _dated_conflicts(overrides) if overrides else []
+    if not overrides and not errors:
+        errors.append({'error': 'No timetable entries matched'})
+    return {
+        'valid': not errors and not conflicts,
+        'errors': errors,
+        'conflicts': conflicts,
+        'summary': {'exceptions': len(overrides), 'matched': matched},
+        'plan': {'dated': overrides},
+    }
+
+def _dated_overrides(operation):
+    kind = operation['op']
+    if kind == 'clone':
+        raise ValueError('clone cannot be limited to dates')
+    if kind == 'shift':
+        day = _date(operation.get('date'), 'date')
+        to_date = _date(operation['to_date'], 'to_date') if operation.get('to_date') else day
+        minutes = _int(operation.get('minutes', 0), 'minutes')
+        if to_date == day and not minutes:
+            raise ValueError('shift needs to_date or minutes')
+        return {(e['id'], day): {'entry': e, 'date': day, 'target': to_date, 'minutes': minutes, 'classroom_id': None}
+                for e in _select(operation.get('filter') or {}, day.weekday())}
+
+    if operation.get('professor_id') is not None:
+        raise ValueError('professor_id cannot be reassigned for single dates')
+    if operation.get('classroom_id') is None:
+        raise ValueError('reassign needs classroom_id')
+    classroom_id = _int(operation['classroom_id'], 'classroom_id')
+    if not query_db("SELECT id FROM classrooms WHERE id = %s", (classroom_id,), one=True):
+        raise ValueError('Room not found')
+    first = _date(operation.get('from'), 'from')
+    last = _date(operation['to'], 'to') if operation.get('to') else first
+    if last < first or (last - first).days >= MAX_DATED_DAYS:
+        raise ValueError(f'from..to must be a range of at most {MAX_DATED_DAYS} days')
+    overrides = {}
+    for offset in range((last - first).days + 1):
+        day = first + timedelta(days=offset)
+        for e in _select(operation.get('filter') or {}, day.weekday()):
+            overrides[(e['id'], day)] = {'entry': e, 'date': day, 'target': day, 'minutes': 0,
+                                         'classroom_id': classroom_id}
+    return overrides
+
+def _apply_existing(overrides):
+    """
+    Start from an occurrence's current exception: skip cancelled ones, build on moved ones.
+    Returns errors for occurrences the shift would move past midnight (and drops them).
+    """
+    rows = query_db("""
+        SELECT timetable_id, exception_date, status, new_date, start_time, end_time, classroom_id
+        FROM timetable_exceptions WHERE timetable_id = ANY(%s) AND exception_date = ANY(%s)
+    """, (sorted({k[0] for k in overrides}), sorted({k[1] for k in overrides})))
+    existing = {(row['timetable_id'], row['exception_date']): row for row in rows}
+    errors = []
+    for key in list(overrides):
+        override, row = overrides[key], existing.get(key)
+        base = override['entry']
+        start, end, room = base['start_time'], base['end_time'], base['classroom_id']
+        if row is not None and row['status'] == 'cancelled':
+            del overrides[key]
+            continue
+        if row is not None:
+            start, end, room = row['start_time'], row['end_time'], row['classroom_id'] or room
+            if override['target'] == override['date'] and row['new_date']:
+                override['target'] = row['new_date']
+        try:
+            override['start_time'] = _shift(start, override['minutes'])
+            override['end_time'] = _shift(end, override['minutes'])
+        except ValueError as e:
+            errors.append({'operation': override['operation'], 'id': key[0], 'date': key[1].isoformat(),
+                           'error': str(e)})
+            del overrides[key]
+            continue
+        override['classroom_id'] = override['classroom_id'] or room
+    return errors
+
+def _fetch(cur, query, args):
+    if cur is None:
+        return query_db(query, args)
+    cur.execute(query, args)
+    return cur.fetchall()
+
+def _dated_conflicts(overrides, cur=None):
+    """
+    Room, professor and department + batch clashes on each target date involving an override.
+    Pass cur to read inside the caller's transaction (apply_bulk re-checks under the exception lock).
+    """
+    conflicts = []
+    targets = sorted({o['target'] for o in overrides.values()})
+    weekdays = sorted({d.weekday() for d in targets})
+    columns = 'id, ' + ', '.join(ENTRY_COLUMNS)
+    weekly = _fetch(cur, f"SELECT {columns} FROM timetable WHERE day_of_week = ANY(%s)", (weekdays,))
+    exceptions = _fetch(cur, f"""
+        SELECT x.id, x.timetable_id, x.exception_date, x.status, x.new_date, x.start_time, x.end_time,
+               COALESCE(x.classroom_id, t.classroom_id) AS classroom_id,
+               t.professor_id, t.department_id, t.batch
+        FROM timetable_exceptions x JOIN timetable t ON t.id = x.timetable_id
+        WHERE x.exception_date = ANY(%s) OR x.new_date = ANY(%s)
+    """, (targets, targets))
+    bookings = _fetch(cur, """
+        SELECT id, classroom_id, booking_date, start_time, end_time FROM auditorium_bookings
+        WHERE status = 'confirmed' AND booking_date = ANY(%s)
+    """, (targets,))
+
+    excepted = {(x['timetable_id'], x['exception_date']) for x in exceptions}
+    target_set = set(targets)
+    occupancy = []  # (ident, day, start, end, classroom_id, professor_id, department_id, batch)
+    for day in targets:
+        for e in weekly:
+            if e['day_of_week'] == day.weekday() and (e['id'], day) not in excepted and (e['id'], day) not in overrides:
+                occupancy.append((('id', e['id']), day, e['start_time'], e['end_time'], e['classroom_id'],
+                                  e['professor_id'], e['department_id'], e['batch']))
+    for x in exceptions:
+        day = x['new_date'] or x['exception_date']
+        if x['status'] == 'moved' and day in target_set and (x['timetable_id'], x['exception_date']) not in overrides:
+            occupancy.append((('exception', x['id']), day, x['start_time'], x['end_time'], x['classroom_id'],
+                              x['professor_id'], x['department_id'], x['batch']))
+    for b in bookings:
+        occupancy.append((('booking', b['id']), b['booking_date'], b['start_time'], b['end_time'],
+                          b['classroom_id'], None, None, None))
+    for key, o in overrides.items():
+        e = o['entry']
+        occupancy.append((('override', key), o['target'], o['start_time'], o['end_time'], o['classroom_id'],
+                          e['professor_id'], e['department_id'], e['batch']))
+
+    indexes = {scope: IntervalIndex() for scope in CONFLICT_SCOPES}
+    for ident, day, start, end, room, professor, department, batch in occupancy:
+        values = {'classroom_id': room, 'professor_id': professor, 'department_id': department, 'batch': batch}
+        for scope, (_, scope_columns) in CONFLICT_SCOPES.items():
+            scope_key = tuple(values[c] for c in scope_columns)
+            if None not in scope_key:
+                indexes[scope].add(scope_key + (day,), _seconds(start), _seconds(end), ident)
+
+    def ref(ident):
+        if ident[0] == 'override':
+            entry_id, day = ident[1]
+            return {'id': entry_id, 'date': day.isoformat(), 'operation': overrides[ident[1]]['operation']}
+        return {'booking_id': ident[1]} if ident[0] == 'booking' else (
+            {'exception_id': ident[1]} if ident[0] == 'exception' else {'id': ident[1]})
+
+    for scope, index in indexes.items():
+        for scope_key, a, b in index.conflicts():
+            if a[0] != 'override' and b[0] != 'override':
+                continue
+            conflicts.append({
+                'type': scope,
+                'date': scope_key[-1].isoformat(),
+                'error': CONFLICT_MESSAGES[CONFLICT_SCOPES[scope][0]],
+                'entries': [ref(a), ref(b)],
+            })
+    return conflicts
+
+def apply_bulk(plan, created_by):
+    """Write a validated bulk plan in one transaction; returns created ids and (department_id, batch) -> count"""
+    if 'weekly' in plan:
+        return apply_plan(plan['weekly'], created_by)
+
+    overrides = plan['dated']
+    changed = {}
+    for override in overrides.values():
+        key = (override['entry']['department_id'], override['entry']['batch'])
+        changed[key] = changed.get(key, 0) + 1
+    try:
+        with transaction() as cur:
+            cur.execute("SELECT pg_advisory_xact_lock(%s)", (EXCEPTION_LOCK_KEY,))
+            # Validation ran without the lock: a one-off move or booking may have taken a slot since
+            conflicts = _dated_conflicts(overrides, cur)
+            if conflicts:
+                raise ValueError(conflicts[0]['error'])
+            _write_overrides(cur, overrides, created_by)
+    except psycopg2.errors.ForeignKeyViolation:
+        raise ValueError('Room not found') from None
+    invalidate_availability()
+    return {'created_ids': [], 'changed': changed}
+
+def _write_overrides(cur, overrides, created_by):
+    execute_values(cur, """
+        INSERT INTO timetable_exceptions (timetable_id, exception_date, status, new_date, start_time,
+                                          end_time, classroom_id, created_by)
+        VALUES %s
+        ON CONFLICT (timetable_id, exception_date) DO UPDATE SET
+            status = EXCLUDED.status, new_date = EXCLUDED.new_date, start_time = EXCLUDED.start_time,
+            end_time = EXCLUDED.end_time, classroom_id = EXCLUDED.classroom_id,
+            created_by = EXCLUDED.created_by, created_at = CURRENT_TIMESTAMP
+    """, [(entry_id, day, 'moved', o['target'] if o['target'] != day else None, o['start_time'],
+           o['end_time'], o['classroom_id'], created_by) for (entry_id, day), o in overrides.items()],
+        template="(%s, %s, %s, %s, %s::time, %s::time, %s, %s)")
@@ -0,0 +1,397 @@
+"""
+Automatic timetable generation.
+
+Courses (department, batch, subject, professor, hours per week) are expanded into
+one-slot sessions and placed on a weekly grid of slots (days x WEEKLY_SLOTS by
+default). Occupancy of every room, professor and batch is a bitset with one bit
+per slot, so finding the free slots for a session is a few AND/OR operations.
+Slots already used by existing timetable entries start out occupied, and
+professor availability narrows the slots a professor may teach in.
+
+Sessions are placed most-constrained first, in the smallest room that fits the
+batch, spreading a course over different days where possible. A session with no
+free slot is fitted by moving the one placed session that blocks it. The search
+restarts with a perturbed order until every session is placed or the time budget
+runs out, and the best attempt is kept. The result is written with one INSERT.
+"""
+import time
+import random
+from collections import defaultdict
+
+from psycopg2.extras import execute_values
+
+from app.db import query_db
+from app.services.timetable_service import ENTRY_COLUMNS, check_slot, parse_time, timetable_writes
+
+# Weekly time slots (9:00-9:55 style) - (start, end)
+WEEKLY_SLOTS = [
+    ('09:00', '09:55'), ('10:00', '10:55'), ('11:00', '11:55'), ('12:00', '12:55'),
+    ('13:00', '13:55'), ('14:00', '14:55'), ('15:00', '15:55'), ('16:00', '16:55'),
+]
+DEFAULT_DAYS = (0, 1, 2, 3, 4)
+
+COURSE_FIELDS = ('department_id', 'batch', 'subject', 'professor_id', 'hours_per_week')
+
+def _bits(mask):
+    """Indexes of the set bits of mask, lowest first"""
+    while mask:
+        low = mask & -mask
+        yield low.bit_length() - 1
+        mask ^= low
+
+class SlotGrid:
+    """Weekly slot grid; bit i is slot i % per_day on days[i // per_day]"""
+
+    def __init__(self, days, slots):
+        self.days = list(days)
+        self.slots = slots
+        self.per_day = len(slots)
+        self.size = len(self.days) * self.per_day
+        self.full = (1 << self.size) - 1
+
+    def slot(self, bit):
+        """(day_of_week, start, end) of a bit"""
+        start, end = self.slots[bit % self.per_day]
+        return self.days[bit // self.per_day], start, end
+
+    def day_of(self, bit):
+        return bit // self.per_day
+
+    def _mask(self, day, test):
+        if day not in self.days:
+            return 0
+        base = self.days.index(day) * self.per_day
+        mask = 0
+        for i, (start, end) in enumerate(self.slots):
+            if test(start, end):
+                mask |= 1 << (base + i)
+        return mask
+
+    def overlapping(self, day, start, end):
+        """Slots on `day` that overlap [start, end)"""
+        return self._mask(day, lambda s, e: s < end and start < e)
+
+    def within(self, day, start, end):
+        """Slots on `day` that lie entirely inside [start, end]"""
+        return self._mask(day, lambda s, e: start <= s and e <= end)
+
+class _Attempt:
+    """One placement pass over the sessions"""
+
+    def __init__(self, problem, rng):
+        self.p = problem
+        self.rng = rng
+        busy = problem['busy']
+        self.room_busy = defaultdict(int, busy['room'])
+        self.prof_busy = defaultdict(int, busy['professor'])
+        self.group_busy = defaultdict(int, busy['group'])
+        self.course_days = defaultdict(int)  # course index -> sessions per grid day, 8 bits per day
+        self.owner = {}                      # (kind, key, bit) -> session placed there
+        self.placed = {}                     # session -> (bit, room_id)
+
+    def _keys(self, s, bit, room):
+        session = self.p['sessions'][s]
+        return (('room', room, bit), ('prof', session['professor_id'], bit), ('group', session['group'], bit))
+
+    def place(self, s, bit, room):
+        session = self.p['sessions'][s]
+        flag = 1 << bit
+        self.room_busy[room] |= flag
+        self.prof_busy[session['professor_id']] |= flag
+        self.group_busy[session['group']] |= flag
+        self.course_days[session['course']] += 1 << (self.p['grid'].day_of(bit) * 8)
+        for key in self._keys(s, bit, room):
+            self.owner[key] = s
+        self.placed[s] = (bit, room)
+
+    def unplace(self, s):
+        bit, room = self.placed.pop(s)
+        session = self.p['sessions'][s]
+        flag = ~(1 << bit)
+        self.room_busy[room] &= flag
+        self.prof_busy[session['professor_id']] &= flag
+        self.group_busy[session['group']] &= flag
+        self.course_days[session['course']] -= 1 << (self.p['grid'].day_of(bit) * 8)
+        for key in self._keys(s, bit, room):
+            del self.owner[key]
+        return bit, room
+
+    def _free_room(self, s, bit):
+        size = self.p['sessions'][s]['size']
+        for room, capacity in self.p['rooms']:
+            if (capacity is None or capacity >= size) and not (self.room_busy[room] >> bit) & 1:
+                return room
+        return None
+
+    def _ordered(self, s, mask):
+        """Slots of mask, preferring days the course does not use yet and lighter days for the batch"""
+        session = self.p['sessions'][s]
+        grid = self.p['grid']
+        used = self.course_days[session['course']]
+        group = self.group_busy[session['group']]
+        day_full = (1 << grid.per_day) - 1
+
+        def key(bit):
+            day = grid.day_of(bit)
+            return ((used >> (day * 8)) & 0xFF,
+                    bin((group >> (day * grid.per_day)) & day_full).count('1'),
+                    self.rng.random(), bit)
+        return sorted(_bits(mask), key=key)
+
+    def try_place(self, s, exclude=0):
+        session = self.p['sessions'][s]
+        free = (self.p['allowed'].get(session['professor_id'], self.p['grid'].full)
+                & ~self.prof_busy[session['professor_id']] & ~self.group_busy[session['group']]
+                & ~exclude & self.p['grid'].full)
+        for bit in self._ordered(s, free):
+            room = self._free_room(s, bit)
+            if room is not None:
+                self.place(s, bit, room)
+                return True
+        return False
+
+    def repair(self, s):
+        """Fit s by moving the single placed session blocking one of its slots"""
+        session = self.p['sessions'][s]
+        allowed = self.p['allowed'].get(session['professor_id'], self.p['grid'].full)
+        for bit in self._ordered(s, allowed):
+            blockers = set()
+            for kind, key in (('prof', session['professor_id']), ('group', session['group'])):
+                busy = self.prof_busy[key] if kind == 'prof' else self.group_busy[key]
+                if (busy >> bit) & 1:
+                    owner = self.owner.get((kind, key, bit))
+                    if owner is None:
+                        break  # taken by an existing entry, not movable
+                    blockers.add(owner)
+            else:
+                if not blockers and self._free_room(s, bit) is None:
+                    size = session['size']
+                    for room, capacity in self.p['rooms']:
+                        owner = self.owner.get(('room', room, bit))
+                        if owner is not None and (capacity is None or capacity >= size):
+                            blockers.add(owner)
+                            break
+                if len(blockers) != 1:
+                    continue
+                blocker = blockers.pop()
+                old_bit, old_room = self.unplace(blocker)
+                room = self._free_room(s, bit)
+                if room is not None:
+                    self.place(s, bit, room)
+                    if self.try_place(blocker, exclude=1 << old_bit):
+                        return True
+                    self.unplace(s)
+                self.place(blocker, old_bit, old_room)
+        return False
+
+    def run(self, order, deadline):
+        unplaced = []
+        for s in order:
+            if not self.try_place(s) and not (time.monotonic() < deadline and self.repair(s)):
+                unplaced.append(s)
+        return unplaced
+
+def _popcount(mask):
+    return bin(mask).count('1')
+
+def search(problem, budget_seconds, on_progress=None, seed=None):
+    """Best placement found within the budget: ({session: (bit, room_id)}, attempts)"""
+    sessions = problem['sessions']
+    grid = problem['grid']
+    rng = random.Random(seed)
+    started = time.monotonic()
+    deadline = started + budget_seconds
+
+    def difficulty(s):
+        session = sessions[s]
+        free = (problem['allowed'].get(session['professor_id'], grid.full)
+                & ~problem['busy']['professor'].get(session['professor_id'], 0)
+                & ~problem['busy']['group'].get(session['group'], 0))
+        return (_popcount(free), -session['hours'], -session['size'])
+
+    base_order = sorted(range(len(sessions)), key=difficulty)
+    best, attempts = None, 0
+    while True:
+        attempts += 1
+        if attempts == 1:
+            order = base_order
+        else:
+            # Perturb the most-constrained-first order: nearby sessions swap places at random
+            spread = len(sessions) / 4
+            order = [s for _, s in sorted((i + rng.random() * spread, s) for i, s in enumerate(base_order))]
+        attempt = _Attempt(problem, rng)
+        attempt.run(order, deadline)
+        if best is None or len(attempt.placed) > len(best):
+            best = dict(attempt.placed)
+        if on_progress:
+            on_progress({
+                'attempt': attempts,
+                'placed': len(best),
+                'total_sessions': len(sessions),
+                'elapsed_seconds': round(time.monotonic() - started, 2),
+            })
+        if len(best) == len(sessions) or time.monotonic() >= deadline:
+            return best, attempts
+
+def _int(value, field):
+    try:
+        return int(value)
+    except (TypeError, ValueError):
+        raise ValueError(f'{field} must be a number')
+
+def _ranges(value, field):
+    """[[start, end], ...] as a list of (start, end) pairs; raises ValueError on any other shape"""
+    if not isinstance(value, list) or not all(isinstance(r, (list, tuple)) and len(r) == 2 for r in value):
+        raise ValueError(f'{field} must be a list of [start, end] pairs')
+    return value
+
+def build_problem(data):
+    """
+    Validate a generate request and load rooms, batch sizes, professors and existing
+    occupancy from the database. Raises ValueError on bad input.
+    """
+    courses = data.get('courses')
+    if not isinstance(courses, list) or not courses:
+        raise ValueError('courses must be a non-empty list')
+
+    if not isinstance(data.get('days') or [], list):
+        raise ValueError('days must be a list of numbers')
+    try:
+        days = sorted({int(d) for d in data.get('days') or DEFAULT_DAYS})
+    except (TypeError, ValueError):
+        raise ValueError('days must be a list of numbers')
+    if not all(0 <= d <= 6 for d in days):
+        raise ValueError('days must be between 0 and 6')
+    slots = sorted(check_slot(start, end) for start, end in (_ranges(data['slots'], 'slots') if data.get('slots')
+                                                              else WEEKLY_SLOTS))
+    # Each slot is its own bit, so overlapping slots would let one room, professor or batch be double-booked
+    for (_, previous_end), (start, _) in zip(slots, slots[1:]):
+        if start < previous_end:
+            raise ValueError('slots must not overlap')
+    grid = SlotGrid(days, slots)
+
+    parsed = []
+    for index, course in enumerate(courses):
+        if not isinstance(course, dict):
+            raise ValueError(f'courses[{index}] must be an object')
+        for field in COURSE_FIELDS:
+            if course.get(field) in (None, ''):
+                raise ValueError(f'courses[{index}].{field} is required')
+        hours = _int(course['hours_per_week'], f'courses[{index}].hours_per_week')
+        if not 1 <= hours <= grid.size:
+            raise ValueError(f'courses[{index}].hours_per_week must be between 1 and {grid.size}')
+        parsed.append({
+            'department_id': _int(course['department_id'], f'courses[{index}].department_id'),
+            'batch': str(course['batch']),
+            'subject': str(course['subject']),
+            'professor_id': _int(course['professor_id'], f'courses[{index}].professor_id'),
+            'hours': hours,
+            'students': course.get('students'),
+        })
+
+    professor_ids = sorted({c['professor_id'] for c in parsed})
+    found = {row['id'] for row in query_db(
+        "SELECT id FROM users WHERE role = 'professor' AND is_active = TRUE AND id = ANY(%s)", (professor_ids,)
+    )}
+    missing = [p for p in professor_ids if p not in found]
+    if missing:
+        raise ValueError(f'Professor not found: {", ".join(str(p) for p in missing)}')
+
+    department_ids = sorted({c['department_id'] for c in parsed})
+    found = {row['id'] for row in query_db("SELECT id FROM departments WHERE id = ANY(%s)", (department_ids,))}
+    if len(found) != len(department_ids):
+        raise ValueError('Department not found')
+
+    rooms = [(row['id'], row['capacity']) for row in query_db(
+        "SELECT id, capacity FROM classrooms WHERE room_type = 'classroom' ORDER BY capacity NULLS LAST, id"
+    )]
+    if not rooms:
+        raise ValueError('No classrooms found')
+
+    sizes = {(row['department_id'], row['batch']): row['students'] for row in query_db("""
+        SELECT department_id, batch, COUNT(*) AS students FROM users
+        WHERE role = 'student' AND is_active = TRUE AND department_id = ANY(%s)
+        GROUP BY department_id, batch
+    """, (department_ids,))}
+
+    busy = {'room': defaultdict(int), 'professor': defaultdict(int), 'group': defaultdict(int)}
+    for row in query_db("""
+        SELECT classroom_id, professor_id, department_id, batch, day_of_week, start_time, end_time
+        FROM timetable WHERE day_of_week = ANY(%s)
+    """, (days,)):
+        mask = grid.overlapping(row['day_of_week'], row['start_time'], row['end_time'])
+        busy['room'][row['classroom_id']] |= mask
+        busy['professor'][row['professor_id']] |= mask
+        busy['group'][(row['department_id'], row['batch'])] |= mask
+
+    allowed = {}
+    availability = data.get('professor_availability') or {}
+    if not isinstance(availability, dict):
+        raise ValueError('professor_availability must be an object: {professor_id: {day: [[start, end], ...]}}')
+    for professor_id, by_day in availability.items():
+        professor_id = _int(professor_id, 'professor_availability key')
+        if not isinstance(by_day or {}, dict):
+            raise ValueError('professor_availability values must be objects: {day: [[start, end], ...]}')
+        mask = 0
+        for day, ranges in (by_day or {}).items():
+            for start, end in _ranges(ranges, 'professor_availability ranges'):
+                mask |= grid.within(_int(day, 'professor_availability day'),
+                                    parse_time(start, 'start'), parse_time(end, 'end'))
+        allowed[professor_id] = mask
+
+    sessions = []
+    for index, course in enumerate(parsed):
+        group = (course['department_id'], course['batch'])
+        size = _int(course['students'], f'courses[{index}].students') if course['students'] is not None \
+            else sizes.get(group, 0)
+        for _ in range(course['hours']):
+            sessions.append({'course': index, 'professor_id': course['professor_id'], 'group': group,
+                             'size': size, 'hours': course['hours']})
+
+    return {'courses': parsed, 'sessions': sessions, 'grid': grid, 'rooms': rooms,
+            'busy': busy, 'allowed': allowed}
+
+def generate(problem, budget_seconds, on_progress=None, seed=None):
+    """Run the search; returns {'entries', 'unplaced', 'placed', 'total_sessions', 'attempts', 'elapsed_seconds'}"""
+    started = time.monotonic()
+    placements, attempts = search(problem, budget_seconds, on_progress, seed)
+
+    grid, courses = problem['grid'], problem['courses']
+    entries = []
+    missing = defaultdict(int)
+    for s, session in enumerate(problem['sessions']):
+        if s not in placements:
+            missing[session['course']] += 1
+            continue
+        bit, room = placements[s]
+        course = courses[session['course']]
+        day, start, end = grid.slot(bit)
+        entries.append({
+            'department_id': course['department_id'], 'batch': course['batch'], 'classroom_id': room,
+            'professor_id': course['professor_id'], 'subject': course['subject'],
+            'day_of_week': day, 'start_time': start, 'end_time': end,
+        })
+    entries.sort(key=lambda e: (e['day_of_week'], e['start_time'], e['classroom_id']))
+
+    return {
+        'entries': entries,
+        'unplaced': [
+            {'course': index, 'department_id': courses[index]['department_id'], 'batch': courses[index]['batch'],
+             'subject': courses[index]['subject'], 'missing_hours': count}
+            for index, count in sorted(missing.items())
+        ],
+        'placed': len(entries),
+        'total_sessions': len(problem['sessions']),
+        'attempts': attempts,
+        'elapsed_seconds': round(time.monotonic() - started, 2),
+    }
+
+def insert_entries(entries, created_by):
+    """Insert generated entries in one statement; returns the new ids"""
+    if not entries:
+        return []
+    with timetable_writes() as cur:
+        rows = execute_values(cur, f"""
+            INSERT INTO timetable ({', '.join(ENTRY_COLUMNS)}, created_by) VALUES %s RETURNING id
+        """, [tuple(e[c] for c in ENTRY_COLUMNS) + (created_by,) for e in entries], fetch=True)
+    return [row['id'] for row in rows]
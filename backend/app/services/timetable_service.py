@@ -0,0 +1,311 @@
+"""
+Timetable writes.
+
+Room, professor and department + batch overlaps are rejected by exclusion
+constraints on timetable (migration 0007), so a create or update is one
+statement and concurrent writes cannot both succeed. Constraint violations
+are raised as TimetableConflict carrying the same messages the old conflict
+queries returned.
+"""
+from contextlib import contextmanager
+from datetime import time
+
+import psycopg2
+from psycopg2.extras import execute_values
+
+from app.db import query_db, transaction
+from app.services.availability_service import invalidate_availability
+from app.services.timetable_snapshot import mark_snapshot_stale
+from app.utils.intervals import IntervalIndex
+
+CONFLICT_MESSAGES = {
+    'timetable_room_overlap': 'Room is already booked for this time slot',
+    'timetable_professor_overlap': 'Professor is already assigned to another class at this time',
+    'timetable_batch_overlap': 'This batch already has another class at this time',
+}
+
+MISSING_REFERENCE_MESSAGES = {
+    'timetable_department_id_fkey': 'Department not found',
+    'timetable_classroom_id_fkey': 'Room not found',
+    'timetable_professor_id_fkey': 'Professor not found',
+}
+
+ENTRY_COLUMNS = ('department_id', 'batch', 'classroom_id', 'professor_id', 'subject',
+                 'day_of_week', 'start_time', 'end_time')
+
+class TimetableConflict(ValueError):
+    """A write overlapped an existing entry; `constraint` names the violated constraint"""
+    def __init__(self, constraint, message):
+        super().__init__(message)
+        self.constraint = constraint
+
+def parse_time(value, field='time'):
+    """time from 'HH:MM', 'HH:MM:SS' or a time; raises ValueError"""
+    if isinstance(value, time):
+        return value
+    try:
+        return time.fromisoformat(str(value).strip())
+    except ValueError:
+        raise ValueError(f'{field} must be a time (HH:MM)')
+
+def check_slot(start_time, end_time):
+    """Parsed (start, end); raises ValueError unless end is after start"""
+    start, end = parse_time(start_time, 'start_time'), parse_time(end_time, 'end_time')
+    if end <= start:
+        raise ValueError('end_time must be after start_time')
+    return start, end
+
+@contextmanager
+def timetable_writes(messages=None):
+    """
+    Transaction cursor for timetable writes. Overlaps are raised as TimetableConflict
+    (`messages` overrides the text per constraint); missing references as ValueError.
+    """
+    try:
+        with transaction() as cur:
+            yield cur
+        invalidate_availability()
+        mark_snapshot_stale()
+    except psycopg2.errors.ExclusionViolation as e:
+        name = e.diag.constraint_name
+        text = (messages or {}).get(name) or CONFLICT_MESSAGES.get(name, 'Timetable conflict')
+        raise TimetableConflict(name, text) from None
+    except psycopg2.errors.ForeignKeyViolation as e:
+        raise ValueError(MISSING_REFERENCE_MESSAGES.get(e.diag.constraint_name, 'Referenced record not found')) from None
+
+def create_entry(data, created_by):
+    """Insert one entry (conflicts checked by the database); returns the new row"""
+    values = dict(data)
+    values['start_time'], values['end_time'] = check_slot(data['start_time'], data['end_time'])
+    with timetable_writes() as cur:
+        cur.execute(f"""
+            INSERT INTO timetable ({', '.join(ENTRY_COLUMNS)}, created_by)
+            VALUES ({', '.join(['%s'] * len(ENTRY_COLUMNS))}, %s)
+            RETURNING *
+        """, tuple(values[c] for c in ENTRY_COLUMNS) + (created_by,))
+        return dict(cur.fetchone())
+
+def update_entry(entry, changes, messages=None):
+    """
+    Apply `changes` (column -> value) to an existing entry row in one UPDATE.
+    Returns the updated row, or None if the entry no longer exists.
+    """
+    changes = dict(changes)
+    if 'start_time' in changes or 'end_time' in changes:
+        changes['start_time'], changes['end_time'] = check_slot(
+            changes.get('start_time', entry['start_time']), changes.get('end_time', entry['end_time'])
+        )
+
+    sets = [f"{column} = %s" for column in changes] + ["updated_at = CURRENT_TIMESTAMP"]
+    with timetable_writes(messages) as cur:
+        cur.execute(
+            f"UPDATE timetable SET {', '.join(sets)} WHERE id = %s RETURNING *",
+            tuple(changes.values()) + (entry['id'],)
+        )
+        row = cur.fetchone()
+    return dict(row) if row else None
+
+# Planned changes (POST /api/timetable/validate)
+PLAN_OPS = ('create', 'move', 'delete')
+MOVE_FIELDS = ('classroom_id', 'professor_id', 'subject', 'day_of_week', 'start_time', 'end_time')
+MAX_PLAN_CHANGES = 20000
+
+# Scope of each overlap constraint: the columns that must match for two slots to clash
+CONFLICT_SCOPES = {
+    'room': ('timetable_room_overlap', ('classroom_id',)),
+    'professor': ('timetable_professor_overlap', ('professor_id',)),
+    'batch': ('timetable_batch_overlap', ('department_id', 'batch')),
+}
+
+def _seconds(t):
+    return t.hour * 3600 + t.minute * 60 + t.second
+
+def _int_field(change, field):
+    try:
+        return int(change[field])
+    except (TypeError, ValueError):
+        raise ValueError(f'{field} must be a number')
+
+def _parse_change(change):
+    """Normalised (op, id, fields) for one proposed change; raises ValueError"""
+    if not isinstance(change, dict):
+        raise ValueError('Each change must be an object')
+    op = change.get('op')
+    if op not in PLAN_OPS:
+        raise ValueError(f'op must be one of: {", ".join(PLAN_OPS)}')
+
+    if op == 'create':
+        for field in ENTRY_COLUMNS:
+            value = change.get(field)
+            if value is None or (isinstance(value, str) and value.strip() == ''):
+                raise ValueError(f'{field} is required')
+        fields = {field: change[field] for field in ENTRY_COLUMNS}
+        entry_id = None
+    else:
+        if change.get('id') is None:
+            raise ValueError('id is required')
+        entry_id = _int_field(change, 'id')
+        fields = {field: change[field] for field in MOVE_FIELDS if field in change} if op == 'move' else {}
+        if op == 'move' and not fields:
+            raise ValueError('move needs at least one of: ' + ', '.join(MOVE_FIELDS))
+
+    for field in ('department_id', 'classroom_id', 'professor_id', 'day_of_week'):
+        if field in fields:
+            fields[field] = _int_field(fields, field)
+    if 'day_of_week' in fields and not (0 <= fields['day_of_week'] <= 6):
+        raise ValueError('day_of_week must be between 0 and 6')
+    for field in ('start_time', 'end_time'):
+        if field in fields:
+            fields[field] = parse_time(fields[field], field)
+    if 'batch' in fields:
+        fields['batch'] = str(fields['batch'])
+    return op, entry_id, fields
+
+def plan_changes(changes):
+    """
+    Check proposed creates, moves and deletes against the timetable and each other.
+
+    Loads the entries on every day the changes land on, builds one interval index per
+    constraint scope (room, professor, department + batch) over the resulting timetable
+    and sweeps it once. Returns {'valid', 'errors', 'conflicts', 'plan'}; `plan` is what
+    apply_plan() writes.
+    """
+    if not isinstance(changes, list) or not changes:
+        raise ValueError('changes must be a non-empty list')
+    if len(changes) > MAX_PLAN_CHANGES:
+        raise ValueError(f'At most {MAX_PLAN_CHANGES} changes per request')
+
+    errors, parsed, seen_ids = [], [], set()
+    for index, change in enumerate(changes):
+        try:
+            op, entry_id, fields = _parse_change(change)
+            if entry_id is not None:
+                if entry_id in seen_ids:
+                    raise ValueError('Entry changed more than once')
+                seen_ids.add(entry_id)
+        except ValueError as e:
+            errors.append({'change': index, 'error': str(e)})
+            continue
+        parsed.append((index, op, entry_id, fields))
+
+    columns = 'id, ' + ', '.join(ENTRY_COLUMNS)
+    referenced = {}
+    if seen_ids:
+        referenced = {row['id']: row for row in query_db(
+            f"SELECT {columns} FROM timetable WHERE id = ANY(%s)", (list(seen_ids),)
+        )}
+
+    # The resulting version of every created or changed entry, keyed ('new', index) or ('id', id)
+    proposed, deleted, change_of = {}, set(), {}
+    for index, op, entry_id, fields in parsed:
+        if entry_id is not None and entry_id not in referenced:
+            errors.append({'change': index, 'error': 'Timetable entry not found'})
+            continue
+        if op == 'delete':
+            deleted.add(entry_id)
+            continue
+        entry = dict(referenced[entry_id], **fields) if op == 'move' else fields
+        if _seconds(entry['end_time']) <= _seconds(entry['start_time']):
+            errors.append({'change': index, 'error': 'end_time must be after start_time'})
+            continue
+        key = ('id', entry_id) if op == 'move' else ('new', index)
+        proposed[key] = entry
+        change_of[key] = index
+
+    days = sorted({entry['day_of_week'] for entry in proposed.values()})
+    timetable = {}
+    if days:
+        for row in query_db(f"SELECT {columns} FROM timetable WHERE day_of_week = ANY(%s)", (days,)):
+            if row['id'] not in deleted:
+                timetable[('id', row['id'])] = row
+    timetable.update(proposed)
+
+    indexes = {scope: IntervalIndex() for scope in CONFLICT_SCOPES}
+    for key, entry in timetable.items():
+        start, end = _seconds(entry['start_time']), _seconds(entry['end_time'])
+        for scope, (_, scope_columns) in CONFLICT_SCOPES.items():
+            scope_key = tuple(entry[c] for c in scope_columns) + (entry['day_of_week'],)
+            indexes[scope].add(scope_key, start, end, key)
+
+    def ref(key):
+        out = {'id': key[1]} if key[0] == 'id' else {}
+        if key in change_of:
+            out['change'] = change_of[key]
+        return out
+
+    conflicts = []
+    for scope, index in indexes.items():
+        for scope_key, a, b in index.conflicts():
+            # Existing entries cannot overlap each other (constraints); only report proposed ones
+            if a not in proposed and b not in proposed:
+                continue
+            conflicts.append({
+                'type': scope,
+                'day_of_week': scope_key[-1],
+                'error': CONFLICT_MESSAGES[CONFLICT_SCOPES[scope][0]],
+                'entries': [ref(a), ref(b)],
+            })
+
+    errors.sort(key=lambda e: e['change'])
+    return {
+        'valid': not errors and not conflicts,
+        'errors': errors,
+        'conflicts': conflicts,
+        'plan': {
+            'create': [entry for key, entry in proposed.items() if key[0] == 'new'],
+            'move': {key[1]: entry for key, entry in proposed.items() if key[0] == 'id'},
+            'delete': [referenced[i] for i in sorted(deleted)],
+            # Rows as read here, for apply_plan to re-check under lock
+            'read': {key[1]: referenced[key[1]] for key in proposed if key[0] == 'id'}
+                    | {i: referenced[i] for i in deleted},
+        },
+    }
+
+def _check_unchanged(cur, read):
+    """Lock the planned rows (FOR UPDATE) and raise ValueError if any changed since they were read"""
+    if not read:
+        return
+    cur.execute(f"SELECT id, {', '.join(ENTRY_COLUMNS)} FROM timetable WHERE id = ANY(%s) ORDER BY id FOR UPDATE",
+                (list(read),))
+    current = {row['id']: row for row in cur.fetchall()}
+    for entry_id, row in read.items():
+        if entry_id not in current or any(current[entry_id][c] != row[c] for c in ENTRY_COLUMNS):
+            raise ValueError(f'Timetable entry {entry_id} changed since the changes were checked; validate again')
+
+def apply_plan(plan, created_by):
+    """
+    Write a validated plan in one transaction. Overlap constraints are deferred to
+    commit, so swaps and chains of moves are checked once against the final timetable.
+    Moved and deleted rows are locked first; if any changed since plan_changes() read
+    them, nothing is written and ValueError is raised.
+    Returns the new entry ids and a (department_id, batch) -> changes count.
+    """
+    changed = {}
+    for entry in plan['create'] + list(plan['move'].values()) + plan['delete']:
+        key = (entry['department_id'], entry['batch'])
+        changed[key] = changed.get(key, 0) + 1
+
+    with timetable_writes() as cur:
+        cur.execute("SET CONSTRAINTS timetable_room_overlap, timetable_professor_overlap, "
+                    "timetable_batch_overlap DEFERRED")
+        _check_unchanged(cur, plan['read'])
+        if plan['delete']:
+            cur.execute("DELETE FROM timetable WHERE id = ANY(%s)", ([e['id'] for e in plan['delete']],))
+        if plan['move']:
+            execute_values(cur, """
+                UPDATE timetable t
+                SET classroom_id = v.classroom_id, professor_id = v.professor_id, subject = v.subject,
+                    day_of_week = v.day_of_week, start_time = v.start_time, end_time = v.end_time,
+                    updated_at = CURRENT_TIMESTAMP
+                FROM (VALUES %s) AS v(id, classroom_id, professor_id, subject, day_of_week, start_time, end_time)
+                WHERE t.id = v.id
+            """, [(entry_id,) + tuple(entry[c] for c in MOVE_FIELDS) for entry_id, entry in plan['move'].items()],
+                template="(%s, %s, %s, %s, %s, %s::time, %s::time)")
+        created = []
+        if plan['create']:
+            created = execute_values(cur, f"""
+                INSERT INTO timetable ({', '.join(ENTRY_COLUMNS)}, created_by) VALUES %s RETURNING id
+            """, [tuple(entry[c] for c in ENTRY_COLUMNS) + (created_by,) for entry in plan['create']],
+                fetch=True)
+
+    return {'created_ids': [row['id'] for row in created], 'changed': changed}
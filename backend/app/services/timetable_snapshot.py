@@ -0,0 +1,258 @@
+"""
+Compiled timetable snapshot for student reads.
+
+The student timetable for a department + batch is the same for every student in
+it, so instead of a four-table JOIN and serialize_rows per request the rows are
+serialized once into JSON fragments, one per (department, batch, day), and kept
+in a file that every worker process memory-maps:
+
+    header   magic, timetable version, time of the last full build, record count
+    records  fixed-size (department_id, batch, day, version, offset, length),
+             sorted by (department_id, batch, day) for binary search
+    data     the fragments: comma-joined JSON rows in start_time order
+
+Each (department, batch) also has a record with day GROUP_DAY and no data that
+carries its batch scope version (timetable_versions), the same version the SQL
+path uses for its ETag.
+
+A process checks the 'all' timetable version at most every
+TIMETABLE_SNAPSHOT_CHECK_SECONDS (immediately after its own timetable writes).
+When the file is behind, one process rebuilds it under a file lock: only the
+batches in timetable_changes since the file's version are queried again, the
+rest are copied, and the new file replaces the old one atomically. A full
+rebuild runs when the change log no longer reaches back that far and every
+TIMETABLE_SNAPSHOT_MAX_AGE_SECONDS, which also picks up renamed rooms,
+departments and professors.
+"""
+import os
+import time
+import mmap
+import struct
+import threading
+
+from flask import current_app, Response
+
+from app.db import query_db, stream_db
+from app.utils.serializers import serialize_row
+from app.services.timetable_version_service import ALL_SCOPE, ResyncRequired, scope_version, changed_batches
+
+try:
+    import fcntl
+except ImportError:  # Windows: rebuilds are not serialized across processes, the rename stays atomic
+    fcntl = None
+
+MAGIC = b'CTTSNAP1'
+HEADER = struct.Struct('<8sqqI')
+# department_id, batch (UTF-8, NUL padded), day, scope version, data offset, data length
+RECORD = struct.Struct('<i32sBqQI')
+BATCH_BYTES = 32
+GROUP_DAY = 7
+
+SNAPSHOT_QUERY = """
+    SELECT t.*, d.name as department_name, d.code as department_code,
+           c.room_no, c.room_type,
+           u.first_name as professor_first_name, u.last_name as professor_last_name
+    FROM timetable t
+    JOIN departments d ON t.department_id = d.id
+    JOIN classrooms c ON t.classroom_id = c.id
+    JOIN users u ON t.professor_id = u.id
+"""
+
+_state = {'snapshot': None, 'checked': 0.0}
+_lock = threading.Lock()
+
+def _batch_key(batch):
+    """Fixed-width record key for a batch, or None when it does not fit"""
+    raw = str(batch).encode('utf-8')
+    return raw if len(raw) <= BATCH_BYTES and b'\0' not in raw else None
+
+class Snapshot:
+    """A mapped snapshot file; lookups read records and fragments straight from the map"""
+    def __init__(self, path):
+        with open(path, 'rb') as f:
+            stat = os.fstat(f.fileno())
+            self.buffer = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        self.identity = (stat.st_ino, stat.st_mtime_ns, stat.st_size)
+        magic, self.version, self.built_at, self.count = HEADER.unpack_from(self.buffer, 0)
+        if magic != MAGIC:
+            raise ValueError('Not a timetable snapshot')
+
+    def _record(self, index):
+        return RECORD.unpack_from(self.buffer, HEADER.size + index * RECORD.size)
+
+    def lookup(self, department_id, batch):
+        """
+        (version, {day: fragment bytes}) for a department + batch, or None when the
+        batch cannot be keyed. Unknown batches come back as (0, {}).
+        """
+        key = _batch_key(batch)
+        if key is None:
+            return None
+        target = (int(department_id), key.ljust(BATCH_BYTES, b'\0'), 0)
+        lo, hi = 0, self.count
+        while lo < hi:
+            mid = (lo + hi) // 2
+            if self._record(mid)[:3] < target:
+                lo = mid + 1
+            else:
+                hi = mid
+        version, days = 0, {}
+        for index in range(lo, min(lo + GROUP_DAY + 1, self.count)):
+            dept, batch_key, day, group_version, offset, length = self._record(index)
+            if (dept, batch_key) != target[:2]:
+                break
+            if day == GROUP_DAY:
+                version = group_version
+            else:
+                days[day] = self.buffer[offset:offset + length]
+        return version, days
+
+    def groups(self):
+        """Every group as {(department_id, batch key): {'version', 'days'}} (for incremental rebuilds)"""
+        out = {}
+        for index in range(self.count):
+            dept, batch_key, day, version, offset, length = self._record(index)
+            group = out.setdefault((dept, batch_key.rstrip(b'\0')), {'version': 0, 'days': {}})
+            if day == GROUP_DAY:
+                group['version'] = version
+            else:
+                group['days'][day] = self.buffer[offset:offset + length]
+        return out
+
+def _write(path, version, built_at, groups):
+    """Write groups to a temporary file and atomically replace the snapshot"""
+    records, chunks = [], []
+    offset = HEADER.size + RECORD.size * sum(1 + len(g['days']) for g in groups.values())
+    for (dept, batch_key), group in sorted(groups.items()):
+        padded = batch_key.ljust(BATCH_BYTES, b'\0')
+        for day in sorted(group['days']):
+            fragment = group['days'][day]
+            records.append(RECORD.pack(dept, padded, day, group['version'], offset, len(fragment)))
+            chunks.append(fragment)
+            offset += len(fragment)
+        records.append(RECORD.pack(dept, padded, GROUP_DAY, group['version'], 0, 0))
+
+    tmp = f'{path}.{os.getpid()}.tmp'
+    with open(tmp, 'wb') as f:
+        f.write(HEADER.pack(MAGIC, version, built_at, len(records)))
+        f.writelines(records)
+        f.writelines(chunks)
+    os.replace(tmp, path)
+
+def _compile(batches=None):
+    """Groups for the given (department_id, batch) pairs, or for every batch when None"""
+    dumps = current_app.json.dumps
+    if batches is None:
+        versions = query_db("SELECT scope, version FROM timetable_versions WHERE scope LIKE %s", ('batch:%',))
+    else:
+        versions = query_db("SELECT scope, version FROM timetable_versions WHERE scope = ANY(%s)",
+                            ([f'batch:{dept}:{batch}' for dept, batch in batches],))
+
+    groups = {}
+    for row in versions:
+        _, dept, batch = row['scope'].split(':', 2)
+        key = _batch_key(batch)
+        if key is not None:
+            groups[(int(dept), key)] = {'version': row['version'], 'days': {}}
+    for dept, batch in batches or ():
+        key = _batch_key(batch)
+        if key is not None:
+            groups.setdefault((dept, key), {'version': 0, 'days': {}})
+
+    # Rows are read after the versions, so a group's content is never older than its version
+    query, params = SNAPSHOT_QUERY, ()
+    if batches is not None:
+        query += " WHERE (t.department_id, t.batch) IN (SELECT * FROM unnest(%s::int[], %s::text[]))"
+        params = ([dept for dept, _ in batches], [batch for _, batch in batches])
+    query += " ORDER BY t.department_id, t.batch, t.day_of_week, t.start_time"
+
+    pieces = {}
+    for row in stream_db(query, params):
+        key = _batch_key(row['batch'])
+        if key is None:
+            continue
+        groups.setdefault((row['department_id'], key), {'version': 0, 'days': {}})
+        pieces.setdefault((row['department_id'], key, row['day_of_week']), []).append(
+            dumps(serialize_row(row), separators=(',', ':')))
+    for (dept, key, day), rows in pieces.items():
+        groups[(dept, key)]['days'][day] = ','.join(rows).encode('utf-8')
+    return groups
+
+def _rebuild(path, current, previous):
+    """Bring the file at `path` up to `current`, reusing `previous` (a Snapshot or None) where possible"""
+    max_age = current_app.config.get('TIMETABLE_SNAPSHOT_MAX_AGE_SECONDS', 300)
+    now = int(time.time())
+    if previous is not None and now - previous.built_at < max_age:
+        try:
+            batches = changed_batches(previous.version)
+        except ResyncRequired:
+            batches = None
+        if batches is not None:
+            groups = previous.groups()
+            groups.update(_compile(sorted(batches)) if batches else {})
+            _write(path, current, previous.built_at, groups)
+            return
+    _write(path, current, now, _compile())
+
+def _open(path):
+    try:
+        return Snapshot(path)
+    except (OSError, ValueError, struct.error):
+        return None
+
+def mark_snapshot_stale():
+    """Re-check the timetable version on the next read (after a local timetable write)"""
+    _state['checked'] = 0.0
+
+def get_snapshot():
+    """Current Snapshot for this process, rebuilding the shared file if it is behind; None if disabled"""
+    config = current_app.config
+    if not config.get('TIMETABLE_SNAPSHOT', True):
+        return None
+    snapshot = _state['snapshot']
+    if snapshot is not None and time.monotonic() - _state['checked'] < config.get('TIMETABLE_SNAPSHOT_CHECK_SECONDS', 2):
+        return snapshot
+
+    try:
+        return _refresh(config)
+    except Exception as e:
+        # The SQL path still works; try again on the next check
+        current_app.logger.warning(f"Timetable snapshot unavailable: {str(e)}")
+        _state['checked'] = time.monotonic()
+        return None
+
+def _refresh(config):
+    path = config['TIMETABLE_SNAPSHOT_PATH']
+    with _lock:
+        current = scope_version(ALL_SCOPE)
+        snapshot = _state['snapshot']
+        try:
+            stat = os.stat(path)
+            if snapshot is None or snapshot.identity != (stat.st_ino, stat.st_mtime_ns, stat.st_size):
+                snapshot = _open(path)
+        except OSError:
+            snapshot = None
+
+        max_age = config.get('TIMETABLE_SNAPSHOT_MAX_AGE_SECONDS', 300)
+        if snapshot is None or snapshot.version < current or time.time() - snapshot.built_at >= max_age:
+            os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+            with open(f'{path}.lock', 'a') as lock:
+                if fcntl is not None:
+                    fcntl.flock(lock, fcntl.LOCK_EX)
+                # Another process may have rebuilt it while we waited for the lock
+                latest = _open(path)
+                if latest is None or latest.version < current or time.time() - latest.built_at >= max_age:
+                    _rebuild(path, current, latest)
+                    latest = _open(path)
+            snapshot = latest
+
+        # Mappings replaced here are closed when the last reader drops them
+        _state['snapshot'] = snapshot
+        _state['checked'] = time.monotonic()
+    return snapshot
+
+def fragments_response(key, fragments, status=200):
+    """{"<key>": [...]} response from pre-serialized row fragments (matches jsonify output)"""
+    body = b','.join(fragment for fragment in fragments if fragment)
+    return Response(b'{"' + key.encode('utf-8') + b'":[' + body + b']}\n', status=status,
+                    mimetype='application/json')
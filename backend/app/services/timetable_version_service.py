@@ -0,0 +1,144 @@
+"""
+Timetable versions for conditional GETs and delta sync.
+
+Triggers on timetable (migration 0009) log every change in timetable_changes and
+keep the latest version per scope in timetable_versions: ALL_SCOPE, one scope per
+department + batch and one per professor. A scope's version changes exactly when
+an entry in it is written, so it works as the ETag of any timetable view of that
+scope, and clients holding version N fetch only the entries changed after N.
+"""
+from app.db import query_db, transaction
+from app.utils.serializers import serialize_row
+
+ALL_SCOPE = 'all'
+PRUNED_SCOPE = 'pruned'
+VERSION_HEADER = 'X-Timetable-Version'
+
+class ResyncRequired(Exception):
+    """The change log no longer reaches back to the client's version"""
+
+def batch_scope(department_id, batch):
+    return f'batch:{department_id}:{batch}'
+
+def professor_scope(professor_id):
+    return f'professor:{professor_id}'
+
+def scope_for(department_id=None, batch=None, professor_id=None):
+    """Narrowest scope covering a timetable filter"""
+    if professor_id:
+        return professor_scope(professor_id)
+    if department_id and batch:
+        return batch_scope(department_id, batch)
+    return ALL_SCOPE
+
+def caller_scope(user, args):
+    """
+    Timetable filter a user reads: students their batch, professors their own classes,
+    admins the department_id / batch / professor_id they ask for in `args`. Raises
+    ValueError for a student without a department or batch.
+    """
+    if user['role'] == 'student':
+        if not user['department_id'] or not user['batch']:
+            raise ValueError('Student department or batch not set')
+        return {'department_id': user['department_id'], 'batch': user['batch']}
+    if user['role'] == 'professor':
+        return {'professor_id': user['id']}
+    return {
+        'department_id': args.get('department_id', type=int),
+        'batch': args.get('batch'),
+        'professor_id': args.get('professor_id', type=int),
+    }
+
+def scope_version(scope):
+    """Current version of a scope (0 before its first change)"""
+    row = query_db("SELECT version FROM timetable_versions WHERE scope = %s", (scope,), one=True)
+    return row['version'] if row else 0
+
+def _change_filters(filters):
+    """
+    (logged, params, current, params) SQL conditions for the filters that are set:
+    `logged` matches change log rows written in or moved out of the filter (old_*
+    columns), `current` the timetable rows (alias t) still in it.
+    """
+    columns = [column for column, value in filters.items() if value]
+    if not columns:
+        return "TRUE", [], "TRUE", []
+    values = [filters[column] for column in columns]
+    new = ' AND '.join(f"{column} = %s" for column in columns)
+    old = ' AND '.join(f"old_{column} = %s" for column in columns)
+    current = ' AND '.join(f"t.{column} = %s" for column in columns)
+    return f"(({new}) OR ({old}))", values + values, current, values
+
+def get_changes(since, department_id=None, batch=None, professor_id=None):
+    """
+    Entries changed after version `since` matching the filter, latest state only:
+    {'version', 'changes': [{'id', 'version', 'deleted', 'entry'?}]}. Entries deleted,
+    or moved out of the scope, come back as tombstones. Raises ResyncRequired when
+    `since` predates the retained log.
+    """
+    scope = scope_for(department_id, batch, professor_id)
+    rows = query_db("SELECT scope, version FROM timetable_versions WHERE scope IN (%s, %s)",
+                    (scope, PRUNED_SCOPE))
+    versions = {row['scope']: row['version'] for row in rows}
+    if since < versions.get(PRUNED_SCOPE, 0):
+        raise ResyncRequired()
+    upto = versions.get(scope, 0)
+    if since >= upto:
+        return {'version': upto, 'changes': []}
+
+    filters = {'department_id': department_id, 'batch': batch, 'professor_id': professor_id}
+    logged, logged_params, current, current_params = _change_filters(filters)
+
+    rows = query_db(f"""
+        SELECT ch.entry_id, ch.version AS change_version, t.*, d.name as department_name,
+               d.code as department_code, c.room_no, c.room_type,
+               u.first_name as professor_first_name, u.last_name as professor_last_name
+        FROM (
+            SELECT DISTINCT ON (entry_id) entry_id, version FROM timetable_changes
+            WHERE version > %s AND version <= %s AND {logged}
+            ORDER BY entry_id, version DESC
+        ) ch
+        LEFT JOIN timetable t ON t.id = ch.entry_id AND {current}
+        LEFT JOIN departments d ON t.department_id = d.id
+        LEFT JOIN classrooms c ON t.classroom_id = c.id
+        LEFT JOIN users u ON t.professor_id = u.id
+        ORDER BY ch.version
+    """, tuple([since, upto] + logged_params + current_params))
+
+    changes = []
+    for row in rows:
+        entry_id, version = row.pop('entry_id'), row.pop('change_version')
+        if row['id'] is None:
+            changes.append({'id': entry_id, 'version': version, 'deleted': True})
+        else:
+            changes.append({'id': entry_id, 'version': version, 'deleted': False, 'entry': serialize_row(row)})
+    return {'version': upto, 'changes': changes}
+
+def changed_batches(since):
+    """
+    {(department_id, batch)} written after version `since`, including batches entries
+    were moved out of. Raises ResyncRequired when `since` predates the retained log.
+    """
+    if since < scope_version(PRUNED_SCOPE):
+        raise ResyncRequired()
+    rows = query_db("""
+        SELECT department_id, batch FROM timetable_changes WHERE version > %s
+        UNION
+        SELECT old_department_id, old_batch FROM timetable_changes
+        WHERE version > %s AND old_department_id IS NOT NULL
+    """, (since, since))
+    return {(row['department_id'], row['batch']) for row in rows}
+
+def prune_changes(retention_days):
+    """Drop log rows older than retention_days; clients behind the pruned version must resync"""
+    with transaction() as cur:
+        cur.execute("""
+            WITH pruned AS (
+                DELETE FROM timetable_changes
+                WHERE changed_at < CURRENT_TIMESTAMP - make_interval(days => %s)
+                RETURNING version
+            )
+            UPDATE timetable_versions
+            SET version = GREATEST(version, (SELECT COALESCE(MAX(version), 0) FROM pruned))
+            WHERE scope = %s
+        """, (retention_days, PRUNED_SCOPE))
@@ -0,0 +1,64 @@
+"""
+Per-process TTL/LRU cache of user rows, used for identity and role resolution.
+
+Entries expire after USER_CACHE_TTL seconds; writes that change a user
+(deactivation, password change, profile/bulk edits) must call invalidate_user(s).
+"""
+import time
+import threading
+from collections import OrderedDict
+from flask import current_app
+
+from app.db import query_db
+
+_cache = OrderedDict()  # user_id -> (expires_at, row)
+_lock = threading.Lock()
+# Bumped on every invalidation so a lookup racing with an invalidation is not cached
+_generation = 0
+
+def get_user(user_id):
+    """Return the users row for user_id (a copy), from cache when fresh"""
+    user_id = int(user_id)
+    ttl = current_app.config.get('USER_CACHE_TTL', 60)
+    if ttl <= 0:
+        return query_db("SELECT * FROM users WHERE id = %s", (user_id,), one=True)
+
+    now = time.monotonic()
+    with _lock:
+        entry = _cache.get(user_id)
+        if entry is not None and entry[0] > now:
+            _cache.move_to_end(user_id)
+            return dict(entry[1])
+        generation = _generation
+
+    user = query_db("SELECT * FROM users WHERE id = %s", (user_id,), one=True)
+    if user is None:
+        return None
+
+    with _lock:
+        if generation == _generation:
+            _cache[user_id] = (now + ttl, user)
+            _cache.move_to_end(user_id)
+            max_size = current_app.config.get('USER_CACHE_SIZE', 10000)
+            while len(_cache) > max_size:
+                _cache.popitem(last=False)
+    return dict(user)
+
+def invalidate_user(user_id):
+    """Drop one user from the cache"""
+    invalidate_users([user_id])
+
+def invalidate_users(user_ids):
+    """Drop several users from the cache in one step"""
+    global _generation
+    with _lock:
+        _generation += 1
+        for user_id in user_ids:
+            _cache.pop(int(user_id), None)
+
+def clear_user_cache():
+    """Drop every cached user"""
+    global _generation
+    with _lock:
+        _generation += 1
+        _cache.clear()
@@ -1,7 +1,7 @@
 from functools import wraps
-from flask import jsonify
+from flask import jsonify, g
 from flask_jwt_extended import get_jwt_identity, verify_jwt_in_request
-from app.db import query_db
+from app.services.user_cache import get_user
 
 def role_required(*roles):
     """Decorator to require specific roles for access"""
@@ -9,21 +9,26 @@ def role_required(*roles):
         @wraps(fn)
         def wrapper(*args, **kwargs):
             verify_jwt_in_request()
-            user_id = get_jwt_identity()
-            # Convert string ID to int for database query
-            user_id_int = int(user_id) if isinstance(user_id, str) else user_id
-            user = query_db("SELECT * FROM users WHERE id = %s", (user_id_int,), one=True)
+            user = get_current_user()
             if not user or user['role'] not in roles:
                 return jsonify({'error': 'Unauthorized access'}), 403
             return fn(*args, **kwargs)
         return wrapper
     return decorator
 
+def read_only(fn):
+    """Mark an endpoint as read-only so its SELECTs may be served by the read replica.
+    Place directly below @jwt_required() so the role check is routed too."""
+    @wraps(fn)
+    def wrapper(*args, **kwargs):
+        g.db_read_only = True
+        return fn(*args, **kwargs)
+    return wrapper
+
 def get_current_user():
-    """Get the current authenticated user"""
-    user_id = get_jwt_identity()
-    if user_id:
-        # Convert string ID to int for database query
-        user_id_int = int(user_id) if isinstance(user_id, str) else user_id
-        return query_db("SELECT * FROM users WHERE id = %s", (user_id_int,), one=True)
-    return None
+    """Get the current authenticated user (user cache, memoized on g for the request)"""
+    if 'current_user' not in g:
+        user_id = get_jwt_identity()
+        # JWT identity is a string; get_user converts it to int
+        g.current_user = get_user(user_id) if user_id else None
+    return g.current_user
@@ -0,0 +1,22 @@
+"""Conditional GET helpers: weak ETags derived from data versions."""
+import hashlib
+from flask import request, make_response
+
+def make_etag(*parts):
+    """Stable tag for a response built from these inputs (data version, filters, scope)"""
+    return hashlib.sha1('|'.join(str(p) for p in parts).encode('utf-8')).hexdigest()[:24]
+
+def not_modified(etag, headers=None):
+    """A 304 response when If-None-Match already has etag, otherwise None"""
+    if not request.if_none_match.contains_weak(etag):
+        return None
+    return with_etag(('', 304), etag, headers)
+
+def with_etag(rv, etag, headers=None):
+    """Attach a weak ETag (and extra headers); clients must revalidate before reuse"""
+    response = make_response(rv)
+    response.set_etag(etag, weak=True)
+    response.headers['Cache-Control'] = 'private, no-cache'
+    for name, value in (headers or {}).items():
+        response.headers[name] = value
+    return response
@@ -0,0 +1,40 @@
+"""Minimal iCalendar (RFC 5545) writing: escaping, line folding, date-times."""
+
+def escape_text(value):
+    """TEXT value with backslashes, separators and newlines escaped"""
+    return (str(value or '').replace('\\', '\\\\').replace(';', '\\;').replace(',', '\\,')
+            .replace('\r\n', '\\n').replace('\n', '\\n'))
+
+def fold(line):
+    """Content line split into 75-octet pieces (continuations start with a space)"""
+    raw = line.encode('utf-8')
+    if len(raw) <= 75:
+        return line
+    pieces, start, limit = [], 0, 75
+    while start < len(raw):
+        end = min(start + limit, len(raw))
+        # Never split inside a UTF-8 sequence
+        while end < len(raw) and (raw[end] & 0xC0) == 0x80:
+            end -= 1
+        pieces.append(raw[start:end].decode('utf-8'))
+        start, limit = end, 74
+    return '\r\n '.join(pieces)
+
+def local_datetime(day, t):
+    """Floating (device-local) DATE-TIME from a date and a time"""
+    return f'{day:%Y%m%d}T{t:%H%M%S}'
+
+def utc_datetime(dt):
+    """UTC DATE-TIME from an aware or UTC-naive datetime"""
+    return f'{dt:%Y%m%dT%H%M%S}Z'
+
+def calendar(name, events, prodid='-//CampusOne//Timetable//EN'):
+    """VCALENDAR text from events given as lists of (property, value) pairs"""
+    lines = ['BEGIN:VCALENDAR', 'VERSION:2.0', f'PRODID:{prodid}', 'CALSCALE:GREGORIAN',
+             fold(f'X-WR-CALNAME:{escape_text(name)}')]
+    for event in events:
+        lines.append('BEGIN:VEVENT')
+        lines.extend(fold(f'{prop}:{value}') for prop, value in event)
+        lines.append('END:VEVENT')
+    lines.append('END:VCALENDAR')
+    return '\r\n'.join(lines) + '\r\n'
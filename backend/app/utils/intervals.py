@@ -0,0 +1,36 @@
+"""
+Overlap detection for half-open intervals [start, end).
+
+Intervals are grouped by key (e.g. (classroom_id, day_of_week)) and each group is
+swept once in start order, so finding every overlapping pair costs
+O(n log n + overlaps) rather than comparing all pairs.
+"""
+import heapq
+from collections import defaultdict
+
+def overlapping_pairs(intervals):
+    """Yield (a, b) for every overlapping pair in [(start, end, ident), ...]; a starts first"""
+    active = []  # heap of (end, seq, ident) for intervals still open at the sweep position
+    for seq, (start, end, ident) in enumerate(sorted(intervals, key=lambda i: (i[0], i[1]))):
+        while active and active[0][0] <= start:
+            heapq.heappop(active)
+        for _, _, other in active:
+            yield other, ident
+        heapq.heappush(active, (end, seq, ident))
+
+class IntervalIndex:
+    """Intervals grouped by key; reports the overlapping pairs within each key"""
+
+    def __init__(self):
+        self._groups = defaultdict(list)
+
+    def add(self, key, start, end, ident):
+        if end > start:
+            self._groups[key].append((start, end, ident))
+
+    def conflicts(self):
+        """Yield (key, a, b) for every overlapping pair"""
+        for key, intervals in self._groups.items():
+            if len(intervals) > 1:
+                for a, b in overlapping_pairs(intervals):
+                    yield key, a, b
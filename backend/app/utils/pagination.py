@@ -0,0 +1,95 @@
+"""Keyset (cursor) pagination helpers for list endpoints.
+
+Pagination is opt-in: without ?limit= endpoints return everything as before.
+With it, rows come back in pages of at most `limit`, plus `next_cursor`, an
+opaque token holding the sort key of the last row (null on the last page).
+"""
+import json
+import base64
+from flask import request
+
+from app.db import query_db
+
+MAX_PAGE_LIMIT = 500
+
+def encode_cursor(values):
+    raw = json.dumps(values, separators=(',', ':')).encode('utf-8')
+    return base64.urlsafe_b64encode(raw).decode('ascii').rstrip('=')
+
+def decode_cursor(token, types):
+    """Decode a cursor and convert each value with the matching callable in `types`"""
+    try:
+        values = json.loads(base64.urlsafe_b64decode(token + '=' * (-len(token) % 4)))
+        if not isinstance(values, list) or len(values) != len(types):
+            raise ValueError
+        return [convert(value) for convert, value in zip(types, values)]
+    except (TypeError, ValueError):
+        raise ValueError('Invalid cursor')
+
+def get_page_args(types):
+    """(limit, cursor values) from ?limit=&cursor=; limit is None when not paginating.
+    Raises ValueError for a bad limit or cursor."""
+    limit = request.args.get('limit')
+    cursor = request.args.get('cursor')
+    if limit is None:
+        if cursor:
+            raise ValueError('cursor requires limit')
+        return None, None
+    try:
+        limit = int(limit)
+    except ValueError:
+        raise ValueError('limit must be a number')
+    if not 1 <= limit <= MAX_PAGE_LIMIT:
+        raise ValueError(f'limit must be between 1 and {MAX_PAGE_LIMIT}')
+    return limit, decode_cursor(cursor, types) if cursor else None
+
+def keyset_condition(columns, descending=False):
+    """Row comparison that selects rows after the cursor for ORDER BY columns (all ASC or all DESC)"""
+    placeholders = ', '.join(['%s'] * len(columns))
+    return f"({', '.join(columns)}) {'<' if descending else '>'} ({placeholders})"
+
+def count_total(query, params, mode):
+    """Total rows for a filtered query: 'exact' runs COUNT(*), 'estimate' reads the planner's row estimate"""
+    if mode == 'exact':
+        return query_db(f"SELECT COUNT(*) AS count FROM ({query}) AS counted", params, one=True)['count']
+    if mode == 'estimate':
+        plan = query_db(f"EXPLAIN (FORMAT JSON) {query}", params, one=True)['QUERY PLAN']
+        return int(plan[0]['Plan']['Plan Rows'])
+    return None
+
+class KeysetPage:
+    """Wraps a row iterator fetched with LIMIT limit + 1: yields at most `limit` rows and
+    works out next_cursor from the last one. `key` returns a row's cursor values."""
+
+    def __init__(self, rows, limit, key):
+        self.rows = rows
+        self.limit = limit
+        self.key = key
+        self.last = None
+        self.has_more = False
+
+    def __iter__(self):
+        count = 0
+        for row in self.rows:
+            if count == self.limit:
+                self.has_more = True
+                break
+            self.last = row
+            count += 1
+            yield row
+        close = getattr(self.rows, 'close', None)
+        if close:
+            close()
+
+    @property
+    def next_cursor(self):
+        if not self.has_more or self.last is None:
+            return None
+        return encode_cursor(self.key(self.last))
+
+def page_fields(page, total=None):
+    """Top-level response fields for a paginated list"""
+    fields = {'next_cursor': page.next_cursor}
+    if total is not None:
+        fields['total'] = total
+    return fields
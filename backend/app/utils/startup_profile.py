@@ -0,0 +1,33 @@
+"""Startup timing instrumentation (enable with STARTUP_PROFILE=1)."""
+import os
+import sys
+import time
+from contextlib import contextmanager
+
+ENABLED = os.environ.get('STARTUP_PROFILE', '').lower() in ('1', 'true', 'yes')
+
+_phases = []
+
+
+@contextmanager
+def phase(name):
+    """Time a startup phase (imports, pool creation, blueprint build...)."""
+    if not ENABLED:
+        yield
+        return
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        _phases.append((name, (time.perf_counter() - start) * 1000))
+
+
+def report():
+    """Print recorded phases to stderr, slowest first, and reset."""
+    if not ENABLED or not _phases:
+        return
+    # Phases may nest (a blueprint build includes its import), so no grand total
+    print(f'[startup] {len(_phases)} phases', file=sys.stderr)
+    for name, ms in sorted(_phases, key=lambda p: p[1], reverse=True):
+        print(f'[startup] {ms:8.1f} ms  {name}', file=sys.stderr)
+    _phases.clear()
@@ -0,0 +1,104 @@
+"""Stream JSON, CSV and NDJSON responses row by row (pairs with db.stream_db)."""
+import io
+import csv
+import zlib
+from flask import Response, current_app, stream_with_context
+
+# Small pieces (one row each) are joined into chunks of about this size before sending
+DOWNLOAD_CHUNK_BYTES = 64 * 1024
+
+
+def stream_json_list(key, rows, transform=None, extra=None):
+    """Stream {"<key>": [row, ...], **extra} without building the list in memory.
+
+    `transform` is applied to each row (e.g. serialize_row). `extra` is a dict
+    of additional top-level fields, or a callable returning one that is invoked
+    after the last row (useful for values computed while streaming, like cursors).
+    Output matches jsonify for the same data.
+    """
+    provider = current_app.json
+
+    def dumps(value):
+        return provider.dumps(value, separators=(',', ':'))
+
+    def generate():
+        yield '{' + dumps(key) + ':['
+        first = True
+        for row in rows:
+            if transform is not None:
+                row = transform(row)
+            yield ('' if first else ',') + dumps(row)
+            first = False
+        yield ']'
+        fields = extra() if callable(extra) else extra
+        for name, value in (fields or {}).items():
+            yield ',' + dumps(name) + ':' + dumps(value)
+        yield '}'
+
+    return Response(stream_with_context(generate()), mimetype='application/json')
+
+
+def _chunked(pieces, compress=False):
+    """Join string pieces into ~DOWNLOAD_CHUNK_BYTES byte chunks, gzip-compressing on the fly if asked"""
+    compressor = zlib.compressobj(6, zlib.DEFLATED, 16 + zlib.MAX_WBITS) if compress else None
+    buffer, size = [], 0
+    for piece in pieces:
+        buffer.append(piece)
+        size += len(piece)
+        if size < DOWNLOAD_CHUNK_BYTES:
+            continue
+        data = ''.join(buffer).encode('utf-8')
+        buffer, size = [], 0
+        if compressor is not None:
+            data = compressor.compress(data)
+        if data:
+            yield data
+    data = ''.join(buffer).encode('utf-8')
+    if compressor is not None:
+        data = compressor.compress(data) + compressor.flush()
+    if data:
+        yield data
+
+def stream_download(pieces, filename, mimetype, compress=False):
+    """Attachment response streamed from an iterable of strings (gzip adds .gz to the filename)"""
+    if compress:
+        filename += '.gz'
+        mimetype = 'application/gzip'
+    return Response(
+        stream_with_context(_chunked(pieces, compress)),
+        mimetype=mimetype,
+        headers={'Content-Disposition': f'attachment; filename="{filename}"'}
+    )
+
+def csv_lines(header, rows):
+    """Yield CSV-formatted lines: the header (if any), then one per row (sequences)"""
+    output = io.StringIO()
+    writer = csv.writer(output)
+
+    def line(row):
+        writer.writerow(row)
+        value = output.getvalue()
+        output.seek(0)
+        output.truncate(0)
+        return value
+
+    if header:
+        yield line(header)
+    for row in rows:
+        yield line(row)
+
+def stream_csv(header, rows, filename, compress=False):
+    """Stream rows (sequences) as a CSV download"""
+    return stream_download(csv_lines(header, rows), filename, 'text/csv', compress)
+
+def stream_ndjson(rows, filename, transform=None, compress=False):
+    """Stream rows as newline-delimited JSON; `transform` is applied to each row first"""
+    provider = current_app.json
+
+    def lines():
+        for row in rows:
+            if transform is not None:
+                row = transform(row)
+            yield provider.dumps(row, separators=(',', ':')) + '\n'
+
+    return stream_download(lines(), filename, 'application/x-ndjson', compress)
@@ -17,3 +17,14 @@ def validate_time_format(time_str):
 def validate_day_of_week(day):
     """Validate day of week (0-6)"""
     return isinstance(day, int) and 0 <= day <= 6
+
+def int_args(args, *names):
+    """Optional integer query parameters as {name: int or None}; raises ValueError naming a bad one"""
+    values = {}
+    for name in names:
+        value = (args.get(name) or '').strip()
+        try:
+            values[name] = int(value) if value else None
+        except ValueError:
+            raise ValueError(f'{name} must be a number')
+    return values
@@ -0,0 +1,101 @@
+"""
+Cold-start benchmark for the Vercel entrypoint (index.py).
+
+Each sample is a fresh interpreter that imports index.py (create_app) and then
+serves a first request through the test client, like a serverless cold start.
+Eager mode needs a reachable database (DB_* env); lazy mode does not.
+
+Usage (from backend/):
+    python benchmarks/bench_cold_start.py                     # lazy mode, 10 runs
+    python benchmarks/bench_cold_start.py --modes lazy,eager --runs 20
+    python benchmarks/bench_cold_start.py --importtime 15     # slowest imports
+"""
+import os
+import sys
+import json
+import argparse
+import statistics
+import subprocess
+
+BACKEND_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..')
+
+SAMPLE = r'''
+import json, time
+t0 = time.perf_counter()
+from index import app
+t1 = time.perf_counter()
+client = app.test_client()
+client.get('/api/health')
+t2 = time.perf_counter()
+client.get(%(path)r)
+t3 = time.perf_counter()
+print(json.dumps({'import_ms': (t1 - t0) * 1000, 'health_ms': (t2 - t1) * 1000,
+                  'first_api_ms': (t3 - t2) * 1000, 'total_ms': (t3 - t0) * 1000}))
+'''
+
+
+def run_sample(mode, path):
+    env = dict(os.environ, VERCEL='1', LAZY_INIT='True' if mode == 'lazy' else 'False')
+    proc = subprocess.run(
+        [sys.executable, '-c', SAMPLE % {'path': path}],
+        cwd=BACKEND_DIR, env=env, capture_output=True, text=True
+    )
+    if proc.returncode != 0:
+        raise RuntimeError(proc.stderr.strip().splitlines()[-1] if proc.stderr else 'failed')
+    return json.loads(proc.stdout.strip().splitlines()[-1])
+
+
+def summarize(samples, key):
+    values = sorted(s[key] for s in samples)
+    p95 = values[min(len(values) - 1, int(round(0.95 * (len(values) - 1))))]
+    return f'{key:<14} median {statistics.median(values):8.1f} ms   p95 {p95:8.1f} ms   min {values[0]:8.1f} ms'
+
+
+def import_times(top):
+    """Run one cold import with -X importtime and return the slowest modules (cumulative)"""
+    env = dict(os.environ, VERCEL='1', LAZY_INIT='True')
+    proc = subprocess.run(
+        [sys.executable, '-X', 'importtime', '-c', 'import index'],
+        cwd=BACKEND_DIR, env=env, capture_output=True, text=True
+    )
+    rows = []
+    for line in proc.stderr.splitlines():
+        if not line.startswith('import time:') or 'cumulative' in line:
+            continue
+        self_us, cumulative_us, name = line.split(':', 1)[1].split('|')
+        # Nested imports are indented two spaces per level; keep index.py, app and what they import
+        depth = (len(name) - len(name.lstrip()) - 1) // 2
+        if depth > 2:
+            continue
+        rows.append((int(cumulative_us), int(self_us), name.strip()))
+    return sorted(rows, reverse=True)[:top]
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark serverless cold start')
+    parser.add_argument('--runs', type=int, default=10)
+    parser.add_argument('--modes', default='lazy', help='comma-separated: lazy,eager')
+    parser.add_argument('--path', default='/api/auth/me', help='first API request after boot')
+    parser.add_argument('--importtime', type=int, default=0, metavar='N',
+                        help='also list the N slowest imports')
+    args = parser.parse_args()
+
+    for mode in args.modes.split(','):
+        mode = mode.strip()
+        try:
+            samples = [run_sample(mode, args.path) for _ in range(args.runs)]
+        except RuntimeError as e:
+            print(f'[{mode}] failed: {e}')
+            continue
+        print(f'[{mode}] {args.runs} cold starts, first request {args.path}')
+        for key in ('import_ms', 'health_ms', 'first_api_ms', 'total_ms'):
+            print('  ' + summarize(samples, key))
+
+    if args.importtime:
+        print('Slowest imports (cumulative, lazy mode):')
+        for cumulative_us, self_us, name in import_times(args.importtime):
+            print(f'  {cumulative_us / 1000:8.1f} ms  {name}')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,89 @@
+"""
+CSV user import throughput (rows per second) through app/services/import_service.py.
+
+Generates a student CSV with unique emails, imports it against the configured
+database with mail sending suppressed (queued credential emails are not
+delivered), then deletes the imported users and their outbox rows.
+--chunk-sizes 1 approximates the old row-at-a-time behaviour. Needs a database
+with at least one department (DB_* in .env).
+
+Usage (from backend/):
+    python benchmarks/bench_csv_import.py
+    python benchmarks/bench_csv_import.py --rows 10000,100000 --chunk-sizes 100,500,2000 --temp-rounds 4
+"""
+import io
+import os
+import sys
+import csv
+import time
+import uuid
+import argparse
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+from werkzeug.datastructures import FileStorage
+
+from app import create_app
+from app.config import Config
+from app.db import query_db, execute_db
+from app.services import password_service
+from app.services.import_service import open_csv, import_users
+
+
+def make_csv(count, prefix, department_code):
+    output = io.StringIO()
+    writer = csv.writer(output)
+    writer.writerow(['email', 'first_name', 'last_name', 'department_code', 'batch'])
+    for i in range(count):
+        writer.writerow([f'{prefix}{i}@bench.example.com', 'Bench', f'Student{i}', department_code, '2024'])
+    return output.getvalue().encode('utf-8')
+
+
+def bench(app, count, chunk_size, department_code):
+    prefix = f'bench-{uuid.uuid4().hex[:8]}-'
+    data = make_csv(count, prefix, department_code)
+    try:
+        with app.test_request_context():
+            file = FileStorage(stream=io.BytesIO(data), filename='bench.csv')
+            start = time.perf_counter()
+            results = import_users(open_csv(file), 'student', chunk_size=chunk_size)
+            elapsed = time.perf_counter() - start
+        ok, errors = len(results['success']), len(results['errors'])
+        print(f'  rows={count:<7} chunk={chunk_size:<5} {count / elapsed:10.1f} rows/s  '
+              f'({elapsed:.2f}s, {ok} ok, {errors} errors)')
+    finally:
+        with app.app_context():
+            execute_db("DELETE FROM users WHERE email LIKE %s", (prefix + '%',))
+            execute_db("DELETE FROM email_outbox WHERE recipient LIKE %s", (prefix + '%',))
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark the streaming CSV user import')
+    parser.add_argument('--rows', default='10000,100000', help='comma-separated row counts')
+    parser.add_argument('--chunk-sizes', default=str(Config.IMPORT_CHUNK_SIZE), help='comma-separated chunk sizes')
+    parser.add_argument('--temp-rounds', type=int, default=None, help='override BCRYPT_TEMP_ROUNDS')
+    args = parser.parse_args()
+
+    if args.temp_rounds:
+        Config.BCRYPT_TEMP_ROUNDS = args.temp_rounds
+    Config.MAIL_SUPPRESS_SEND = True
+    # Leave queued mail undelivered: the worker would re-hash passwords during the run
+    Config.EMAIL_WORKER = False
+    app = create_app()
+
+    with app.app_context():
+        department = query_db("SELECT code FROM departments ORDER BY id LIMIT 1", one=True)
+    if not department:
+        sys.exit('No departments found; create one first')
+
+    print(f'workers={Config.PASSWORD_HASH_WORKERS} temp_rounds={Config.BCRYPT_TEMP_ROUNDS}')
+    try:
+        for count in [int(n) for n in args.rows.split(',')]:
+            for chunk_size in [int(n) for n in args.chunk_sizes.split(',')]:
+                bench(app, count, chunk_size, department['code'])
+    finally:
+        password_service.shutdown_executor()
+
+
+if __name__ == '__main__':
+    main()
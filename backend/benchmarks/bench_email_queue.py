@@ -0,0 +1,85 @@
+"""
+SMTP delivery throughput against a local SMTP stand-in (aiosmtpd).
+
+Compares a new connection per message (the old behaviour of mail.send) with the
+queue worker's delivery path in app/services/email_queue_service.py, which
+reuses one connection. No database needed; rate limiting is disabled. Against a
+real provider the gap is larger, since every new connection also pays for the
+TLS handshake and login.
+
+Usage (from backend/):
+    pip install aiosmtpd
+    python benchmarks/bench_email_queue.py
+    python benchmarks/bench_email_queue.py --messages 2000
+"""
+import os
+import sys
+import time
+import argparse
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+from aiosmtpd.controller import Controller
+from flask import Flask
+from flask_mail import Mail, Message
+
+from app.services.email_queue_service import SMTPSession, RateLimiter, deliver
+
+
+class CountingHandler:
+    def __init__(self):
+        self.received = 0
+
+    async def handle_DATA(self, server, session, envelope):
+        self.received += 1
+        return '250 OK'
+
+
+def rate(count, seconds):
+    return f'{count / seconds:10.1f}/s  ({count} in {seconds:.2f}s)'
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark SMTP delivery with and without connection reuse')
+    parser.add_argument('--messages', type=int, default=500)
+    parser.add_argument('--port', type=int, default=8025)
+    args = parser.parse_args()
+
+    handler = CountingHandler()
+    controller = Controller(handler, hostname='127.0.0.1', port=args.port)
+    controller.start()
+
+    app = Flask(__name__)
+    app.config.update(
+        MAIL_SERVER='127.0.0.1', MAIL_PORT=args.port, MAIL_USE_TLS=False, MAIL_USE_SSL=False,
+        MAIL_USERNAME='', MAIL_PASSWORD='', MAIL_DEFAULT_SENDER='bench@example.com',
+    )
+    mail = Mail(app)
+    rows = [
+        {'id': i, 'recipient': f'user{i}@example.com', 'subject': 'Benchmark', 'body': 'Hello ' * 50}
+        for i in range(args.messages)
+    ]
+
+    try:
+        with app.app_context():
+            start = time.perf_counter()
+            for row in rows:
+                mail.send(Message(subject=row['subject'], recipients=[row['recipient']], body=row['body']))
+            per_message = time.perf_counter() - start
+
+            session = SMTPSession(mail)
+            start = time.perf_counter()
+            sent, failed = deliver(session, RateLimiter(), rows)
+            session.close()
+            reused = time.perf_counter() - start
+            assert len(sent) == args.messages and not failed
+    finally:
+        controller.stop()
+
+    print(f'{args.messages} messages, {handler.received} received by the stand-in')
+    print(f'  connection per message  {rate(args.messages, per_message)}')
+    print(f'  reused connection       {rate(args.messages, reused)}')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,90 @@
+"""
+Password hashing throughput: logins per second and import rows per second.
+
+Compares inline bcrypt on the calling thread (the old behaviour) with the
+hashing pool in app/services/password_service.py. No database needed.
+
+Usage (from backend/):
+    python benchmarks/bench_password_hashing.py
+    python benchmarks/bench_password_hashing.py --logins 200 --rows 2000 --rounds 10 --workers 8
+    PASSWORD_HASH_EXECUTOR=process python benchmarks/bench_password_hashing.py
+"""
+import os
+import sys
+import time
+import secrets
+import argparse
+from concurrent.futures import ThreadPoolExecutor
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+import bcrypt
+
+from app.config import Config
+from app.services import password_service
+
+
+def rate(count, seconds):
+    return f'{count / seconds:10.1f}/s  ({count} in {seconds:.2f}s)'
+
+
+def bench_logins(count, rounds, concurrency):
+    password = 'correct horse battery'
+    stored = bcrypt.hashpw(password.encode('utf-8'), bcrypt.gensalt(rounds)).decode('utf-8')
+
+    start = time.perf_counter()
+    for _ in range(count):
+        bcrypt.checkpw(password.encode('utf-8'), stored.encode('utf-8'))
+    inline = time.perf_counter() - start
+
+    # Simulate concurrent login requests, each verifying through the pool
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as requests:
+        results = list(requests.map(lambda _: password_service.check_password(password, stored), range(count)))
+    pooled = time.perf_counter() - start
+    assert all(results)
+
+    print(f'logins (cost {rounds}, {concurrency} concurrent requests)')
+    print(f'  inline   {rate(count, inline)}')
+    print(f'  pooled   {rate(count, pooled)}')
+
+
+def bench_import(count, rounds):
+    passwords = [secrets.token_urlsafe(12) for _ in range(count)]
+
+    start = time.perf_counter()
+    for p in passwords:
+        bcrypt.hashpw(p.encode('utf-8'), bcrypt.gensalt(rounds))
+    inline = time.perf_counter() - start
+
+    start = time.perf_counter()
+    hashes = password_service._map(password_service._hash, passwords, [rounds] * count)
+    pooled = time.perf_counter() - start
+    assert len(hashes) == count
+
+    print(f'import rows (temporary password hashing, cost {rounds})')
+    print(f'  serial   {rate(count, inline)}')
+    print(f'  parallel {rate(count, pooled)}')
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark password hashing throughput')
+    parser.add_argument('--logins', type=int, default=64)
+    parser.add_argument('--rows', type=int, default=256)
+    parser.add_argument('--rounds', type=int, default=12, help='bcrypt cost factor')
+    parser.add_argument('--workers', type=int, default=None, help='override PASSWORD_HASH_WORKERS')
+    parser.add_argument('--concurrency', type=int, default=32, help='simultaneous login requests')
+    args = parser.parse_args()
+
+    if args.workers:
+        Config.PASSWORD_HASH_WORKERS = args.workers
+    print(f'executor={Config.PASSWORD_HASH_EXECUTOR} workers={Config.PASSWORD_HASH_WORKERS}')
+    try:
+        bench_logins(args.logins, args.rounds, args.concurrency)
+        bench_import(args.rows, args.rounds)
+    finally:
+        password_service.shutdown_executor()
+
+
+if __name__ == '__main__':
+    main()
@@ -1,5 +1,5 @@
--- Idempotent schema init: creates tables/indexes only if they don't exist.
--- Safe to run on every app startup (used by init_schema() in db.py).
+-- Migration 0001: initial schema and seed data (formerly schema_init.sql).
+-- Kept idempotent so databases created before versioned migrations upgrade cleanly.
 
 -- Departments table
 CREATE TABLE IF NOT EXISTS departments (
@@ -0,0 +1,19 @@
+-- Migration 0002: token revocation (logout, deactivation).
+-- Times are epoch seconds to compare directly with JWT iat/exp claims.
+
+-- Tokens issued before revoked_before are rejected for that user
+CREATE TABLE IF NOT EXISTS user_token_revocations (
+    user_id INTEGER PRIMARY KEY REFERENCES users(id),
+    revoked_before DOUBLE PRECISION NOT NULL
+);
+
+-- Individually revoked tokens (logout); rows can be purged after expires_at
+CREATE TABLE IF NOT EXISTS revoked_tokens (
+    jti VARCHAR(64) PRIMARY KEY,
+    user_id INTEGER REFERENCES users(id),
+    expires_at DOUBLE PRECISION NOT NULL,
+    revoked_at DOUBLE PRECISION NOT NULL
+);
+
+CREATE INDEX IF NOT EXISTS idx_user_token_revocations_revoked_before ON user_token_revocations(revoked_before);
+CREATE INDEX IF NOT EXISTS idx_revoked_tokens_revoked_at ON revoked_tokens(revoked_at);
@@ -0,0 +1,25 @@
+-- Migration 0003: background CSV import jobs.
+-- Progress columns are updated in the same transaction as each imported chunk,
+-- so last_committed_row is where a crashed job resumes.
+
+CREATE TABLE IF NOT EXISTS import_jobs (
+    id SERIAL PRIMARY KEY,
+    role VARCHAR(20) NOT NULL CHECK (role IN ('professor', 'student')),
+    filename VARCHAR(255),
+    file_path TEXT NOT NULL,
+    status VARCHAR(20) NOT NULL DEFAULT 'queued' CHECK (status IN ('queued', 'running', 'completed', 'failed')),
+    created_by INTEGER REFERENCES users(id),
+    total_rows INTEGER,
+    rows_processed INTEGER NOT NULL DEFAULT 0,
+    success_count INTEGER NOT NULL DEFAULT 0,
+    error_count INTEGER NOT NULL DEFAULT 0,
+    errors JSONB NOT NULL DEFAULT '[]',
+    last_committed_row INTEGER NOT NULL DEFAULT 1,
+    error_message TEXT,
+    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+    started_at TIMESTAMP,
+    finished_at TIMESTAMP,
+    heartbeat_at TIMESTAMP
+);
+
+CREATE INDEX IF NOT EXISTS idx_import_jobs_status ON import_jobs(status);
@@ -0,0 +1,15 @@
+-- Migration 0005: indexes for paginated user listings.
+-- Admin user list: ORDER BY created_at DESC, id DESC with optional role,
+-- department_id, batch and is_active filters; keyset pages seek on (created_at, id).
+
+CREATE INDEX IF NOT EXISTS idx_users_created ON users(created_at DESC, id DESC);
+CREATE INDEX IF NOT EXISTS idx_users_role_created ON users(role, created_at DESC, id DESC);
+CREATE INDEX IF NOT EXISTS idx_users_dept_role_created ON users(department_id, role, created_at DESC, id DESC);
+CREATE INDEX IF NOT EXISTS idx_users_dept_batch_created ON users(department_id, batch, created_at DESC, id DESC);
+CREATE INDEX IF NOT EXISTS idx_users_active_role_created ON users(is_active, role, created_at DESC, id DESC);
+
+-- Professor's students and student classmates: active students of a department,
+-- ordered by batch, last name, first name (expressions match the queries)
+CREATE INDEX IF NOT EXISTS idx_users_active_students ON users(
+    department_id, COALESCE(batch, ''), COALESCE(last_name, ''), COALESCE(first_name, ''), id
+) WHERE role = 'student' AND is_active = TRUE;
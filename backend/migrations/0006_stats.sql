@@ -0,0 +1,338 @@
+-- Migration 0006: incrementally maintained dashboard statistics.
+--
+-- stats_counters holds running totals (active users by role and department,
+-- rooms, timetable entries, bookings, messages, notifications). Each counter is
+-- split across 8 shards picked by backend pid so concurrent writers rarely
+-- update the same row; readers sum the shards.
+-- stats_daily holds per-day rollups (metric + dimension). Both are kept up to
+-- date by statement-level triggers using transition tables, so a bulk INSERT
+-- costs one counter update per distinct key rather than one per row.
+-- room_minutes is recomputed by the scheduler (timetable slots recur weekly).
+
+CREATE TABLE IF NOT EXISTS stats_counters (
+    name VARCHAR(100) NOT NULL,
+    shard SMALLINT NOT NULL DEFAULT 0,
+    value BIGINT NOT NULL DEFAULT 0,
+    PRIMARY KEY (name, shard)
+);
+
+CREATE TABLE IF NOT EXISTS stats_daily (
+    day DATE NOT NULL,
+    metric VARCHAR(50) NOT NULL,
+    dimension VARCHAR(100) NOT NULL DEFAULT '',
+    value BIGINT NOT NULL DEFAULT 0,
+    PRIMARY KEY (day, metric, dimension)
+);
+
+CREATE INDEX IF NOT EXISTS idx_stats_daily_metric_day ON stats_daily(metric, day);
+
+CREATE OR REPLACE FUNCTION stats_add(p_name TEXT, p_delta BIGINT) RETURNS void AS $$
+BEGIN
+    IF p_delta IS NULL OR p_delta = 0 THEN
+        RETURN;
+    END IF;
+    INSERT INTO stats_counters (name, shard, value)
+    VALUES (p_name, mod(pg_backend_pid(), 8), p_delta)
+    ON CONFLICT (name, shard) DO UPDATE SET value = stats_counters.value + EXCLUDED.value;
+END;
+$$ LANGUAGE plpgsql;
+
+CREATE OR REPLACE FUNCTION stats_add_daily(p_day DATE, p_metric TEXT, p_dimension TEXT, p_delta BIGINT) RETURNS void AS $$
+BEGIN
+    IF p_delta IS NULL OR p_delta = 0 THEN
+        RETURN;
+    END IF;
+    INSERT INTO stats_daily (day, metric, dimension, value)
+    VALUES (p_day, p_metric, COALESCE(p_dimension, ''), p_delta)
+    ON CONFLICT (day, metric, dimension) DO UPDATE SET value = stats_daily.value + EXCLUDED.value;
+END;
+$$ LANGUAGE plpgsql;
+
+-- Users: active counts by role and by role + department; daily sign-ups
+CREATE OR REPLACE FUNCTION stats_users_changed() RETURNS trigger AS $$
+DECLARE
+    r RECORD;
+BEGIN
+    IF TG_OP = 'INSERT' THEN
+        FOR r IN
+            SELECT k.name, COUNT(*) AS delta
+            FROM new_rows n
+            CROSS JOIN LATERAL (VALUES
+                ('users.' || n.role),
+                ('users.' || n.role || '.dept.' || COALESCE(n.department_id::text, 'none'))
+            ) AS k(name)
+            WHERE n.is_active
+            GROUP BY k.name
+        LOOP
+            PERFORM stats_add(r.name, r.delta);
+        END LOOP;
+        FOR r IN
+            SELECT COALESCE(n.created_at, LOCALTIMESTAMP)::date AS day,
+                   n.role || ':' || COALESCE(n.department_id::text, 'none') AS dimension, COUNT(*) AS delta
+            FROM new_rows n
+            GROUP BY 1, 2
+        LOOP
+            PERFORM stats_add_daily(r.day, 'users_created', r.dimension, r.delta);
+        END LOOP;
+    ELSIF TG_OP = 'UPDATE' THEN
+        -- Only rows whose role, department or active flag changed move between counters
+        FOR r IN
+            SELECT k.name, SUM(k.delta) AS delta
+            FROM old_rows o
+            JOIN new_rows n ON n.id = o.id
+            CROSS JOIN LATERAL (VALUES
+                ('users.' || o.role, -1, o.is_active),
+                ('users.' || o.role || '.dept.' || COALESCE(o.department_id::text, 'none'), -1, o.is_active),
+                ('users.' || n.role, 1, n.is_active),
+                ('users.' || n.role || '.dept.' || COALESCE(n.department_id::text, 'none'), 1, n.is_active)
+            ) AS k(name, delta, counted)
+            WHERE k.counted
+            AND (o.role <> n.role
+                 OR o.department_id IS DISTINCT FROM n.department_id
+                 OR o.is_active IS DISTINCT FROM n.is_active)
+            GROUP BY k.name
+        LOOP
+            PERFORM stats_add(r.name, r.delta);
+        END LOOP;
+    ELSE
+        FOR r IN
+            SELECT k.name, COUNT(*) AS delta
+            FROM old_rows o
+            CROSS JOIN LATERAL (VALUES
+                ('users.' || o.role),
+                ('users.' || o.role || '.dept.' || COALESCE(o.department_id::text, 'none'))
+            ) AS k(name)
+            WHERE o.is_active
+            GROUP BY k.name
+        LOOP
+            PERFORM stats_add(r.name, -r.delta);
+        END LOOP;
+    END IF;
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+
+CREATE OR REPLACE FUNCTION stats_departments_changed() RETURNS trigger AS $$
+BEGIN
+    IF TG_OP = 'INSERT' THEN
+        PERFORM stats_add('departments', (SELECT COUNT(*) FROM new_rows));
+    ELSE
+        PERFORM stats_add('departments', -(SELECT COUNT(*) FROM old_rows));
+    END IF;
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+
+-- Classrooms: total and by room_type
+CREATE OR REPLACE FUNCTION stats_classrooms_changed() RETURNS trigger AS $$
+DECLARE
+    r RECORD;
+BEGIN
+    IF TG_OP = 'INSERT' THEN
+        PERFORM stats_add('classrooms', (SELECT COUNT(*) FROM new_rows));
+        FOR r IN SELECT room_type, COUNT(*) AS delta FROM new_rows GROUP BY room_type LOOP
+            PERFORM stats_add('classrooms.' || COALESCE(r.room_type, 'none'), r.delta);
+        END LOOP;
+    ELSIF TG_OP = 'UPDATE' THEN
+        FOR r IN
+            SELECT k.room_type, SUM(k.delta) AS delta
+            FROM old_rows o
+            JOIN new_rows n ON n.id = o.id
+            CROSS JOIN LATERAL (VALUES (o.room_type, -1), (n.room_type, 1)) AS k(room_type, delta)
+            WHERE o.room_type IS DISTINCT FROM n.room_type
+            GROUP BY k.room_type
+        LOOP
+            PERFORM stats_add('classrooms.' || COALESCE(r.room_type, 'none'), r.delta);
+        END LOOP;
+    ELSE
+        PERFORM stats_add('classrooms', -(SELECT COUNT(*) FROM old_rows));
+        FOR r IN SELECT room_type, COUNT(*) AS delta FROM old_rows GROUP BY room_type LOOP
+            PERFORM stats_add('classrooms.' || COALESCE(r.room_type, 'none'), -r.delta);
+        END LOOP;
+    END IF;
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+
+CREATE OR REPLACE FUNCTION stats_timetable_changed() RETURNS trigger AS $$
+BEGIN
+    IF TG_OP = 'INSERT' THEN
+        PERFORM stats_add('timetable_entries', (SELECT COUNT(*) FROM new_rows));
+    ELSE
+        PERFORM stats_add('timetable_entries', -(SELECT COUNT(*) FROM old_rows));
+    END IF;
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+
+-- Auditorium bookings: total; daily bookings per room on the booked date
+CREATE OR REPLACE FUNCTION stats_bookings_changed() RETURNS trigger AS $$
+DECLARE
+    r RECORD;
+BEGIN
+    IF TG_OP = 'INSERT' THEN
+        PERFORM stats_add('auditorium_bookings', (SELECT COUNT(*) FROM new_rows));
+        FOR r IN SELECT booking_date, classroom_id, COUNT(*) AS delta FROM new_rows GROUP BY 1, 2 LOOP
+            PERFORM stats_add_daily(r.booking_date, 'bookings', r.classroom_id::text, r.delta);
+        END LOOP;
+    ELSE
+        PERFORM stats_add('auditorium_bookings', -(SELECT COUNT(*) FROM old_rows));
+        FOR r IN SELECT booking_date, classroom_id, COUNT(*) AS delta FROM old_rows GROUP BY 1, 2 LOOP
+            PERFORM stats_add_daily(r.booking_date, 'bookings', r.classroom_id::text, -r.delta);
+        END LOOP;
+    END IF;
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+
+-- Messages: total and by channel; daily messages per channel
+CREATE OR REPLACE FUNCTION stats_messages_changed() RETURNS trigger AS $$
+DECLARE
+    r RECORD;
+BEGIN
+    IF TG_OP = 'INSERT' THEN
+        PERFORM stats_add('messages', (SELECT COUNT(*) FROM new_rows));
+        FOR r IN SELECT message_type, COUNT(*) AS delta FROM new_rows GROUP BY 1 LOOP
+            PERFORM stats_add('messages.' || r.message_type, r.delta);
+        END LOOP;
+        FOR r IN SELECT COALESCE(created_at, LOCALTIMESTAMP)::date AS day, message_type, COUNT(*) AS delta FROM new_rows GROUP BY 1, 2 LOOP
+            PERFORM stats_add_daily(r.day, 'messages', r.message_type, r.delta);
+        END LOOP;
+    ELSE
+        PERFORM stats_add('messages', -(SELECT COUNT(*) FROM old_rows));
+        FOR r IN SELECT message_type, COUNT(*) AS delta FROM old_rows GROUP BY 1 LOOP
+            PERFORM stats_add('messages.' || r.message_type, -r.delta);
+        END LOOP;
+    END IF;
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+
+-- Notifications: total and by type; daily notifications per type
+CREATE OR REPLACE FUNCTION stats_notifications_changed() RETURNS trigger AS $$
+DECLARE
+    r RECORD;
+BEGIN
+    IF TG_OP = 'INSERT' THEN
+        PERFORM stats_add('notifications', (SELECT COUNT(*) FROM new_rows));
+        FOR r IN SELECT COALESCE(notification_type, 'none') AS type, COUNT(*) AS delta FROM new_rows GROUP BY 1 LOOP
+            PERFORM stats_add('notifications.' || r.type, r.delta);
+        END LOOP;
+        FOR r IN SELECT COALESCE(created_at, LOCALTIMESTAMP)::date AS day, COALESCE(notification_type, 'none') AS type, COUNT(*) AS delta
+                 FROM new_rows GROUP BY 1, 2 LOOP
+            PERFORM stats_add_daily(r.day, 'notifications', r.type, r.delta);
+        END LOOP;
+    ELSE
+        PERFORM stats_add('notifications', -(SELECT COUNT(*) FROM old_rows));
+        FOR r IN SELECT COALESCE(notification_type, 'none') AS type, COUNT(*) AS delta FROM old_rows GROUP BY 1 LOOP
+            PERFORM stats_add('notifications.' || r.type, -r.delta);
+        END LOOP;
+    END IF;
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+
+-- One trigger per event: a trigger with transition tables fires for a single event type
+DROP TRIGGER IF EXISTS stats_users_insert ON users;
+DROP TRIGGER IF EXISTS stats_users_update ON users;
+DROP TRIGGER IF EXISTS stats_users_delete ON users;
+CREATE TRIGGER stats_users_insert AFTER INSERT ON users
+    REFERENCING NEW TABLE AS new_rows FOR EACH STATEMENT EXECUTE FUNCTION stats_users_changed();
+CREATE TRIGGER stats_users_update AFTER UPDATE ON users
+    REFERENCING OLD TABLE AS old_rows NEW TABLE AS new_rows FOR EACH STATEMENT EXECUTE FUNCTION stats_users_changed();
+CREATE TRIGGER stats_users_delete AFTER DELETE ON users
+    REFERENCING OLD TABLE AS old_rows FOR EACH STATEMENT EXECUTE FUNCTION stats_users_changed();
+
+DROP TRIGGER IF EXISTS stats_departments_insert ON departments;
+DROP TRIGGER IF EXISTS stats_departments_delete ON departments;
+CREATE TRIGGER stats_departments_insert AFTER INSERT ON departments
+    REFERENCING NEW TABLE AS new_rows FOR EACH STATEMENT EXECUTE FUNCTION stats_departments_changed();
+CREATE TRIGGER stats_departments_delete AFTER DELETE ON departments
+    REFERENCING OLD TABLE AS old_rows FOR EACH STATEMENT EXECUTE FUNCTION stats_departments_changed();
+
+DROP TRIGGER IF EXISTS stats_classrooms_insert ON classrooms;
+DROP TRIGGER IF EXISTS stats_classrooms_update ON classrooms;
+DROP TRIGGER IF EXISTS stats_classrooms_delete ON classrooms;
+CREATE TRIGGER stats_classrooms_insert AFTER INSERT ON classrooms
+    REFERENCING NEW TABLE AS new_rows FOR EACH STATEMENT EXECUTE FUNCTION stats_classrooms_changed();
+CREATE TRIGGER stats_classrooms_update AFTER UPDATE ON classrooms
+    REFERENCING OLD TABLE AS old_rows NEW TABLE AS new_rows FOR EACH STATEMENT EXECUTE FUNCTION stats_classrooms_changed();
+CREATE TRIGGER stats_classrooms_delete AFTER DELETE ON classrooms
+    REFERENCING OLD TABLE AS old_rows FOR EACH STATEMENT EXECUTE FUNCTION stats_classrooms_changed();
+
+DROP TRIGGER IF EXISTS stats_timetable_insert ON timetable;
+DROP TRIGGER IF EXISTS stats_timetable_delete ON timetable;
+CREATE TRIGGER stats_timetable_insert AFTER INSERT ON timetable
+    REFERENCING NEW TABLE AS new_rows FOR EACH STATEMENT EXECUTE FUNCTION stats_timetable_changed();
+CREATE TRIGGER stats_timetable_delete AFTER DELETE ON timetable
+    REFERENCING OLD TABLE AS old_rows FOR EACH STATEMENT EXECUTE FUNCTION stats_timetable_changed();
+
+DROP TRIGGER IF EXISTS stats_bookings_insert ON auditorium_bookings;
+DROP TRIGGER IF EXISTS stats_bookings_delete ON auditorium_bookings;
+CREATE TRIGGER stats_bookings_insert AFTER INSERT ON auditorium_bookings
+    REFERENCING NEW TABLE AS new_rows FOR EACH STATEMENT EXECUTE FUNCTION stats_bookings_changed();
+CREATE TRIGGER stats_bookings_delete AFTER DELETE ON auditorium_bookings
+    REFERENCING OLD TABLE AS old_rows FOR EACH STATEMENT EXECUTE FUNCTION stats_bookings_changed();
+
+DROP TRIGGER IF EXISTS stats_messages_insert ON messages;
+DROP TRIGGER IF EXISTS stats_messages_delete ON messages;
+CREATE TRIGGER stats_messages_insert AFTER INSERT ON messages
+    REFERENCING NEW TABLE AS new_rows FOR EACH STATEMENT EXECUTE FUNCTION stats_messages_changed();
+CREATE TRIGGER stats_messages_delete AFTER DELETE ON messages
+    REFERENCING OLD TABLE AS old_rows FOR EACH STATEMENT EXECUTE FUNCTION stats_messages_changed();
+
+DROP TRIGGER IF EXISTS stats_notifications_insert ON notifications;
+DROP TRIGGER IF EXISTS stats_notifications_delete ON notifications;
+CREATE TRIGGER stats_notifications_insert AFTER INSERT ON notifications
+    REFERENCING NEW TABLE AS new_rows FOR EACH STATEMENT EXECUTE FUNCTION stats_notifications_changed();
+CREATE TRIGGER stats_notifications_delete AFTER DELETE ON notifications
+    REFERENCING OLD TABLE AS old_rows FOR EACH STATEMENT EXECUTE FUNCTION stats_notifications_changed();
+
+-- Recompute counters and trigger-fed daily rollups from the base tables.
+-- Run at the end of this migration; call again with SELECT stats_rebuild() if
+-- counters are ever suspected to drift (e.g. after a TRUNCATE).
+CREATE OR REPLACE FUNCTION stats_rebuild() RETURNS void AS $$
+BEGIN
+    LOCK TABLE users, departments, classrooms, timetable, auditorium_bookings, messages, notifications IN SHARE MODE;
+    DELETE FROM stats_counters;
+    DELETE FROM stats_daily WHERE metric IN ('users_created', 'bookings', 'messages', 'notifications');
+
+    INSERT INTO stats_counters (name, value)
+    SELECT 'users.' || role, COUNT(*) FROM users WHERE is_active GROUP BY role
+    UNION ALL
+    SELECT 'users.' || role || '.dept.' || COALESCE(department_id::text, 'none'), COUNT(*)
+    FROM users WHERE is_active GROUP BY role, department_id
+    UNION ALL
+    SELECT 'departments', COUNT(*) FROM departments
+    UNION ALL
+    SELECT 'classrooms', COUNT(*) FROM classrooms
+    UNION ALL
+    SELECT 'classrooms.' || COALESCE(room_type, 'none'), COUNT(*) FROM classrooms GROUP BY room_type
+    UNION ALL
+    SELECT 'timetable_entries', COUNT(*) FROM timetable
+    UNION ALL
+    SELECT 'auditorium_bookings', COUNT(*) FROM auditorium_bookings
+    UNION ALL
+    SELECT 'messages', COUNT(*) FROM messages
+    UNION ALL
+    SELECT 'messages.' || message_type, COUNT(*) FROM messages GROUP BY message_type
+    UNION ALL
+    SELECT 'notifications', COUNT(*) FROM notifications
+    UNION ALL
+    SELECT 'notifications.' || COALESCE(notification_type, 'none'), COUNT(*) FROM notifications GROUP BY notification_type;
+
+    INSERT INTO stats_daily (day, metric, dimension, value)
+    SELECT COALESCE(created_at, LOCALTIMESTAMP)::date, 'users_created',
+           role || ':' || COALESCE(department_id::text, 'none'), COUNT(*)
+    FROM users GROUP BY 1, 3
+    UNION ALL
+    SELECT booking_date, 'bookings', classroom_id::text, COUNT(*) FROM auditorium_bookings GROUP BY 1, 3
+    UNION ALL
+    SELECT COALESCE(created_at, LOCALTIMESTAMP)::date, 'messages', message_type, COUNT(*) FROM messages GROUP BY 1, 3
+    UNION ALL
+    SELECT COALESCE(created_at, LOCALTIMESTAMP)::date, 'notifications', COALESCE(notification_type, 'none'), COUNT(*)
+    FROM notifications GROUP BY 1, 3;
+END;
+$$ LANGUAGE plpgsql;
+
+SELECT stats_rebuild();
@@ -0,0 +1,53 @@
+-- Migration 0007: database-enforced timetable conflicts.
+--
+-- Each entry gets a day-scoped half-open time range (slot = [start_time, end_time)),
+-- so back-to-back classes (09:00-09:55, 09:55-10:50) do not conflict. GiST exclusion
+-- constraints reject overlapping slots on the same day for the same room, the same
+-- professor, and the same department + batch. Writes no longer need separate conflict
+-- queries, and two concurrent writes can no longer both pass a check and overlap.
+
+CREATE EXTENSION IF NOT EXISTS btree_gist;
+
+DO $$
+BEGIN
+    IF NOT EXISTS (SELECT 1 FROM pg_type WHERE typname = 'timerange') THEN
+        CREATE TYPE timerange AS RANGE (subtype = time);
+    END IF;
+END;
+$$;
+
+-- Existing rows must be conflict-free before the constraints can be added
+DO $$
+DECLARE
+    bad TEXT;
+BEGIN
+    SELECT string_agg(id::text, ', ') INTO bad FROM timetable WHERE end_time <= start_time;
+    IF bad IS NOT NULL THEN
+        RAISE EXCEPTION 'timetable entries with end_time <= start_time must be fixed first: %', bad;
+    END IF;
+
+    SELECT string_agg(a.id || '/' || b.id, ', ') INTO bad
+    FROM timetable a
+    JOIN timetable b ON a.id < b.id
+        AND a.day_of_week = b.day_of_week
+        AND a.start_time < b.end_time AND b.start_time < a.end_time
+        AND (a.classroom_id = b.classroom_id
+             OR a.professor_id = b.professor_id
+             OR (a.department_id = b.department_id AND a.batch = b.batch));
+    IF bad IS NOT NULL THEN
+        RAISE EXCEPTION 'overlapping timetable entries must be resolved first (id pairs): %', bad;
+    END IF;
+END;
+$$;
+
+ALTER TABLE timetable
+    ADD COLUMN slot timerange GENERATED ALWAYS AS (timerange(start_time, end_time, '[)')) STORED;
+
+ALTER TABLE timetable
+    ADD CONSTRAINT timetable_valid_slot CHECK (end_time > start_time),
+    ADD CONSTRAINT timetable_room_overlap
+        EXCLUDE USING gist (classroom_id WITH =, day_of_week WITH =, slot WITH &&),
+    ADD CONSTRAINT timetable_professor_overlap
+        EXCLUDE USING gist (professor_id WITH =, day_of_week WITH =, slot WITH &&),
+    ADD CONSTRAINT timetable_batch_overlap
+        EXCLUDE USING gist (department_id WITH =, batch WITH =, day_of_week WITH =, slot WITH &&);
@@ -0,0 +1,22 @@
+-- Migration 0008: make the timetable overlap constraints deferrable.
+--
+-- They are still checked per statement by default (INITIALLY IMMEDIATE). A
+-- transaction that applies many planned changes at once (POST /api/timetable/validate
+-- with apply) can SET CONSTRAINTS ... DEFERRED so that swaps and chains of moves are
+-- checked once, against the final state, at commit.
+
+ALTER TABLE timetable
+    DROP CONSTRAINT timetable_room_overlap,
+    DROP CONSTRAINT timetable_professor_overlap,
+    DROP CONSTRAINT timetable_batch_overlap;
+
+ALTER TABLE timetable
+    ADD CONSTRAINT timetable_room_overlap
+        EXCLUDE USING gist (classroom_id WITH =, day_of_week WITH =, slot WITH &&)
+        DEFERRABLE INITIALLY IMMEDIATE,
+    ADD CONSTRAINT timetable_professor_overlap
+        EXCLUDE USING gist (professor_id WITH =, day_of_week WITH =, slot WITH &&)
+        DEFERRABLE INITIALLY IMMEDIATE,
+    ADD CONSTRAINT timetable_batch_overlap
+        EXCLUDE USING gist (department_id WITH =, batch WITH =, day_of_week WITH =, slot WITH &&)
+        DEFERRABLE INITIALLY IMMEDIATE;
@@ -0,0 +1,111 @@
+-- Migration 0009: timetable change log and per-scope versions.
+--
+-- Every insert, update and delete on timetable is logged in timetable_changes
+-- with a version from timetable_version_seq, and timetable_versions keeps the
+-- latest version per scope: 'all', 'batch:<department_id>:<batch>' and
+-- 'professor:<id>'. GET endpoints use the scope version as an ETag, and
+-- GET /api/timetable/changes?since=<version> returns only the entries changed
+-- since then (deleted ones as tombstones).
+--
+-- The triggers are statement-level with transition tables (as in 0006) and take
+-- a transaction-level advisory lock first, so timetable writers commit in
+-- version order and a client syncing from version N never misses a lower,
+-- later-committed version.
+
+CREATE SEQUENCE IF NOT EXISTS timetable_version_seq;
+
+CREATE TABLE IF NOT EXISTS timetable_changes (
+    version BIGINT PRIMARY KEY,
+    entry_id INTEGER NOT NULL,
+    op VARCHAR(10) NOT NULL CHECK (op IN ('insert', 'update', 'delete')),
+    department_id INTEGER,
+    batch VARCHAR(20),
+    professor_id INTEGER,
+    -- Scope the entry left, when an update moved it to another batch or professor
+    old_department_id INTEGER,
+    old_batch VARCHAR(20),
+    old_professor_id INTEGER,
+    changed_at TIMESTAMP NOT NULL DEFAULT CURRENT_TIMESTAMP
+);
+
+CREATE INDEX IF NOT EXISTS idx_timetable_changes_batch ON timetable_changes(department_id, batch, version);
+CREATE INDEX IF NOT EXISTS idx_timetable_changes_professor ON timetable_changes(professor_id, version);
+CREATE INDEX IF NOT EXISTS idx_timetable_changes_changed_at ON timetable_changes(changed_at);
+
+CREATE TABLE IF NOT EXISTS timetable_versions (
+    scope VARCHAR(60) PRIMARY KEY,
+    version BIGINT NOT NULL
+);
+
+CREATE OR REPLACE FUNCTION timetable_log_changes() RETURNS trigger AS $$
+DECLARE
+    v_before BIGINT;
+BEGIN
+    -- Serialize timetable writers so versions become visible in commit order
+    PERFORM pg_advisory_xact_lock(724312);
+    -- Under the lock no other writer draws from the sequence, so this statement's
+    -- changes are exactly the versions above v_before
+    SELECT CASE WHEN is_called THEN last_value ELSE 0 END INTO v_before FROM timetable_version_seq;
+
+    IF TG_OP = 'INSERT' THEN
+        INSERT INTO timetable_changes (version, entry_id, op, department_id, batch, professor_id)
+        SELECT nextval('timetable_version_seq'), n.id, 'insert', n.department_id, n.batch, n.professor_id
+        FROM new_rows n ORDER BY n.id;
+    ELSIF TG_OP = 'UPDATE' THEN
+        INSERT INTO timetable_changes (version, entry_id, op, department_id, batch, professor_id,
+                                       old_department_id, old_batch, old_professor_id)
+        SELECT nextval('timetable_version_seq'), n.id, 'update', n.department_id, n.batch, n.professor_id,
+               CASE WHEN (o.department_id, o.batch) IS DISTINCT FROM (n.department_id, n.batch) THEN o.department_id END,
+               CASE WHEN (o.department_id, o.batch) IS DISTINCT FROM (n.department_id, n.batch) THEN o.batch END,
+               NULLIF(o.professor_id, n.professor_id)
+        FROM new_rows n JOIN old_rows o ON o.id = n.id ORDER BY n.id;
+    ELSE
+        INSERT INTO timetable_changes (version, entry_id, op, department_id, batch, professor_id)
+        SELECT nextval('timetable_version_seq'), o.id, 'delete', o.department_id, o.batch, o.professor_id
+        FROM old_rows o ORDER BY o.id;
+    END IF;
+
+    INSERT INTO timetable_versions (scope, version)
+    SELECT s.scope, MAX(c.version)
+    FROM timetable_changes c
+    CROSS JOIN LATERAL (VALUES
+        ('all'),
+        ('batch:' || c.department_id || ':' || c.batch),
+        ('professor:' || c.professor_id),
+        ('batch:' || c.old_department_id || ':' || c.old_batch),
+        ('professor:' || c.old_professor_id)
+    ) AS s(scope)
+    WHERE c.version > v_before AND s.scope IS NOT NULL
+    GROUP BY s.scope
+    ON CONFLICT (scope) DO UPDATE SET version = GREATEST(timetable_versions.version, EXCLUDED.version);
+
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+
+DROP TRIGGER IF EXISTS timetable_log_insert ON timetable;
+DROP TRIGGER IF EXISTS timetable_log_update ON timetable;
+DROP TRIGGER IF EXISTS timetable_log_delete ON timetable;
+CREATE TRIGGER timetable_log_insert AFTER INSERT ON timetable
+    REFERENCING NEW TABLE AS new_rows FOR EACH STATEMENT EXECUTE FUNCTION timetable_log_changes();
+CREATE TRIGGER timetable_log_update AFTER UPDATE ON timetable
+    REFERENCING OLD TABLE AS old_rows NEW TABLE AS new_rows FOR EACH STATEMENT EXECUTE FUNCTION timetable_log_changes();
+CREATE TRIGGER timetable_log_delete AFTER DELETE ON timetable
+    REFERENCING OLD TABLE AS old_rows FOR EACH STATEMENT EXECUTE FUNCTION timetable_log_changes();
+
+-- Existing entries start as inserts, so a first sync from version 0 sees everything
+INSERT INTO timetable_changes (version, entry_id, op, department_id, batch, professor_id)
+SELECT nextval('timetable_version_seq'), id, 'insert', department_id, batch, professor_id
+FROM timetable ORDER BY id;
+
+INSERT INTO timetable_versions (scope, version)
+SELECT s.scope, MAX(c.version)
+FROM timetable_changes c
+CROSS JOIN LATERAL (VALUES
+    ('all'), ('batch:' || c.department_id || ':' || c.batch), ('professor:' || c.professor_id)
+) AS s(scope)
+GROUP BY s.scope
+ON CONFLICT (scope) DO UPDATE SET version = GREATEST(timetable_versions.version, EXCLUDED.version);
+
+-- Changes up to this version were pruned; older `since` values must resync in full
+INSERT INTO timetable_versions (scope, version) VALUES ('pruned', 0) ON CONFLICT (scope) DO NOTHING;
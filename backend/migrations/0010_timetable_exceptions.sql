@@ -0,0 +1,50 @@
+-- Migration 0010: one-off exceptions to the weekly timetable, for the dated calendar.
+--
+-- A row cancels or moves a single occurrence of a timetable entry: the class
+-- normally held on exception_date. A moved occurrence takes place on new_date
+-- (same day when NULL) at start_time-end_time, in classroom_id when set.
+-- GET /api/calendar expands weekly entries into dated occurrences and applies
+-- these rows.
+--
+-- Statement-level triggers give timetable_exceptions and auditorium_bookings
+-- their own scope in timetable_versions ('exceptions', 'bookings'), so cached
+-- calendar weeks are keyed by every version they were built from.
+
+CREATE TABLE IF NOT EXISTS timetable_exceptions (
+    id SERIAL PRIMARY KEY,
+    timetable_id INTEGER REFERENCES timetable(id) ON DELETE CASCADE NOT NULL,
+    exception_date DATE NOT NULL,
+    status VARCHAR(20) NOT NULL CHECK (status IN ('cancelled', 'moved')),
+    new_date DATE,
+    start_time TIME,
+    end_time TIME,
+    classroom_id INTEGER REFERENCES classrooms(id),
+    note VARCHAR(200),
+    created_by INTEGER REFERENCES users(id),
+    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+    UNIQUE (timetable_id, exception_date),
+    CONSTRAINT timetable_exceptions_moved_slot CHECK (
+        status <> 'moved' OR (start_time IS NOT NULL AND end_time IS NOT NULL AND end_time > start_time)
+    )
+);
+
+CREATE INDEX IF NOT EXISTS idx_timetable_exceptions_date ON timetable_exceptions(exception_date);
+CREATE INDEX IF NOT EXISTS idx_timetable_exceptions_new_date ON timetable_exceptions(new_date) WHERE new_date IS NOT NULL;
+
+CREATE OR REPLACE FUNCTION timetable_bump_scope() RETURNS trigger AS $$
+BEGIN
+    -- A fresh value rather than GREATEST: concurrent writers may commit out of order, and
+    -- the last committed statement must still leave a version no earlier state had
+    INSERT INTO timetable_versions (scope, version) VALUES (TG_ARGV[0], nextval('timetable_version_seq'))
+    ON CONFLICT (scope) DO UPDATE SET version = EXCLUDED.version;
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+
+DROP TRIGGER IF EXISTS timetable_exceptions_version ON timetable_exceptions;
+CREATE TRIGGER timetable_exceptions_version AFTER INSERT OR UPDATE OR DELETE ON timetable_exceptions
+    FOR EACH STATEMENT EXECUTE FUNCTION timetable_bump_scope('exceptions');
+
+DROP TRIGGER IF EXISTS auditorium_bookings_version ON auditorium_bookings;
+CREATE TRIGGER auditorium_bookings_version AFTER INSERT OR UPDATE OR DELETE ON auditorium_bookings
+    FOR EACH STATEMENT EXECUTE FUNCTION timetable_bump_scope('bookings');
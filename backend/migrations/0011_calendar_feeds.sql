@@ -0,0 +1,22 @@
+-- Migration 0011: tokenized iCalendar feed subscriptions.
+-- A feed is a secret URL (/api/calendar/feeds/<token>.ics) for one target:
+-- a department + batch timetable, a professor's classes, or the auditorium.
+-- Feeds for the same target share one rendered file on disk.
+
+CREATE TABLE IF NOT EXISTS calendar_feeds (
+    id SERIAL PRIMARY KEY,
+    token VARCHAR(64) UNIQUE NOT NULL,
+    user_id INTEGER REFERENCES users(id) ON DELETE CASCADE NOT NULL,
+    kind VARCHAR(20) NOT NULL CHECK (kind IN ('batch', 'professor', 'auditorium')),
+    department_id INTEGER REFERENCES departments(id) ON DELETE CASCADE,
+    batch VARCHAR(20),
+    professor_id INTEGER REFERENCES users(id) ON DELETE CASCADE,
+    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+    CHECK (
+        (kind = 'batch' AND department_id IS NOT NULL AND batch IS NOT NULL AND professor_id IS NULL)
+        OR (kind = 'professor' AND professor_id IS NOT NULL AND department_id IS NULL AND batch IS NULL)
+        OR (kind = 'auditorium' AND department_id IS NULL AND batch IS NULL AND professor_id IS NULL)
+    )
+);
+
+CREATE INDEX IF NOT EXISTS idx_calendar_feeds_user ON calendar_feeds(user_id);
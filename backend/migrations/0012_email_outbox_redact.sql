@@ -0,0 +1,8 @@
+-- Migration 0012: clear bodies of finished outgoing mail.
+-- Bodies can hold temporary passwords and reset tokens; the delivery worker now
+-- empties them when a row is sent or fails for good (app/services/email_queue_service.py),
+-- so do the same for rows finished before that change.
+
+UPDATE email_outbox SET body = '' WHERE status IN ('sent', 'failed') AND body <> '';
+
+CREATE INDEX IF NOT EXISTS idx_email_outbox_finished ON email_outbox(created_at) WHERE status IN ('sent', 'failed');
@@ -0,0 +1,7 @@
+-- Migration 0013: credential mails without stored passwords.
+-- A queued credentials mail carries the user id and a placeholder instead of the
+-- temporary password; the delivery worker sets a fresh temporary password on the
+-- user and fills it in at send time (app/services/email_queue_service.py).
+
+ALTER TABLE email_outbox
+    ADD COLUMN IF NOT EXISTS credentials_user_id INTEGER REFERENCES users(id) ON DELETE CASCADE;
@@ -0,0 +1,6 @@
+-- Migration 0014: keep background import uploads in the job row.
+-- Uploads used to live only in the receiving host's IMPORT_JOB_DIR, so a stale
+-- job could not be resumed by a worker on another host. file_data holds the CSV
+-- until the job finishes; file_path is now just the name of a worker's local copy.
+
+ALTER TABLE import_jobs ADD COLUMN IF NOT EXISTS file_data BYTEA;
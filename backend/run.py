@@ -1,5 +1,6 @@
 from app import create_app, socketio
-from app.services.scheduler_service import init_scheduler, shutdown_scheduler
+from app.services.scheduler_service import init_scheduler, shutdown_scheduler, resume_stale_import_jobs
+from app.services.email_queue_service import stop_email_worker
 import atexit
 
 app = create_app()
@@ -8,34 +9,45 @@ app = create_app()
 with app.app_context():
     init_scheduler(app)
 
-# Register shutdown handler
-atexit.register(shutdown_scheduler)
+# Resume background CSV imports interrupted by the last shutdown
+resume_stale_import_jobs(app)
 
-# Socket.IO event handlers
-@socketio.on('connect')
-def handle_connect():
-    print('Client connected')
-
-@socketio.on('disconnect')
-def handle_disconnect():
-    print('Client disconnected')
-
-@socketio.on('join_room')
-def handle_join_room(data):
-    from flask_socketio import join_room
-    room = data.get('room')
-    if room:
-        join_room(room)
-        print(f'User joined room: {room}')
-
-@socketio.on('leave_room')
-def handle_leave_room(data):
-    from flask_socketio import leave_room
-    room = data.get('room')
-    if room:
-        leave_room(room)
-        print(f'User left room: {room}')
+# Register shutdown handlers
+atexit.register(shutdown_scheduler)
+atexit.register(stop_email_worker)
+
+def register_socketio_handlers(socketio):
+    """Socket.IO event handlers (only when ENABLE_SOCKETIO is on)"""
+    @socketio.on('connect')
+    def handle_connect():
+        print('Client connected')
+
+    @socketio.on('disconnect')
+    def handle_disconnect():
+        print('Client disconnected')
+
+    @socketio.on('join_room')
+    def handle_join_room(data):
+        from flask_socketio import join_room
+        room = data.get('room')
+        if room:
+            join_room(room)
+            print(f'User joined room: {room}')
+
+    @socketio.on('leave_room')
+    def handle_leave_room(data):
+        from flask_socketio import leave_room
+        room = data.get('room')
+        if room:
+            leave_room(room)
+            print(f'User left room: {room}')
+
+if socketio is not None:
+    register_socketio_handlers(socketio)
 
 if __name__ == '__main__':
     # use_reloader=False prevents port conflict issues with eventlet on Windows
-    socketio.run(app, debug=True, host='0.0.0.0', port=5000, use_reloader=False)
+    if socketio is not None:
+        socketio.run(app, debug=True, host='0.0.0.0', port=5000, use_reloader=False)
+    else:
+        app.run(debug=True, host='0.0.0.0', port=5000, use_reloader=False)
@@ -0,0 +1,60 @@
+"""
+Pick a bcrypt cost factor for a target login latency on this machine.
+
+Measures checkpw time at increasing costs and recommends the highest cost
+whose median stays within the target. Run it on production-like hardware.
+
+Usage (from backend/):
+    python scripts/calibrate_bcrypt.py                  # target 250 ms
+    python scripts/calibrate_bcrypt.py --target-ms 100 --temp-target-ms 30
+"""
+import argparse
+import statistics
+import time
+
+import bcrypt
+
+MIN_COST = 4
+MAX_COST = 16
+
+
+def measure(cost, samples):
+    password = b'calibration-password'
+    hashed = bcrypt.hashpw(password, bcrypt.gensalt(cost))
+    timings = []
+    for _ in range(samples):
+        start = time.perf_counter()
+        bcrypt.checkpw(password, hashed)
+        timings.append((time.perf_counter() - start) * 1000)
+    return statistics.median(timings)
+
+
+def pick_cost(target_ms, timings):
+    within = [cost for cost, ms in timings.items() if ms <= target_ms]
+    return max(within) if within else MIN_COST
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Calibrate bcrypt cost for a target login latency')
+    parser.add_argument('--target-ms', type=float, default=250, help='target for permanent passwords')
+    parser.add_argument('--temp-target-ms', type=float, default=None,
+                        help='target for temporary passwords (default: a quarter of --target-ms)')
+    parser.add_argument('--samples', type=int, default=3)
+    args = parser.parse_args()
+    temp_target = args.temp_target_ms if args.temp_target_ms is not None else args.target_ms / 4
+
+    timings = {}
+    for cost in range(MIN_COST, MAX_COST + 1):
+        timings[cost] = measure(cost, args.samples)
+        print(f'cost {cost:2d}: {timings[cost]:9.1f} ms')
+        # Each step doubles the time; stop once clearly past the target
+        if timings[cost] > args.target_ms * 2:
+            break
+
+    print()
+    print(f'BCRYPT_ROUNDS={pick_cost(args.target_ms, timings)}       # <= {args.target_ms:g} ms per login')
+    print(f'BCRYPT_TEMP_ROUNDS={pick_cost(temp_target, timings)}  # <= {temp_target:g} ms per temporary password')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,56 @@
+"""
+Apply pending database migrations, or show the current schema version.
+
+Usage (from backend/):
+    python scripts/migrate.py            # apply pending migrations
+    python scripts/migrate.py --status   # show applied vs available versions
+"""
+import os
+import sys
+import argparse
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+import psycopg2
+
+from app.config import Config
+from app.migrations import list_migrations, current_version, migrate, MigrationError
+
+
+def main():
+    parser = argparse.ArgumentParser(description='CampusOne schema migrations')
+    parser.add_argument('--status', action='store_true', help='show versions without applying')
+    args = parser.parse_args()
+
+    conn = psycopg2.connect(
+        host=Config.DB_HOST,
+        database=Config.DB_NAME,
+        user=Config.DB_USER,
+        password=Config.DB_PASSWORD,
+        port=Config.DB_PORT
+    )
+    try:
+        migrations = list_migrations()
+        if args.status:
+            version = current_version(conn)
+            print(f'Current schema version: {version}')
+            for number, name, _ in migrations:
+                state = 'applied' if number <= version else 'pending'
+                print(f'  {number:04d} {name:<40} {state}')
+            return
+        try:
+            applied = migrate(conn)
+        except MigrationError as e:
+            if e.applied:
+                print(f"Applied migrations: {', '.join(f'{v:04d}' for v in e.applied)}")
+            sys.exit(str(e))
+        if applied:
+            print(f"Applied migrations: {', '.join(f'{v:04d}' for v in applied)}")
+        else:
+            print('Schema is up to date')
+    finally:
+        conn.close()
+
+
+if __name__ == '__main__':
+    main()
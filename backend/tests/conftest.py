@@ -0,0 +1,5 @@
+"""Unit tests for DB-free logic; run from backend/ with `python -m pytest tests`."""
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
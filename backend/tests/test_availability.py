@@ -0,0 +1,46 @@
+from datetime import time
+
+from app.services.availability_service import cell_mask, encode_mask, fit_starts
+
+DAY_START = 8 * 60  # 08:00 in minutes
+
+
+def test_cell_mask_covers_touched_cells():
+    # 15-minute cells from 08:00; 09:00-09:55 touches cells 4..7
+    assert cell_mask(time(9), time(9, 55), DAY_START, 15, 48) == 0b1111 << 4
+    # Partial cells at both ends are included
+    assert cell_mask(time(8, 10), time(8, 20), DAY_START, 15, 48) == 0b11
+
+
+def test_cell_mask_clips_to_the_day():
+    assert cell_mask(time(7), time(8, 30), DAY_START, 30, 4) == 0b1
+    assert cell_mask(time(9, 30), time(23), DAY_START, 30, 4) == 0b1000
+    assert cell_mask(time(6), time(7), DAY_START, 30, 4) == 0
+    assert cell_mask(time(12), time(13), DAY_START, 30, 4) == 0
+
+
+def test_encode_mask_reads_left_to_right():
+    assert encode_mask(0b0001, 4) == '8'
+    assert encode_mask(0b1000, 4) == '1'
+    # Six cells pad to two hex digits; cells 0 and 5 set -> 1000 0100
+    assert encode_mask(0b100001, 6) == '84'
+    assert encode_mask(0, 12) == '000'
+
+
+def test_fit_starts_finds_runs_of_free_cells():
+    free = 0b0111_1011  # cells 0-1 and 3-6 free
+    assert fit_starts(free, 1) == free
+    assert fit_starts(free, 2) == 0b0011_1001
+    assert fit_starts(free, 3) == 0b0001_1000
+    assert fit_starts(free, 4) == 0b0000_1000
+    assert fit_starts(free, 5) == 0
+
+
+def test_fit_starts_matches_a_direct_scan():
+    free = 0b1110_1111_1101_1111_0111
+    for length in range(1, 10):
+        expected = 0
+        for start in range(24):
+            if all((free >> (start + i)) & 1 for i in range(length)):
+                expected |= 1 << start
+        assert fit_starts(free, length) == expected, length
@@ -0,0 +1,19 @@
+import pytest
+
+from app.services.bulk_user_service import build_selection
+
+
+def test_filter_values_are_coerced():
+    where, params = build_selection({'filter': {'role': 'student', 'department_id': '3', 'batch': 2024}})
+    assert where == "role <> 'admin' AND role = %s AND department_id = %s AND batch = %s"
+    assert params == ['student', 3, '2024']
+
+
+@pytest.mark.parametrize('filters, error', [
+    ({'department_id': 'cs'}, 'department_id must be a number'),
+    ({'role': 'admin'}, 'role must be one of'),
+    ({'role': 'teacher'}, 'role must be one of'),
+])
+def test_bad_filter_values_are_rejected(filters, error):
+    with pytest.raises(ValueError, match=error):
+        build_selection({'filter': filters})
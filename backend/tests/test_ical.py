@@ -0,0 +1,43 @@
+from datetime import date, datetime, time
+
+from app.utils.ical import calendar, escape_text, fold, local_datetime, utc_datetime
+
+
+def test_escape_text():
+    assert escape_text('a,b;c\\d') == r'a\,b\;c\\d'
+    assert escape_text('line 1\r\nline 2\nline 3') == 'line 1\\nline 2\\nline 3'
+    assert escape_text(None) == ''
+
+
+def test_short_lines_are_not_folded():
+    line = 'SUMMARY:' + 'x' * 67
+    assert fold(line) == line
+
+
+def test_fold_splits_at_75_octets():
+    line = 'DESCRIPTION:' + 'x' * 200
+    pieces = fold(line).split('\r\n')
+    assert len(pieces[0].encode('utf-8')) == 75
+    assert all(p.startswith(' ') and len(p.encode('utf-8')) <= 75 for p in pieces[1:])
+    assert ''.join(p[1:] if i else p for i, p in enumerate(pieces)) == line
+
+
+def test_fold_never_splits_a_utf8_sequence():
+    line = 'SUMMARY:' + 'é' * 100
+    pieces = fold(line).split('\r\n')
+    assert all(len(p.encode('utf-8')) <= 75 for p in pieces)
+    assert ''.join(p[1:] if i else p for i, p in enumerate(pieces)) == line
+
+
+def test_datetimes():
+    assert local_datetime(date(2026, 10, 19), time(9, 5)) == '20261019T090500'
+    assert utc_datetime(datetime(2026, 1, 2, 3, 4, 5)) == '20260102T030405Z'
+
+
+def test_calendar_wraps_events_with_crlf():
+    text = calendar('CSE 2027', [[('UID', 'a@x'), ('SUMMARY', 'Maths')]])
+    lines = text.split('\r\n')
+    assert lines[0] == 'BEGIN:VCALENDAR'
+    assert 'X-WR-CALNAME:CSE 2027' in lines
+    assert lines[lines.index('BEGIN:VEVENT') + 1:lines.index('END:VEVENT')] == ['UID:a@x', 'SUMMARY:Maths']
+    assert text.endswith('END:VCALENDAR\r\n')
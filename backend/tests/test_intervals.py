@@ -0,0 +1,38 @@
+from app.utils.intervals import IntervalIndex, overlapping_pairs
+
+
+def test_overlapping_pairs_reports_each_overlap_once():
+    intervals = [(0, 10, 'a'), (5, 15, 'b'), (12, 20, 'c'), (30, 40, 'd')]
+    assert sorted(overlapping_pairs(intervals)) == [('a', 'b'), ('b', 'c')]
+
+
+def test_touching_intervals_do_not_overlap():
+    assert list(overlapping_pairs([(0, 10, 'a'), (10, 20, 'b')])) == []
+
+
+def test_contained_and_identical_intervals_overlap():
+    pairs = {frozenset(p) for p in overlapping_pairs([(0, 100, 'outer'), (10, 20, 'inner'), (10, 20, 'twin')])}
+    assert pairs == {frozenset(('outer', 'inner')), frozenset(('outer', 'twin')), frozenset(('inner', 'twin'))}
+
+
+def test_pair_order_follows_start():
+    assert list(overlapping_pairs([(5, 15, 'late'), (0, 10, 'early')])) == [('early', 'late')]
+
+
+def test_index_only_compares_within_a_key():
+    index = IntervalIndex()
+    index.add(('room', 1, 0), 540, 600, 'x')
+    index.add(('room', 2, 0), 540, 600, 'y')
+    index.add(('room', 1, 1), 540, 600, 'z')
+    assert list(index.conflicts()) == []
+
+    index.add(('room', 1, 0), 570, 630, 'w')
+    assert list(index.conflicts()) == [(('room', 1, 0), 'x', 'w')]
+
+
+def test_index_ignores_empty_intervals():
+    index = IntervalIndex()
+    index.add('k', 100, 200, 'a')
+    index.add('k', 150, 150, 'empty')
+    index.add('k', 180, 120, 'backwards')
+    assert list(index.conflicts()) == []
@@ -0,0 +1,61 @@
+import pytest
+
+from app import migrations
+
+
+class FakeConnection:
+    """Records committed migration SQL; a file containing FAIL raises"""
+
+    def __init__(self):
+        self.committed, self.pending, self.versions = [], [], set()
+
+    def cursor(self):
+        return FakeCursor(self)
+
+    def commit(self):
+        self.committed += self.pending
+        self.pending = []
+
+    def rollback(self):
+        self.pending = []
+
+
+class FakeCursor:
+    def __init__(self, conn):
+        self.conn, self.row = conn, None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+    def execute(self, query, args=()):
+        self.row = None
+        if query.startswith('SELECT COALESCE(MAX(version)'):
+            self.row = (max(self.conn.versions, default=0),)
+        elif query.startswith('SELECT 1 FROM schema_version'):
+            self.row = (1,) if args[0] in self.conn.versions else None
+        elif query.startswith('INSERT INTO schema_version'):
+            self.conn.versions.add(args[0])
+        elif 'FAIL' in query:
+            raise RuntimeError('overlapping timetable entries')
+        elif not query.lstrip().startswith(('SELECT pg_advisory', 'CREATE TABLE IF NOT EXISTS schema_version')):
+            self.conn.pending.append(query)
+
+    def fetchone(self):
+        return self.row
+
+
+def test_failed_migration_keeps_earlier_ones(tmp_path, monkeypatch):
+    (tmp_path / '0001_first.sql').write_text('CREATE TABLE a ()')
+    (tmp_path / '0002_second.sql').write_text('FAIL')
+    (tmp_path / '0003_third.sql').write_text('CREATE TABLE c ()')
+    monkeypatch.setattr(migrations, 'MIGRATIONS_DIR', str(tmp_path))
+    conn = FakeConnection()
+
+    with pytest.raises(migrations.MigrationError, match='0002_second') as failure:
+        migrations.migrate(conn)
+    assert failure.value.applied == [1]
+    assert conn.committed == ['CREATE TABLE a ()']
+    assert conn.versions == {1}
@@ -0,0 +1,40 @@
+from flask import Flask, g
+
+from app import db
+
+
+def _app():
+    app = Flask(__name__)
+    app.config['JWT_SECRET_KEY'] = 'test-secret'
+    return app
+
+
+def _uses_replica(app, monkeypatch, identity, headers=None):
+    monkeypatch.setattr(db, '_replica_settings', {'host': 'replica'})
+    monkeypatch.setattr(db, '_request_identity', lambda: identity)
+    with app.test_request_context(headers=headers or {}):
+        g.db_read_only = True
+        return db._use_replica()
+
+
+def test_last_write_token_pins_the_writer_to_the_primary(monkeypatch):
+    app = _app()
+    monkeypatch.setattr(db, '_replica_settings', {'host': 'replica'})
+    monkeypatch.setattr(db, '_request_identity', lambda: '7')
+    with app.test_request_context(method='POST'):
+        db._record_write()
+        token = db.sign_last_write(app.response_class()).headers[db.LAST_WRITE_HEADER]
+
+    assert not _uses_replica(app, monkeypatch, '7', {db.LAST_WRITE_HEADER: token})
+    # Another user's token, a tampered token or none at all leave reads on the replica
+    assert _uses_replica(app, monkeypatch, '8', {db.LAST_WRITE_HEADER: token})
+    assert _uses_replica(app, monkeypatch, '7', {db.LAST_WRITE_HEADER: '8' + token[1:]})
+    assert _uses_replica(app, monkeypatch, '7')
+
+
+def test_last_write_token_expires_after_the_sticky_window(monkeypatch):
+    app = _app()
+    with app.test_request_context():
+        token = db._write_signer().sign('7').decode()
+    monkeypatch.setitem(db._replica_options, 'sticky_seconds', -1)
+    assert _uses_replica(app, monkeypatch, '7', {db.LAST_WRITE_HEADER: token})
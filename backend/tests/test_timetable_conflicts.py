@@ -0,0 +1,157 @@
+"""plan_changes() and the bulk date-scoped check, over an in-memory timetable."""
+from datetime import date, time
+
+import pytest
+
+from app.services import timetable_service
+from app.services.timetable_bulk_service import _dated_conflicts
+
+
+def entry(id, classroom_id, professor_id, batch='A', day=0, start=9, end=10, department_id=1):
+    return {'id': id, 'department_id': department_id, 'batch': batch, 'classroom_id': classroom_id,
+            'professor_id': professor_id, 'subject': f'S{id}', 'day_of_week': day,
+            'start_time': time(start), 'end_time': time(end)}
+
+
+TIMETABLE = [
+    entry(1, classroom_id=10, professor_id=100, batch='A', start=9, end=10),
+    entry(2, classroom_id=11, professor_id=101, batch='B', start=9, end=10),
+    entry(3, classroom_id=10, professor_id=102, batch='C', start=10, end=11),
+]
+
+
+@pytest.fixture
+def timetable(monkeypatch):
+    rows = [dict(e) for e in TIMETABLE]
+
+    def query_db(query, args=(), one=False):
+        if 'id = ANY' in query:
+            return [r for r in rows if r['id'] in args[0]]
+        return [r for r in rows if r['day_of_week'] in args[0]]
+
+    monkeypatch.setattr(timetable_service, 'query_db', query_db)
+    return rows
+
+
+def test_room_swap_is_valid(timetable):
+    result = timetable_service.plan_changes([
+        {'op': 'move', 'id': 1, 'classroom_id': 11},
+        {'op': 'move', 'id': 2, 'classroom_id': 10},
+    ])
+    assert result['valid'], result
+    assert set(result['plan']['move']) == {1, 2}
+
+
+def test_move_into_occupied_room_conflicts(timetable):
+    result = timetable_service.plan_changes([{'op': 'move', 'id': 2, 'classroom_id': 10}])
+    assert not result['valid']
+    assert [c['type'] for c in result['conflicts']] == ['room']
+    assert {'id': 2, 'change': 0} in result['conflicts'][0]['entries']
+
+
+def test_back_to_back_slots_do_not_conflict(timetable):
+    result = timetable_service.plan_changes([
+        {'op': 'create', 'department_id': 1, 'batch': 'A', 'classroom_id': 10, 'professor_id': 100,
+         'subject': 'New', 'day_of_week': 0, 'start_time': '11:00', 'end_time': '12:00'},
+    ])
+    assert result['valid'], result
+
+
+def test_create_conflicts_with_professor_and_batch(timetable):
+    result = timetable_service.plan_changes([
+        {'op': 'create', 'department_id': 1, 'batch': 'A', 'classroom_id': 12, 'professor_id': 100,
+         'subject': 'New', 'day_of_week': 0, 'start_time': '09:30', 'end_time': '10:30'},
+    ])
+    assert sorted(c['type'] for c in result['conflicts']) == ['batch', 'professor']
+
+
+def test_deleted_entry_frees_its_slot(timetable):
+    result = timetable_service.plan_changes([
+        {'op': 'delete', 'id': 1},
+        {'op': 'move', 'id': 2, 'classroom_id': 10},
+    ])
+    assert result['valid'], result
+
+
+def test_bad_changes_are_reported_per_change(timetable):
+    result = timetable_service.plan_changes([
+        {'op': 'move', 'id': 99, 'classroom_id': 10},
+        {'op': 'move', 'id': 1, 'start_time': '10:00', 'end_time': '09:00'},
+        {'op': 'teleport'},
+    ])
+    assert [e['change'] for e in result['errors']] == [0, 1, 2]
+    assert not result['valid']
+
+
+def test_apply_refuses_rows_changed_since_planning(timetable):
+    plan = timetable_service.plan_changes([
+        {'op': 'move', 'id': 1, 'classroom_id': 12},
+        {'op': 'delete', 'id': 2},
+    ])['plan']
+    assert set(plan['read']) == {1, 2}
+
+    unchanged = [dict(e) for e in TIMETABLE]
+    timetable_service._check_unchanged(FakeCursor(unchanged), plan['read'])
+
+    # Another admin moved entry 1 in the meantime: the plan's copy of it is stale
+    moved = [dict(unchanged[0], professor_id=103)] + unchanged[1:]
+    with pytest.raises(ValueError, match='entry 1 changed'):
+        timetable_service._check_unchanged(FakeCursor(moved), plan['read'])
+    with pytest.raises(ValueError, match='entry 2 changed'):
+        timetable_service._check_unchanged(FakeCursor(unchanged[:1]), plan['read'])
+
+
+class FakeCursor:
+    """Answers reads (by the table after FROM) from lists"""
+
+    def __init__(self, weekly, exceptions=(), bookings=()):
+        self.tables = {'timetable': weekly, 'timetable_exceptions': exceptions, 'auditorium_bookings': bookings}
+        self.result = []
+
+    def execute(self, query, args):
+        for table in ('auditorium_bookings', 'timetable_exceptions', 'timetable'):
+            if f'FROM {table}' in query:
+                self.result = list(self.tables[table])
+                return
+
+    def fetchall(self):
+        return self.result
+
+
+MONDAY = date(2026, 10, 19)
+
+
+def override(e, target=MONDAY, start=None, end=None, classroom_id=None):
+    return {'entry': e, 'date': MONDAY, 'target': target, 'minutes': 0, 'operation': 0,
+            'start_time': start or e['start_time'], 'end_time': end or e['end_time'],
+            'classroom_id': classroom_id or e['classroom_id']}
+
+
+def test_dated_move_clashes_with_that_days_class():
+    moved = override(TIMETABLE[1], classroom_id=10)
+    conflicts = _dated_conflicts({(2, MONDAY): moved}, FakeCursor(TIMETABLE))
+    assert [c['type'] for c in conflicts] == ['room']
+    assert conflicts[0]['date'] == MONDAY.isoformat()
+
+
+def test_dated_move_ignores_cancelled_occurrence():
+    cancelled = {'id': 1, 'timetable_id': 1, 'exception_date': MONDAY, 'status': 'cancelled', 'new_date': None,
+                 'start_time': None, 'end_time': None, 'classroom_id': 10, 'professor_id': 100,
+                 'department_id': 1, 'batch': 'A'}
+    moved = override(TIMETABLE[1], classroom_id=10)
+    assert _dated_conflicts({(2, MONDAY): moved}, FakeCursor(TIMETABLE, [cancelled])) == []
+
+
+def test_dated_move_clashes_with_booking():
+    booking = {'id': 5, 'classroom_id': 11, 'booking_date': MONDAY, 'start_time': time(9, 30),
+               'end_time': time(12)}
+    moved = override(TIMETABLE[1], start=time(11), end=time(12))
+    conflicts = _dated_conflicts({(2, MONDAY): moved}, FakeCursor(TIMETABLE, bookings=[booking]))
+    assert conflicts[0]['entries'][0] == {'booking_id': 5} or conflicts[0]['entries'][1] == {'booking_id': 5}
+
+
+def test_dated_moves_are_checked_against_each_other():
+    a = override(TIMETABLE[0], start=time(14), end=time(15), classroom_id=20)
+    b = override(TIMETABLE[1], start=time(14, 30), end=time(15, 30), classroom_id=20)
+    conflicts = _dated_conflicts({(1, MONDAY): a, (2, MONDAY): b}, FakeCursor(TIMETABLE))
+    assert [c['type'] for c in conflicts] == ['room']
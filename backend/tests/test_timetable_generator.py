@@ -0,0 +1,120 @@
+import random
+from collections import defaultdict
+from datetime import time
+
+import pytest
+
+from app.services.timetable_generator import SlotGrid, _Attempt, build_problem, search
+
+SLOTS = [(time(9), time(9, 55)), (time(10), time(10, 55)), (time(11), time(11, 55))]
+
+
+def make_problem(sessions, rooms, days=(0, 1), busy=None, allowed=None):
+    busy = busy or {}
+    return {
+        'sessions': sessions,
+        'grid': SlotGrid(days, SLOTS),
+        'rooms': rooms,
+        'busy': {kind: defaultdict(int, busy.get(kind, {})) for kind in ('room', 'professor', 'group')},
+        'allowed': allowed or {},
+    }
+
+
+def session(course, professor_id, group, size=30, hours=1):
+    return {'course': course, 'professor_id': professor_id, 'group': group, 'size': size, 'hours': hours}
+
+
+def test_grid_bits_map_to_day_and_slot():
+    grid = SlotGrid([0, 2], SLOTS)
+    assert grid.size == 6
+    assert grid.full == 0b111111
+    assert grid.slot(0) == (0, time(9), time(9, 55))
+    assert grid.slot(4) == (2, time(10), time(10, 55))
+    assert grid.day_of(4) == 1
+
+
+def test_grid_overlapping_and_within():
+    grid = SlotGrid([0, 2], SLOTS)
+    # 09:30-10:30 on day 2 touches its first two slots
+    assert grid.overlapping(2, time(9, 30), time(10, 30)) == 0b011000
+    # Only the 10:00 slot lies entirely inside 09:30-11:00
+    assert grid.within(0, time(9, 30), time(11)) == 0b000010
+    # Ends exactly where a slot starts: no overlap
+    assert grid.overlapping(0, time(8), time(9)) == 0
+    # Days outside the grid have no slots
+    assert grid.overlapping(1, time(9), time(12)) == 0
+
+
+def test_attempt_place_and_unplace_restore_occupancy():
+    problem = make_problem([session(0, 7, (1, 'A'))], [(1, 40)])
+    attempt = _Attempt(problem, random.Random(0))
+    attempt.place(0, 3, 1)
+    assert attempt.room_busy[1] == 1 << 3
+    assert attempt.prof_busy[7] == 1 << 3
+    assert attempt.group_busy[(1, 'A')] == 1 << 3
+    assert attempt.owner[('room', 1, 3)] == 0
+
+    assert attempt.unplace(0) == (3, 1)
+    assert attempt.room_busy[1] == attempt.prof_busy[7] == attempt.group_busy[(1, 'A')] == 0
+    assert attempt.owner == {}
+    assert attempt.course_days[0] == 0
+
+
+def test_free_room_is_the_smallest_that_fits():
+    problem = make_problem([session(0, 7, (1, 'A'), size=35)], [(1, 20), (2, 40), (3, 100)])
+    attempt = _Attempt(problem, random.Random(0))
+    assert attempt._free_room(0, 0) == 2
+    attempt.place(0, 0, 2)
+    problem['sessions'].append(session(1, 8, (1, 'B'), size=35))
+    assert attempt._free_room(1, 0) == 3
+
+
+def test_search_places_everything_without_clashes():
+    sessions = ([session(0, 1, (1, 'A'), hours=3)] * 3 + [session(1, 1, (1, 'B'), hours=2)] * 2
+                + [session(2, 2, (1, 'A'), hours=2)] * 2)
+    problem = make_problem(sessions, [(10, 50), (11, 50)])
+    placements, _ = search(problem, 5, seed=1)
+    assert len(placements) == len(sessions)
+
+    taken = defaultdict(set)
+    for s, (bit, room) in placements.items():
+        for key in (('room', room), ('professor', sessions[s]['professor_id']), ('group', sessions[s]['group'])):
+            assert bit not in taken[key], f'{key} double-booked at bit {bit}'
+            taken[key].add(bit)
+
+
+def test_search_respects_existing_entries_and_availability():
+    sessions = [session(0, 1, (1, 'A')), session(1, 2, (1, 'B'))]
+    problem = make_problem(
+        sessions, [(10, 50)],
+        busy={'room': {10: 0b000001}, 'group': {(1, 'B'): 0b000010}},
+        allowed={1: 0b000011},
+    )
+    placements, _ = search(problem, 5, seed=3)
+    assert placements[0][0] == 1  # professor 1 may only teach bits 0-1, and bit 0's room is taken
+    assert placements[1][0] not in (0, 1)
+
+
+def test_search_repairs_by_moving_one_blocker():
+    # Professor 1 can only teach bit 0; the other course, ordered first, may take it
+    sessions = [session(0, 2, (1, 'A')), session(1, 1, (1, 'A'))]
+    problem = make_problem(sessions, [(10, 50)], days=(0,), allowed={1: 0b001})
+    attempt = _Attempt(problem, random.Random(0))
+    attempt.place(0, 0, 10)
+    assert not attempt.try_place(1)
+    assert attempt.repair(1)
+    assert attempt.placed[1][0] == 0
+    assert attempt.placed[0][0] != 0
+
+
+def test_search_reports_partial_result_when_impossible():
+    sessions = [session(0, 1, (1, 'A'))] * 4
+    problem = make_problem(sessions, [(10, 50)], days=(0,))
+    placements, _ = search(problem, 0.2, seed=0)
+    assert len(placements) == 3
+
+
+def test_build_problem_rejects_overlapping_slots():
+    course = {'department_id': 1, 'batch': 'A', 'subject': 'S', 'professor_id': 1, 'hours_per_week': 1}
+    with pytest.raises(ValueError, match='overlap'):
+        build_problem({'courses': [course], 'slots': [['09:30', '10:30'], ['09:00', '10:00']]})
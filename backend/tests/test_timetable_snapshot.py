@@ -0,0 +1,60 @@
+from app.services.timetable_snapshot import BATCH_BYTES, Snapshot, _batch_key, _write
+
+
+def group(version, days):
+    return {'version': version, 'days': {day: data.encode('utf-8') for day, data in days.items()}}
+
+
+def build(tmp_path, groups, version=42, built_at=1000):
+    path = str(tmp_path / 'timetable.snap')
+    _write(path, version, built_at, {(dept, _batch_key(batch)): g for (dept, batch), g in groups.items()})
+    return Snapshot(path)
+
+
+def test_header_round_trips(tmp_path):
+    snapshot = build(tmp_path, {(1, '2027'): group(3, {0: '{"id":1}'})}, version=42, built_at=1234)
+    assert (snapshot.version, snapshot.built_at) == (42, 1234)
+    assert snapshot.count == 2  # one day record plus the group record
+
+
+def test_lookup_returns_each_days_fragment(tmp_path):
+    snapshot = build(tmp_path, {
+        (1, '2026'): group(5, {1: '{"id":9}'}),
+        (1, '2027'): group(7, {0: '{"id":1},{"id":2}', 4: '{"id":3}'}),
+        (2, '2027'): group(8, {0: '{"id":4}'}),
+    })
+    version, days = snapshot.lookup(1, '2027')
+    assert version == 7
+    assert {day: bytes(data) for day, data in days.items()} == {0: b'{"id":1},{"id":2}', 4: b'{"id":3}'}
+    assert snapshot.lookup(2, '2027')[0] == 8
+    assert bytes(snapshot.lookup(1, '2026')[1][1]) == b'{"id":9}'
+
+
+def test_group_without_entries_keeps_its_version(tmp_path):
+    snapshot = build(tmp_path, {(1, 'A'): group(4, {}), (1, 'B'): group(6, {2: '{"id":1}'})})
+    assert snapshot.lookup(1, 'A') == (4, {})
+
+
+def test_unknown_batches(tmp_path):
+    snapshot = build(tmp_path, {(1, '2027'): group(3, {0: '{"id":1}'})})
+    assert snapshot.lookup(1, '2028') == (0, {})
+    assert snapshot.lookup(0, '2027') == (0, {})
+    assert snapshot.lookup(9, 'zzz') == (0, {})
+
+
+def test_batches_that_cannot_be_keyed():
+    assert _batch_key('x' * BATCH_BYTES) == b'x' * BATCH_BYTES
+    assert _batch_key('x' * (BATCH_BYTES + 1)) is None
+    assert _batch_key('a\0b') is None
+
+
+def test_groups_round_trip_for_incremental_rebuilds(tmp_path):
+    snapshot = build(tmp_path, {(1, '2027'): group(3, {0: '{"id":1}', 5: '{"id":2}'}), (2, 'X'): group(1, {})})
+    groups = snapshot.groups()
+    assert set(groups) == {(1, b'2027'), (2, b'X')}
+    assert groups[(1, b'2027')]['version'] == 3
+    assert {day: bytes(data) for day, data in groups[(1, b'2027')]['days'].items()} == {0: b'{"id":1}', 5: b'{"id":2}'}
+
+    _write(str(tmp_path / 'timetable.snap'), 43, 1000, groups)
+    rebuilt = Snapshot(str(tmp_path / 'timetable.snap'))
+    assert rebuilt.lookup(1, '2027')[0] == 3
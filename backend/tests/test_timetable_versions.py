@@ -0,0 +1,26 @@
+from app.services.timetable_version_service import _change_filters, scope_for, ALL_SCOPE
+
+
+def test_partial_filters_are_applied_to_changes():
+    # department_id alone reads the 'all' version but must still filter the changes
+    assert scope_for(department_id=3) == ALL_SCOPE
+    logged, logged_params, current, current_params = _change_filters(
+        {'department_id': 3, 'batch': None, 'professor_id': None})
+    assert logged == "((department_id = %s) OR (old_department_id = %s))"
+    assert logged_params == [3, 3]
+    assert (current, current_params) == ("t.department_id = %s", [3])
+
+    logged, logged_params, current, current_params = _change_filters(
+        {'department_id': None, 'batch': '2024', 'professor_id': None})
+    assert logged == "((batch = %s) OR (old_batch = %s))"
+    assert current_params == ['2024']
+
+
+def test_batch_filter_matches_entries_moved_out_of_it():
+    logged, logged_params, _, _ = _change_filters({'department_id': 3, 'batch': '2024', 'professor_id': None})
+    assert logged == "((department_id = %s AND batch = %s) OR (old_department_id = %s AND old_batch = %s))"
+    assert logged_params == [3, '2024', 3, '2024']
+
+
+def test_no_filter_reads_every_change():
+    assert _change_filters({'department_id': None, 'batch': None, 'professor_id': None}) == ("TRUE", [], "TRUE", [])
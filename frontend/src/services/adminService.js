@@ -20,6 +20,11 @@ export const adminService = {
     if (filters.department_id) params.append('department_id', filters.department_id);
     if (filters.batch) params.append('batch', filters.batch);
     if (filters.search) params.append('search', filters.search);
+    if (filters.is_active !== undefined) params.append('is_active', String(filters.is_active));
+    // Optional keyset pagination: response includes next_cursor (and total when requested)
+    if (filters.limit) params.append('limit', filters.limit);
+    if (filters.cursor) params.append('cursor', filters.cursor);
+    if (filters.include_total) params.append('include_total', filters.include_total);
     
     const response = await api.get(`/admin/users?${params.toString()}`);
     return response.data;
@@ -16,6 +16,11 @@ api.interceptors.request.use(
     if (token) {
       config.headers.Authorization = `Bearer ${token}`;
     }
+    // Signed token from our last write: keeps our reads on the primary database for a few seconds
+    const lastWrite = sessionStorage.getItem('lastWrite');
+    if (lastWrite) {
+      config.headers['X-Last-Write'] = lastWrite;
+    }
     return config;
   },
   (error) => {
@@ -25,7 +30,12 @@ api.interceptors.request.use(
 
 // Handle response errors
 api.interceptors.response.use(
-  (response) => response,
+  (response) => {
+    if (response.headers['x-last-write']) {
+      sessionStorage.setItem('lastWrite', response.headers['x-last-write']);
+    }
+    return response;
+  },
   (error) => {
     if (error.response?.status === 401) {
       // Don't redirect if this was the login request - let Login page show the error